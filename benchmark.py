@@ -0,0 +1,469 @@
+"""录制/预览/合并各路径的性能基准（无需摄像头、麦克风和显示器）
+
+用法:
+    python benchmark.py                       # 完整运行，结果写入 recordings/benchmarks/
+    python benchmark.py --quick               # 缩短各项时长，用于快速检查
+    python benchmark.py --baseline old.json   # 与之前的结果比较，变差超过容差时返回 1
+    xvfb-run -s "-screen 0 1920x1080x24" python benchmark.py --only screen   # 屏幕抓取（需要 X 显示）
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from src.recorder.av_recorder import AVRecorder
+from src.recorder.encoders import get_encoder
+from src.recorder.merge_queue import JOB_DONE
+from src.recorder.mjpeg import MJPEGStreamSource
+from src.recorder.preview import PreviewRenderer
+from src.recorder.screen import ScreenSource
+from src.recorder.sources import SyntheticVideoSource, SyntheticAudioSource
+from src.recorder.sync import AudioAligner, MasterClock
+from tests.mjpeg_server import MJPEGServer
+
+RESOLUTIONS = {'480p': (854, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+# 采集编码测试使用的编码方式（编码器注册表中的名称），本机不支持的跳过
+ENCODER_NAMES = ['opencv_mp4v', 'x264_ultrafast', 'x264_veryfast']
+
+
+def machine_info():
+    """记录运行环境，便于比较不同机器或不同版本的结果"""
+    info = {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+    }
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    info['processor'] = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    try:
+        info['memory_mb'] = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        pass
+    if shutil.which('ffmpeg'):
+        try:
+            output = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout
+            info['ffmpeg'] = output.splitlines()[0] if output else None
+        except OSError:
+            pass
+    return info
+
+
+def result(name, value, unit, better, **extra):
+    """一项测量结果；better 为 "higher" 或 "lower"，用于判断是否变差"""
+    entry = {'name': name, 'value': round(float(value), 4), 'unit': unit, 'better': better}
+    entry.update(extra)
+    return entry
+
+
+def _percentiles(samples):
+    samples = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'max_ms': round(float(samples.max()), 4),
+    }
+
+
+def bench_capture_encode(workdir, frames):
+    """采集线程 → 编码队列 → 编码线程 的吞吐量（不按实时节奏，测量上限）
+
+    通过无界面录制器运行真实的录制流程（_record_video / _encode_video、编码队列及其丢帧策略、
+    音频对齐和编码器注册表），采集速度超过编码速度时按录制器的丢帧策略丢帧。
+    """
+    results = []
+    for label, (width, height) in RESOLUTIONS.items():
+        for name in ENCODER_NAMES:
+            entry_name = f"capture_encode_{label}_{name}"
+            preset = get_encoder(name)
+            if not preset.available():
+                results.append({'name': entry_name, 'skipped': f"本机不支持 {preset.codec}"})
+                continue
+            recorder = _headless_recorder()
+            recorder.output_dir = workdir
+            recorder.encoder = name
+            recorder.catalog_enabled = False
+            # 测量编码上限，不让降级策略隔帧编码
+            recorder.load_shedding = False
+            recorder.video_source = SyntheticVideoSource(width, height, 30.0, realtime=False,
+                                                         duration=frames / 30.0)
+            start = time.perf_counter()
+            recorder.start_recording()
+            if not recorder.recording:
+                results.append({'name': entry_name, 'skipped': "无法开始录制"})
+                continue
+            recorder.video_thread.join()
+            recorder.encode_thread.join()
+            elapsed = time.perf_counter() - start
+            encode_ms = recorder.metrics.snapshot()['histograms'].get('encode_ms')
+            recorder.stop_recording()
+            recorder.save_thread.join()
+            recorder.merge_queue.shutdown()
+
+            extra = {}
+            if encode_ms is not None:
+                extra = {f"{key}_ms": round(encode_ms[key], 4) for key in ('p50', 'p95', 'max')}
+            results.append(result(entry_name, recorder.encoded_count / elapsed, 'fps', 'higher',
+                                  encoder=recorder.active_encoder.name, captured=recorder.frame_count,
+                                  encoded=recorder.encoded_count, dropped=recorder.encode_queue.dropped,
+                                  **extra))
+            for filename in os.listdir(workdir):
+                if filename.startswith(("video_", "audio_")):
+                    os.remove(os.path.join(workdir, filename))
+    return results
+
+
+def bench_preview(iterations):
+    """update_preview（采集线程中的提交）与预览转换（缩小 + 颜色转换）的耗时"""
+    results = []
+    recorder = _headless_recorder()
+    recorder.preview_renderer = PreviewRenderer(None, (640, 480), 15)
+    for label, (width, height) in RESOLUTIONS.items():
+        source = SyntheticVideoSource(width, height, realtime=False)
+        source.open()
+        _, frame = source.read()
+        source.release()
+
+        submit_times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            recorder.update_preview(frame)
+            submit_times.append(time.perf_counter() - start)
+        results.append(result(f"preview_submit_{label}", np.mean(submit_times) * 1e6, 'us', 'lower',
+                              **_percentiles(submit_times)))
+
+        prepare_times = []
+        for _ in range(max(iterations // 10, 10)):
+            start = time.perf_counter()
+            recorder.preview_renderer.prepare(frame)
+            prepare_times.append(time.perf_counter() - start)
+        results.append(result(f"preview_prepare_{label}", np.mean(prepare_times) * 1000, 'ms', 'lower',
+                              **_percentiles(prepare_times)))
+    return results
+
+
+def bench_audio_callback(iterations):
+    """音频回调（电平统计 + 缓冲统计 + 写入环形缓冲区）每次调用的耗时"""
+    recorder = _headless_recorder()
+    recorder.clock = MasterClock()
+    chunk = recorder.audio_source.chunk
+    data = (np.sin(np.arange(chunk) / 10.0) * 8000).astype(np.int16).tobytes()
+    time_info = {'input_buffer_adc_time': 0, 'current_time': 0, 'output_buffer_dac_time': 0}
+
+    results = []
+    for label, recording in (('idle', False), ('recording', True)):
+        recorder.recording = recording
+        recorder.audio_ring.reset()
+        times = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            recorder._audio_callback(data, chunk, time_info, 0)
+            times.append(time.perf_counter() - start)
+            if i % 8 == 7:
+                recorder.audio_ring.read()
+        recorder.recording = False
+        budget = chunk / float(recorder.RATE)
+        results.append(result(f"audio_callback_{label}", np.mean(times) * 1e6, 'us', 'lower',
+                              budget_percent=round(float(np.mean(times)) / budget * 100, 4),
+                              **_percentiles(times)))
+    return results
+
+
+def bench_save_audio(workdir, seconds):
+    """写入 seconds 秒音频（录制线程路径）后 _save_audio 的耗时和内存占用"""
+    recorder = _headless_recorder()
+    recorder.output_dir = workdir
+    recorder.session_timestamp = "benchmark"
+    recorder.segmented = False
+    recorder.segment = recorder._open_segment(0)
+    recorder.audio_segment = recorder.segment
+    recorder.next_audio_segment = None
+    recorder.aligner = AudioAligner(recorder.RATE, recorder.CHANNELS, recorder.audio_source.sample_width)
+    recorder.aligner.set_video_start(0.0)
+
+    chunk = recorder.audio_source.chunk
+    data = (np.sin(np.arange(chunk) / 10.0) * 8000).astype(np.int16).tobytes()
+    chunks = int(seconds * recorder.RATE / chunk)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(chunks):
+        recorder._write_audio(recorder.aligner.feed(data, i * chunk / float(recorder.RATE)))
+    write_time = time.perf_counter() - start
+    start = time.perf_counter()
+    recorder._save_audio()
+    save_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    recorder.segment.video_writer.release()
+    size = os.path.getsize(recorder.segment.audio_filename)
+    recorder.segment.timestamp_log.close()
+    for filename in (recorder.segment.audio_filename, recorder.segment.video_filename,
+                     recorder.segment.timestamp_log.filename):
+        if os.path.exists(filename):
+            os.remove(filename)
+    return [
+        result("save_audio_time", save_time, 's', 'lower', audio_seconds=seconds),
+        result("save_audio_write_time", write_time, 's', 'lower', audio_seconds=seconds),
+        result("save_audio_peak_memory", peak / (1024 * 1024), 'MB', 'lower',
+               audio_seconds=seconds, file_mb=round(size / (1024 * 1024), 2)),
+    ]
+
+
+def bench_merge(workdir, seconds):
+    """合并一段 seconds 秒的音视频（快速封装、FFmpeg 与 MoviePy 三种方式）"""
+    recorder = _headless_recorder()
+    recorder.output_dir = workdir
+    video_file = os.path.join(workdir, "video_merge.mp4")
+    audio_file = os.path.join(workdir, "audio_merge.wav")
+
+    source = SyntheticVideoSource(1280, 720, 30.0, realtime=False, duration=seconds)
+    source.open()
+    writer = cv2.VideoWriter(video_file, cv2.VideoWriter_fourcc(*'mp4v'), 30.0, (1280, 720), True)
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        writer.write(frame)
+    writer.release()
+    source.release()
+
+    import wave
+    samples = (np.sin(np.arange(int(seconds * 44100)) * 2 * np.pi * 440 / 44100) * 8000).astype(np.int16)
+    with wave.open(audio_file, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(44100)
+        wf.writeframes(samples.tobytes())
+
+    recorder.video_filename = video_file
+    recorder.audio_filename = audio_file
+    recorder.video_manifest = recorder.audio_manifest = None
+
+    results = []
+    for method in ("Remux", "FFmpeg", "MoviePy"):
+        name = f"merge_{method.lower()}"
+        if method != "MoviePy" and not shutil.which('ffmpeg'):
+            results.append({'name': name, 'skipped': "未找到 ffmpeg"})
+            continue
+        if method == "MoviePy":
+            try:
+                import moviepy.editor  # noqa: F401
+            except ImportError:
+                results.append({'name': name, 'skipped': "未安装 moviepy"})
+                continue
+        start = time.perf_counter()
+        job = recorder.merge_av(method)
+        while not job.finished:
+            time.sleep(0.02)
+        elapsed = time.perf_counter() - start
+        if job.status != JOB_DONE:
+            results.append({'name': name, 'skipped': f"合并失败: {job.describe()}"})
+            continue
+        results.append(result(name, elapsed, 's', 'lower', media_seconds=seconds,
+                              speed=round(seconds / elapsed, 2)))
+        if os.path.exists(job.output_file):
+            os.remove(job.output_file)
+    recorder.merge_queue.shutdown()
+    for filename in (video_file, audio_file):
+        os.remove(filename)
+    return results
+
+
+def bench_screen(frames):
+    """屏幕抓取的上限帧率（共享内存 + DAMAGE / 仅共享内存 / XGetImage），没有 X 显示时跳过"""
+    modes = [
+        ('screen_shm_damage', {'use_shm': True, 'use_damage': True}),
+        ('screen_shm', {'use_shm': True, 'use_damage': False}),
+        ('screen_xgetimage', {'use_shm': False, 'use_damage': False}),
+    ]
+    if not os.environ.get('DISPLAY'):
+        return [{'name': name, 'skipped': "没有 X 显示（可用 xvfb-run 运行）"} for name, _ in modes]
+    results = []
+    for name, options in modes:
+        source = ScreenSource(realtime=False, **options)
+        try:
+            source.open()
+        except Exception as e:
+            results.append({'name': name, 'skipped': str(e)})
+            continue
+        read_times = []
+        start = time.perf_counter()
+        for _ in range(frames):
+            t = time.perf_counter()
+            source.read()
+            read_times.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        stats = source.stats()
+        source.release()
+        results.append(result(name, frames / elapsed, 'fps', 'higher',
+                              size=f"{source.width}x{source.height}", shm=stats['shm'],
+                              damage=stats['damage'], **_percentiles(read_times)))
+    return results
+
+
+def bench_mjpeg(seconds):
+    """MJPEG 视频流的到达帧率、抖动、解码延迟和断线重连耗时（本地模拟服务，正确性检查见 tests/test_mjpeg.py）"""
+    server = MJPEGServer(SyntheticVideoSource(640, 480, 30.0)).start()
+    source = MJPEGStreamSource(server.url, timeout=5.0, max_backoff=1.0)
+    try:
+        source.open()
+        reads = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            ret, _ = source.read()
+            reads += ret
+        elapsed = time.perf_counter() - start
+        stats = source.stats()
+
+        # 模拟 Wi-Fi 掉线，测量重连并重新收到帧的耗时
+        received = source.received
+        dropped_at = time.perf_counter()
+        server.drop_connections()
+        while time.perf_counter() - dropped_at < 10.0:
+            if source.reconnects and source.received > received:
+                break
+            time.sleep(0.01)
+        reconnect_time = time.perf_counter() - dropped_at
+        reconnected = source.received > received
+    finally:
+        source.release()
+        server.stop()
+
+    results = [
+        result("mjpeg_fps", stats['fps'], 'fps', 'higher', reads_per_second=round(reads / elapsed, 2),
+               decoded=stats['decoded'], skipped=stats['skipped']),
+        result("mjpeg_jitter", stats['jitter_ms'], 'ms', 'lower'),
+        result("mjpeg_decode_latency", stats['decode_latency_ms'], 'ms', 'lower'),
+        result("mjpeg_read_age", stats['read_age_ms'], 'ms', 'lower'),
+    ]
+    if reconnected:
+        results.append(result("mjpeg_reconnect_time", reconnect_time, 's', 'lower'))
+    else:
+        results.append({'name': "mjpeg_reconnect_time", 'skipped': "断线后 10 秒内没有重新收到帧"})
+    return results
+
+
+def _headless_recorder():
+    """不打开任何设备、不显示界面的录制器"""
+    recorder = AVRecorder(None, None, SyntheticVideoSource(1280, 720), SyntheticAudioSource(),
+                          init_devices=False)
+    recorder.log = lambda message: None
+    recorder.init_audio()
+    recorder.export_metrics = False
+    return recorder
+
+
+def compare(results, baseline, tolerance):
+    """与基线比较，返回变差超过 tolerance（比例）的项目"""
+    previous = {entry['name']: entry for entry in baseline.get('results', []) if 'value' in entry}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry['name'])
+        if 'value' not in entry or old is None or not old['value']:
+            continue
+        change = (entry['value'] - old['value']) / old['value']
+        worse = change < -tolerance if entry['better'] == 'higher' else change > tolerance
+        entry['baseline'] = old['value']
+        entry['change_percent'] = round(change * 100, 2)
+        if worse:
+            regressions.append(entry)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制器性能基准")
+    parser.add_argument('--quick', action='store_true', help="缩短各项时长")
+    parser.add_argument('--only', nargs='*', choices=['encode', 'preview', 'audio', 'save_audio', 'merge', 'screen', 'mjpeg'],
+                        help="只运行指定项目")
+    parser.add_argument('--output', help="结果 JSON 文件（默认 recordings/benchmarks/ 下按时间命名）")
+    parser.add_argument('--baseline', help="用于比较的之前的结果 JSON")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="允许变差的比例（默认 0.2）")
+    parser.add_argument('--audio-seconds', type=float, help="_save_audio 测试的音频时长（默认 3600 秒）")
+    args = parser.parse_args()
+
+    only = set(args.only or ['encode', 'preview', 'audio', 'save_audio', 'merge', 'screen', 'mjpeg'])
+    frames = 60 if args.quick else 300
+    iterations = 500 if args.quick else 5000
+    audio_seconds = args.audio_seconds or (60 if args.quick else 3600)
+    merge_seconds = 3 if args.quick else 30
+    mjpeg_seconds = 2 if args.quick else 10
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="av_benchmark_")
+    try:
+        steps = [
+            ('encode', lambda: bench_capture_encode(workdir, frames)),
+            ('preview', lambda: bench_preview(iterations)),
+            ('audio', lambda: bench_audio_callback(iterations)),
+            ('save_audio', lambda: bench_save_audio(workdir, audio_seconds)),
+            ('merge', lambda: bench_merge(workdir, merge_seconds)),
+            ('screen', lambda: bench_screen(frames)),
+            ('mjpeg', lambda: bench_mjpeg(mjpeg_seconds)),
+        ]
+        for key, step in steps:
+            if key not in only:
+                continue
+            print(f"运行 {key} ...", flush=True)
+            for entry in step():
+                results.append(entry)
+                if 'value' in entry:
+                    print(f"  {entry['name']:<36}{entry['value']:>12.3f} {entry['unit']}")
+                else:
+                    print(f"  {entry['name']:<36}跳过: {entry['skipped']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'quick': args.quick,
+        'machine': machine_info(),
+        'results': results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        report['baseline'] = args.baseline
+        report['regressions'] = [entry['name'] for entry in regressions]
+
+    output = args.output
+    if output is None:
+        directory = os.path.join(os.getcwd(), "recordings", "benchmarks")
+        os.makedirs(directory, exist_ok=True)
+        output = os.path.join(directory, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+    if regressions:
+        print(f"\n{len(regressions)} 项比基线变差超过 {args.tolerance * 100:.0f}%:")
+        for entry in regressions:
+            print(f"  {entry['name']}: {entry['baseline']} → {entry['value']} {entry['unit']}"
+                  f"（{entry['change_percent']:+.1f}%）")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
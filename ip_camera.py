@@ -46,25 +46,31 @@ def setup_ip_webcam():
 
 def test_camera_connection(url):
     import cv2
+    from src.recorder.mjpeg import MJPEGStreamSource
     print(f"\n测试连接: {url}")
     
-    cap = cv2.VideoCapture(url)
-    if not cap.isOpened():
-        print("无法连接摄像头")
+    source = MJPEGStreamSource(url)
+    try:
+        source.open()
+    except Exception as e:
+        print(f"无法连接摄像头: {e}")
         return False
     
-    print("连接成功！按 'q' 退出预览")
+    print(f"连接成功！{source.width}x{source.height} 约 {source.fps:.1f} fps，按 'q' 退出预览")
     while True:
-        ret, frame = cap.read()
+        ret, frame = source.read()
         if ret:
             cv2.imshow('IP Camera Test', frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-        else:
-            print("无法获取画面")
+        elif not source.connected:
+            print("连接中断，正在重连...")
+        if cv2.waitKey(1) & 0xFF == ord('q'):
             break
     
-    cap.release()
+    stats = source.stats()
+    print(f"接收 {stats['received']} 帧，解码 {stats['decoded']} 帧，跳过 {stats['skipped']} 帧，"
+          f"抖动 {stats['jitter_ms']:.1f}ms，解码延迟 {stats['decode_latency_ms']:.1f}ms，"
+          f"重连 {stats['reconnects']} 次")
+    source.release()
     cv2.destroyAllWindows()
     return True
 
@@ -1,21 +1,63 @@
+import time
+
+# 启动计时从导入界面库之前开始
+_START_TIME = time.perf_counter()
+
+import contextlib
 import os
+import queue
 import sys
+import threading
 import tkinter as tk
 from tkinter import ttk  # 添加 ttk 用于更现代的下拉框
 from tkinter import scrolledtext
-from PIL import Image, ImageTk
-from src.recorder.av_recorder import AVRecorder
 import tkinter.messagebox as messagebox
-import cv2  # 添加这行
+
+
+class StartupTimer:
+    """记录启动各阶段的耗时，设备就绪后输出到日志，便于发现启动变慢"""
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.marks = []   # (阶段, 从启动算起的时间)
+        self.steps = []   # (步骤, 耗时)
+        self.lock = threading.Lock()
+
+    def mark(self, name):
+        with self.lock:
+            self.marks.append((name, self.elapsed()))
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.steps.append((name, seconds))
+
+    def elapsed(self):
+        return time.perf_counter() - self.origin
+
+    def summary(self, final="可以录制"):
+        with self.lock:
+            marks = ", ".join(f"{name} @{seconds:.2f}s" for name, seconds in self.marks)
+            steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.steps)
+        return f"启动耗时: {marks}; {steps}; {final} @{self.elapsed():.2f}s"
+
 
 class RecorderApp:
     def __init__(self):
+        self.timer = StartupTimer(_START_TIME)
         self.root = tk.Tk()
         self.root.title("音视频录制器")
         self.root.geometry("1024x768")  # 设置默认窗口大小
         
         # 添加这一行来初始化 merge_method
-        self.merge_method = tk.StringVar(value="FFmpeg")
+        self.merge_method = tk.StringVar(value="Remux")
         
         # 创建主框架
         self.main_frame = tk.Frame(self.root)
@@ -41,41 +83,441 @@ class RecorderApp:
         # 日志文本框移到视频预览下方
         self.log_text = scrolledtext.ScrolledText(self.preview_panel, height=8)
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        # 后台线程的日志先放进队列，由主线程定时写入文本框
+        self.pending_logs = queue.Queue()
         
-        # 初始化录制器
-        self.recorder = AVRecorder(self.log_text, self.video_label)
+        # 录制器在后台线程中创建，设备就绪前相关控件保持禁用
+        self.recorder = None
         
         # 在 __init__ 方法中添加状态标签
-        self.status_label = tk.Label(self.main_frame, text="就绪")
+        self.status_label = tk.Label(self.main_frame, text="正在初始化设备...")
         self.status_label.pack(pady=5)
         
+        # 录制时每路摄像头的实际帧率和丢帧数
+        self.camera_stats_label = tk.Label(self.main_frame, text="", justify=tk.LEFT, font=("Courier", 9))
+        self.camera_stats_label.pack(pady=5)
+        
         self.has_recordings = False  # 添加录制状态标记
         
         self.setup_ui()
+        self.timer.mark("界面构建")
+        
+        # 窗口显示出来之后再开始初始化设备
+        self.root.after_idle(self.start_device_init)
+        self.root.after(100, self.flush_logs)
+        
+    def start_device_init(self):
+        self.timer.mark("窗口显示")
+        thread = threading.Thread(target=self._init_devices)
+        thread.daemon = True
+        thread.start()
+        
+    def _init_devices(self):
+        """在后台线程中导入录制模块并初始化设备，每完成一步回到主线程启用对应控件"""
+        timer = self.timer
+        try:
+            with timer.measure("导入录制模块"):
+                from src.recorder.av_recorder import AVRecorder
+            recorder = AVRecorder(self.log_text, self.video_label, init_devices=False)
+            # 后台帧率检测在工作线程中完成，回到主线程更新界面
+            recorder.fps_callback = lambda fps: self.root.after(0, self.on_fps_detected, fps)
+            self.root.after(0, self._on_recorder_created, recorder)
+        except Exception as e:
+            self.root.after(0, self._on_device_error, "录制模块", e)
+            return
+        
+        try:
+            with timer.measure("摄像头"):
+                recorder.init_video()
+            self.root.after(0, self._on_video_ready)
+        except Exception as e:
+            self.root.after(0, self._on_device_error, "摄像头", e)
+        
+        try:
+            with timer.measure("音频设备"):
+                recorder.init_audio()
+            self.root.after(0, self._on_audio_ready)
+        except Exception as e:
+            self.root.after(0, self._on_device_error, "音频设备", e)
+            
+    def _on_recorder_created(self, recorder):
+        """录制器已创建：把界面上的设置同步过去"""
+        self.recorder = recorder
+        self.recorder.merge_workers = int(self.merge_workers.get())
+        self.recorder.audio_delay = int(float(self.delay_scale.get()))
+        self.recorder.set_buffer_size(int(float(self.buffer_scale.get())))
+        self.recorder.adaptive_buffer = self.adaptive_buffer.get()
+        self.recorder.set_preview_fps(int(float(self.preview_scale.get())))
+        self.recorder.output_mode = self.output_mode.get()
+        self.recorder.motion_adaptive = self.motion_adaptive.get()
+        self.recorder.load_shedding = self.load_shedding.get()
+        from src.recorder.encoders import ENCODERS
+        self.encoder_combo.config(values=['auto'] + [name for name, preset in ENCODERS.items() if preset.mp4])
+        self.update_encoder()
+        self.update_segment_length()
+        self.update_still_interval()
+        for widget in self.recorder_widgets:
+            widget.config(state='normal')
+        self.encoder_combo.config(state='readonly')
+        self.start_catalog_reconcile()
+        
+    def start_catalog_reconcile(self):
+        """在后台扫描一次录制目录，同步录制索引"""
+        def reconcile():
+            try:
+                self.recorder.reconcile_catalog()
+            except Exception as e:
+                self.log(f"同步录制索引失败: {str(e)}")
+        
+        thread = threading.Thread(target=reconcile)
+        thread.daemon = True
+        thread.start()
+        
+    def _on_video_ready(self):
+        self.fps_scale.set(self.recorder.detected_fps)
+        self.update_fps(self.recorder.detected_fps)
+        self.reprobe_btn.config(state='normal')
+        self._update_ready_state()
+        if not self.cameras:
+            self.start_camera_discovery()
+            
+    def start_camera_discovery(self, refresh=False):
+        """在后台并行探测摄像头，完成后填充选择列表"""
+        self.camera_combo.config(state='disabled')
+        self.refresh_camera_btn.config(state='disabled')
+        
+        def discover():
+            try:
+                cameras = self.recorder.discover_cameras(refresh)
+            except Exception as e:
+                self.log(f"查找摄像头失败: {str(e)}")
+                cameras = []
+            self.root.after(0, self._on_cameras_discovered, cameras)
+        
+        thread = threading.Thread(target=discover)
+        thread.daemon = True
+        thread.start()
+        
+    def _on_cameras_discovered(self, cameras):
+        self.cameras = [c for c in cameras if c.available]
+        self._fill_camera_choices()
+        unavailable = [c.describe() for c in cameras if not c.available]
+        self.log(f"找到 {len(self.cameras)} 个摄像头" +
+                 (f"（{'，'.join(unavailable)}）" if unavailable else ""))
+        
+    def _fill_camera_choices(self):
+        current = getattr(self.recorder.video_source, 'index', None)
+        values = [("* " if c.index == current else "") + c.describe() for c in self.cameras]
+        # X11 桌面上可以选择录制屏幕（全屏、窗口或区域）
+        if sys.platform.startswith('linux') and os.environ.get('DISPLAY'):
+            values.append("屏幕录制...")
+        self.camera_combo.config(values=values, state='readonly' if values else 'disabled')
+        self.refresh_camera_btn.config(state='normal')
+        selected = [v for c, v in zip(self.cameras, values) if c.index == current]
+        self.camera_choice.set(selected[0] if selected else self.recorder.video_source.describe())
+        
+    def ask_screen_target(self):
+        """询问屏幕录制的范围，返回 (region, window)，取消时返回 None"""
+        from tkinter import simpledialog
+        text = simpledialog.askstring(
+            "屏幕录制", "区域 x,y,宽,高，或窗口标题中的文字（留空录制全屏）:", parent=self.root)
+        if text is None:
+            return None
+        text = text.strip().replace('，', ',')
+        if not text:
+            return None, None
+        parts = text.split(',')
+        if len(parts) == 4:
+            try:
+                return tuple(int(p) for p in parts), None
+            except ValueError:
+                pass
+        return None, text
+        
+    def on_camera_selected(self, event=None):
+        """切换主摄像头，在后台重新初始化"""
+        index = self.camera_combo.current()
+        if index < 0 or self.recorder.recording:
+            return
+        if index >= len(self.cameras):
+            target = self.ask_screen_target()
+            if target is None:
+                self._fill_camera_choices()
+                return
+            select = lambda: self.recorder.select_screen(*target)
+        else:
+            camera = self.cameras[index]
+            if camera.index == getattr(self.recorder.video_source, 'index', None):
+                return
+            width, height = 1280, 720
+            mode = camera.best_mode(width, height)
+            if mode is not None:
+                width, height = mode[0], mode[1]
+            select = lambda: self.recorder.select_camera(camera.index, width, height)
+        self.start_btn.config(state='disabled')
+        self.camera_combo.config(state='disabled')
+        self.status_label.config(text="正在切换视频来源...")
+        
+        def switch():
+            try:
+                select()
+                self.root.after(0, self._on_camera_switched, None)
+            except Exception as e:
+                self.root.after(0, self._on_camera_switched, e)
+        
+        thread = threading.Thread(target=switch)
+        thread.daemon = True
+        thread.start()
+        
+    def _on_camera_switched(self, error):
+        if error is not None:
+            self.log(f"切换摄像头失败: {str(error)}")
+            self.status_label.config(text="摄像头不可用")
+        else:
+            self._on_video_ready()
+            if self.recorder.audio_ready:
+                self.apply_stored_offset()
+        self._fill_camera_choices()
+        
+    def _on_audio_ready(self):
+        self._update_ready_state()
+        # 录制前就开始监听，无声或削波的输入可以提前发现
+        try:
+            self.recorder.start_monitor()
+        except Exception as e:
+            self.log(f"无法监听音频输入: {str(e)}")
+        self.refresh_level_meter()
+        self.apply_stored_offset()
+        
+    def apply_stored_offset(self):
+        """使用当前设备组合上次校准的音频延迟"""
+        delay = self.recorder.stored_av_offset()
+        if delay is not None:
+            self.delay_scale.set(delay)
+            self.update_delay(delay)
+            
+    def calibrate_av(self):
+        """录制校准片段，自动检测音画偏移"""
+        if self.recorder.recording:
+            messagebox.showwarning("提示", "请先停止录制！")
+            return
+        if not messagebox.askokcancel("音画校准", "将录制 5 秒校准片段。\n"
+                                      "开始后请在镜头前清晰地拍手 2~3 次，"
+                                      "或对着镜头闪几下手机闪光灯并同时发出声音。"):
+            return
+        self.start_btn.config(state='disabled')
+        self.calibrate_btn.config(state='disabled')
+        self.status_label.config(text="正在校准，请拍手...")
+        
+        def calibrate():
+            try:
+                result = self.recorder.calibrate_av_offset()
+                self.root.after(0, self._on_calibrated, result, None)
+            except Exception as e:
+                self.root.after(0, self._on_calibrated, None, e)
+        
+        thread = threading.Thread(target=calibrate)
+        thread.daemon = True
+        thread.start()
+        
+    def _on_calibrated(self, result, error):
+        self.start_btn.config(state='normal')
+        self.calibrate_btn.config(state='normal')
+        self.status_label.config(text="就绪")
+        if error is not None:
+            self.log(f"音画校准失败: {str(error)}")
+        elif result.reliable:
+            delay = min(max(result.delay_ms, -500), 500)
+            self.delay_scale.set(delay)
+            self.update_delay(delay)
+        else:
+            messagebox.showinfo("音画校准", "没有检测到清晰的拍手或闪光，请靠近镜头重试。")
+        
+    def refresh_level_meter(self):
+        """按固定频率（20Hz）刷新电平表"""
+        if self.recorder is None:
+            return
+        levels = self.recorder.level_meter.read()
+        canvas = self.level_canvas
+        width, height = int(canvas['width']), int(canvas['height'])
+        channels = len(levels['rms_db'])
+        bar = max((height - 2) // channels - 2, 2)
+        
+        def x(db):
+            # 显示 -60 ~ 0 dBFS
+            return int(width * min(max((db + 60.0) / 60.0, 0.0), 1.0))
+        
+        canvas.delete("all")
+        for i in range(channels):
+            top = 2 + i * (bar + 2)
+            rms, peak, hold = levels['rms_db'][i], levels['peak_db'][i], levels['hold_db'][i]
+            color = "#e04040" if peak > -3 else "#e0c040" if peak > -12 else "#40c040"
+            canvas.create_rectangle(0, top + bar // 4, x(peak), top + bar - bar // 4,
+                                    fill="#307030", width=0)
+            canvas.create_rectangle(0, top, x(rms), top + bar, fill=color, width=0)
+            canvas.create_line(x(hold), top, x(hold), top + bar, fill="white")
+        for db in (-48, -24, -12, -6):
+            canvas.create_line(x(db), height - 3, x(db), height, fill="#808080")
+        
+        if levels['clipping']:
+            self.level_status.config(text=f"削波 {levels['clips']}", fg="red")
+        elif levels['silent']:
+            self.level_status.config(text="无输入", fg="orange")
+        else:
+            self.level_status.config(text=f"{max(levels['rms_db']):.0f} dB", fg="black")
+        self.root.after(50, self.refresh_level_meter)
+        
+    def _on_device_error(self, name, error):
+        self.log(f"{name}初始化失败: {error}")
+        self.status_label.config(text=f"{name}不可用")
+        if self.timer is not None:
+            self.log(self.timer.summary("初始化结束"))
+        
+    def _update_ready_state(self):
+        """摄像头和音频设备都就绪后才允许开始录制"""
+        if self.recorder.video_ready and self.recorder.audio_ready:
+            self.start_btn.config(state='normal')
+            self.calibrate_btn.config(state='normal')
+            self.status_label.config(text="就绪")
+            if self.timer is not None:
+                self.log(self.timer.summary())
+                self.timer = None
         
     def setup_ui(self):
         # 在左侧控制面板中添加控件
         
+        # 摄像头选择（后台探测完成后填充）
+        device_frame = tk.LabelFrame(self.control_panel, text="视频设备")
+        device_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.camera_choice = tk.StringVar(value="正在查找摄像头...")
+        self.camera_combo = ttk.Combobox(device_frame, textvariable=self.camera_choice,
+                                         state='disabled', width=28)
+        self.camera_combo.pack(side=tk.LEFT, padx=5, pady=5)
+        self.camera_combo.bind('<<ComboboxSelected>>', self.on_camera_selected)
+        self.refresh_camera_btn = ttk.Button(device_frame, text="刷新", width=5, state='disabled',
+                                             command=lambda: self.start_camera_discovery(True))
+        self.refresh_camera_btn.pack(side=tk.LEFT, padx=5)
+        self.cameras = []
+        
+        # 音频电平表（RMS 填充条 + 峰值条 + 峰值保持线）
+        level_frame = tk.LabelFrame(self.control_panel, text="音频电平")
+        level_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.level_canvas = tk.Canvas(level_frame, width=260, height=30, bg="#202020",
+                                      highlightthickness=0)
+        self.level_canvas.pack(side=tk.LEFT, padx=5, pady=5)
+        self.level_status = tk.Label(level_frame, text="", width=8)
+        self.level_status.pack(side=tk.LEFT, padx=5)
+        self.level_status.bind('<Button-1>', lambda e: self.recorder and self.recorder.level_meter.reset_clips())
+        
         # 合并方式选择框架
         merge_frame = tk.LabelFrame(self.control_panel, text="合并设置")
         merge_frame.pack(fill=tk.X, padx=5, pady=5)
         
-        tk.Label(merge_frame, text="合并方式:").pack(side=tk.LEFT, padx=5)
+        merge_option_frame = tk.Frame(merge_frame)
+        merge_option_frame.pack(fill=tk.X)
+        tk.Label(merge_option_frame, text="合并方式:").pack(side=tk.LEFT, padx=5)
         self.merge_combo = ttk.Combobox(
-            merge_frame,
+            merge_option_frame,
             textvariable=self.merge_method,
-            values=["FFmpeg", "MoviePy"],
+            values=["Remux", "FFmpeg", "MoviePy"],
             state="readonly",
             width=10
         )
         self.merge_combo.pack(side=tk.LEFT, padx=5, pady=5)
         
+        # 同时运行的合并任务数
+        tk.Label(merge_option_frame, text="并发:").pack(side=tk.LEFT)
+        self.merge_workers = tk.StringVar(value="2")
+        ttk.Spinbox(merge_option_frame, from_=1, to=8, width=3, state="readonly",
+                    textvariable=self.merge_workers,
+                    command=self.update_merge_workers).pack(side=tk.LEFT, padx=5)
+        
+        # 合并任务列表
+        self.merge_tree = ttk.Treeview(merge_frame, columns=("name", "status"),
+                                       show="headings", height=4)
+        self.merge_tree.heading("name", text="文件")
+        self.merge_tree.heading("status", text="状态")
+        self.merge_tree.column("name", width=170)
+        self.merge_tree.column("status", width=90)
+        self.merge_tree.pack(fill=tk.X, padx=5, pady=2)
+        
+        merge_button_frame = tk.Frame(merge_frame)
+        merge_button_frame.pack(fill=tk.X)
+        self.merge_all_btn = ttk.Button(merge_button_frame, text="合并全部未合并录制",
+                                        command=self.merge_all, state='disabled')
+        self.merge_all_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=2)
+        self.cancel_merge_btn = ttk.Button(merge_button_frame, text="取消所选",
+                                           command=self.cancel_merge, state='disabled')
+        self.cancel_merge_btn.pack(side=tk.LEFT, padx=5, pady=2)
+        
+        # 输出方式选择框架
+        output_frame = tk.LabelFrame(self.control_panel, text="输出方式")
+        output_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.output_mode = tk.StringVar(value="separate")
+        self.separate_radio = ttk.Radiobutton(output_frame, text="分别保存", variable=self.output_mode,
+                                              value="separate", command=self.update_output_mode)
+        self.separate_radio.pack(side=tk.LEFT, padx=5)
+        self.muxed_radio = ttk.Radiobutton(output_frame, text="实时合流", variable=self.output_mode,
+                                           value="muxed", command=self.update_output_mode)
+        self.muxed_radio.pack(side=tk.LEFT, padx=5)
+        
+        # 分段时长（分钟），0 表示不分段
+        segment_frame = tk.Frame(output_frame)
+        segment_frame.pack(side=tk.LEFT, padx=5)
+        tk.Label(segment_frame, text="分段(分钟):").pack(side=tk.LEFT)
+        self.segment_minutes = tk.StringVar(value="0")
+        self.segment_spin = ttk.Spinbox(segment_frame, from_=0, to=120, width=4,
+                                        textvariable=self.segment_minutes,
+                                        command=self.update_segment_length)
+        self.segment_spin.pack(side=tk.LEFT)
+        self.segment_spin.bind('<FocusOut>', lambda e: self.update_segment_length())
+        
+        # 截图间隔（秒），0 表示不截图
+        still_frame = tk.Frame(output_frame)
+        still_frame.pack(side=tk.LEFT, padx=5)
+        tk.Label(still_frame, text="截图(秒):").pack(side=tk.LEFT)
+        self.still_seconds = tk.StringVar(value="0")
+        self.still_spin = ttk.Spinbox(still_frame, from_=0, to=600, width=4,
+                                      textvariable=self.still_seconds,
+                                      command=self.update_still_interval)
+        self.still_spin.pack(side=tk.LEFT)
+        self.still_spin.bind('<FocusOut>', lambda e: self.update_still_interval())
+        
+        # 静止跳帧：画面几乎不变的帧不编码，输出可变帧率视频
+        self.motion_adaptive = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_frame, text="静止跳帧", variable=self.motion_adaptive,
+                        command=self.update_motion_adaptive).pack(side=tk.LEFT, padx=5)
+        
+        # 过载降级：CPU 紧张时降低预览帧率、暂停截图，仍不够时隔帧编码（输出帧率会降低）
+        self.load_shedding = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_frame, text="过载降级", variable=self.load_shedding,
+                        command=self.update_load_shedding).pack(side=tk.LEFT, padx=5)
+        
+        # 视频编码方式，auto 按本机校准结果选择
+        encoder_frame = tk.LabelFrame(self.control_panel, text="视频编码")
+        encoder_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.encoder = tk.StringVar(value="opencv_mp4v")
+        self.encoder_combo = ttk.Combobox(encoder_frame, textvariable=self.encoder, state='disabled', width=16)
+        self.encoder_combo.pack(side=tk.LEFT, padx=5, pady=5)
+        self.encoder_combo.bind('<<ComboboxSelected>>', lambda e: self.update_encoder())
+        self.calibrate_encoder_btn = ttk.Button(encoder_frame, text="校准编码器",
+                                                command=self.calibrate_encoders, state='disabled')
+        self.calibrate_encoder_btn.pack(side=tk.LEFT, padx=5)
+        
+        # 附加摄像头（与主摄像头同时录制到各自的文件）
+        camera_frame = tk.LabelFrame(self.control_panel, text="附加摄像头")
+        camera_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(camera_frame, text="索引或地址(逗号分隔):").pack(side=tk.LEFT, padx=5)
+        self.extra_cameras = tk.StringVar(value="")
+        self.extra_camera_entry = ttk.Entry(camera_frame, textvariable=self.extra_cameras, width=10)
+        self.extra_camera_entry.pack(side=tk.LEFT, padx=5, pady=5)
+        
         # 控制按钮框架
         button_frame = tk.LabelFrame(self.control_panel, text="操作控制")
         button_frame.pack(fill=tk.X, padx=5, pady=5)
         
         # 按钮垂直排列，统一使用 ttk.Button
-        self.start_btn = ttk.Button(button_frame, text="开始录制", command=self.start_recording)
+        self.start_btn = ttk.Button(button_frame, text="开始录制", command=self.start_recording, state='disabled')
         self.start_btn.pack(fill=tk.X, padx=5, pady=2)
         
         self.stop_btn = ttk.Button(button_frame, text="停止录制", command=self.stop_recording, state='disabled')
@@ -84,6 +526,10 @@ class RecorderApp:
         self.merge_button = ttk.Button(button_frame, text="合并视频", command=self.merge_videos, state=tk.DISABLED)
         self.merge_button.pack(fill=tk.X, padx=5, pady=2)
         
+        self.stats_btn = ttk.Button(button_frame, text="性能统计", command=self.show_stats, state='disabled')
+        self.stats_btn.pack(fill=tk.X, padx=5, pady=2)
+        self.stats_window = None
+        
         self.quit_btn = ttk.Button(button_frame, text="退出", command=self.quit_app)
         self.quit_btn.pack(fill=tk.X, padx=5, pady=2)
         
@@ -91,23 +537,9 @@ class RecorderApp:
         sync_frame = tk.LabelFrame(self.control_panel, text="同步控制")
         sync_frame.pack(fill=tk.X, padx=5, pady=5)
         
-        # 同步模式选择
-        sync_mode_frame = tk.Frame(sync_frame)
-        sync_mode_frame.pack(fill=tk.X, padx=5, pady=2)
-        tk.Label(sync_mode_frame, text="同步模式:").pack(side=tk.LEFT, padx=5)
-        self.sync_mode = tk.StringVar(value="delay")
-        ttk.Radiobutton(sync_mode_frame, text="音频延迟", variable=self.sync_mode, 
-                       value="delay", command=self.update_sync_mode).pack(side=tk.LEFT)
-        ttk.Radiobutton(sync_mode_frame, text="帧率调整", variable=self.sync_mode, 
-                       value="fps", command=self.update_sync_mode).pack(side=tk.LEFT)
-        
-        # 创建一个固定高度的容器来放置控制条
-        self.sync_controls_container = tk.Frame(sync_frame, height=50)
-        self.sync_controls_container.pack(fill=tk.X, padx=5, pady=2)
-        self.sync_controls_container.pack_propagate(False)
-        
-        # 音频延迟控制
-        self.delay_frame = tk.Frame(self.sync_controls_container)
+        # 音频延迟控制（音画同步由时间戳完成，这里只补偿设备固有的延迟）
+        self.delay_frame = tk.Frame(sync_frame)
+        self.delay_frame.pack(fill=tk.X, padx=5, pady=2)
         tk.Label(self.delay_frame, text="音频延迟(ms):").pack(side=tk.LEFT, padx=5)
         self.delay_scale = ttk.Scale(
             self.delay_frame,
@@ -120,21 +552,28 @@ class RecorderApp:
         self.delay_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.delay_value_label = tk.Label(self.delay_frame, text="0 ms")
         self.delay_value_label.pack(side=tk.LEFT, padx=5)
+        self.calibrate_btn = ttk.Button(self.delay_frame, text="自动校准", width=8,
+                                        command=self.calibrate_av, state='disabled')
+        self.calibrate_btn.pack(side=tk.LEFT, padx=5)
         
         # 帧率控制
-        self.fps_frame = tk.Frame(self.sync_controls_container)
+        self.fps_frame = tk.Frame(sync_frame)
+        self.fps_frame.pack(fill=tk.X, padx=5, pady=2)
         tk.Label(self.fps_frame, text="视频帧率:").pack(side=tk.LEFT, padx=5)
         self.fps_scale = ttk.Scale(
             self.fps_frame,
             from_=15.0,
             to=60.0,
             orient=tk.HORIZONTAL,
-            value=self.recorder.detected_fps,
+            value=30.0,
             command=self.update_fps
         )
         self.fps_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        self.fps_value_label = tk.Label(self.fps_frame, text=f"{self.recorder.detected_fps:.1f} fps")
+        self.fps_value_label = tk.Label(self.fps_frame, text="30.0 fps")
         self.fps_value_label.pack(side=tk.LEFT, padx=5)
+        self.reprobe_btn = ttk.Button(self.fps_frame, text="重新检测", width=8,
+                                      command=self.reprobe_fps, state='disabled')
+        self.reprobe_btn.pack(side=tk.LEFT, padx=5)
         
         # 缓冲区大小控制
         self.buffer_frame = tk.Frame(self.control_panel)
@@ -151,25 +590,63 @@ class RecorderApp:
         self.buffer_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.buffer_value_label = tk.Label(self.buffer_frame, text="1024")
         self.buffer_value_label.pack(side=tk.LEFT, padx=5)
+        # 自动调整时滑块为下限，出现溢出或回调抖动较大时自动增大
+        self.adaptive_buffer = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.buffer_frame, text="自动", variable=self.adaptive_buffer,
+                        command=self.update_adaptive_buffer).pack(side=tk.LEFT)
+        
+        # 预览帧率控制（0 表示关闭预览）
+        self.preview_frame = tk.Frame(self.control_panel)
+        self.preview_frame.pack(fill=tk.X, padx=5, pady=2)
+        tk.Label(self.preview_frame, text="预览帧率:").pack(side=tk.LEFT, padx=5)
+        self.preview_scale = ttk.Scale(
+            self.preview_frame,
+            from_=0,
+            to=30,
+            orient=tk.HORIZONTAL,
+            value=15,
+            command=self.update_preview_fps
+        )
+        self.preview_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.preview_value_label = tk.Label(self.preview_frame, text="15 fps")
+        self.preview_value_label.pack(side=tk.LEFT, padx=5)
         
         # 添加重置按钮
         self.reset_btn = ttk.Button(
             self.control_panel,
             text="重置设置",
-            command=self.reset_settings
+            command=self.reset_settings,
+            state='disabled'
         )
         self.reset_btn.pack(pady=5)
         
-        # 在所有控件创建完成后，调用update_sync_mode来显示正确的控制面板
-        self.update_sync_mode()
+        # 录制器创建后才能使用的控件
+        self.recorder_widgets = [self.merge_all_btn, self.cancel_merge_btn, self.reset_btn, self.stats_btn,
+                                 self.calibrate_encoder_btn]
+        
+        # 定期刷新合并任务列表
+        self.refresh_merge_jobs()
         
     def start_recording(self):
+        self.update_segment_length()
+        self.update_still_interval()
+        if not self.update_extra_cameras():
+            return
         self.recorder.start_recording()
         self.status_label.config(text="正在录制...")
         self.start_btn.config(state='disabled')
         self.stop_btn.config(state='normal')
         self.merge_button.config(state='disabled')  # 录制时禁用合并按钮
         self.merge_combo.config(state='disabled')
+        self.separate_radio.config(state='disabled')
+        self.muxed_radio.config(state='disabled')
+        self.segment_spin.config(state='disabled')
+        self.still_spin.config(state='disabled')
+        self.extra_camera_entry.config(state='disabled')
+        self.camera_combo.config(state='disabled')
+        self.refresh_camera_btn.config(state='disabled')
+        self.calibrate_btn.config(state='disabled')
+        self.refresh_camera_stats()
         
     def stop_recording(self):
         """停止录制"""
@@ -180,6 +657,95 @@ class RecorderApp:
         self.has_recordings = True  # 标记已有录制
         self.merge_button.config(state='normal')  # 启用合并按钮
         self.merge_combo.config(state='normal')
+        self.separate_radio.config(state='normal')
+        self.muxed_radio.config(state='normal')
+        self.segment_spin.config(state='normal')
+        self.still_spin.config(state='normal')
+        self.extra_camera_entry.config(state='normal')
+        self.camera_combo.config(state='readonly' if self.cameras else 'disabled')
+        self.refresh_camera_btn.config(state='normal')
+        self.calibrate_btn.config(state='normal')
+        
+    def update_extra_cameras(self):
+        """按输入的索引或 MJPEG 地址设置附加摄像头，输入有误时返回 False"""
+        from src.recorder.sources import CameraSource
+        from src.recorder.mjpeg import MJPEGStreamSource
+        text = self.extra_cameras.get().replace('，', ',')
+        try:
+            entries = [part.strip() if part.strip().startswith('http') else int(part)
+                       for part in text.split(',') if part.strip()]
+        except ValueError:
+            messagebox.showwarning("提示", "附加摄像头请输入用逗号分隔的索引或 http 地址，例如 1,http://192.168.1.5:8080/video")
+            return False
+        primary = getattr(self.recorder.video_source, 'index', None)
+        current = [getattr(source, 'index', getattr(source, 'url', None))
+                   for source in self.recorder.extra_video_sources]
+        if entries != current:
+            self.recorder.clear_cameras()
+            for i, entry in enumerate(entries):
+                if entry == primary or entry in entries[:i]:
+                    continue
+                if isinstance(entry, str):
+                    self.recorder.add_camera(MJPEGStreamSource(entry))
+                else:
+                    self.recorder.add_camera(CameraSource(entry, 1280, 720))
+        return True
+        
+    def refresh_camera_stats(self):
+        """录制期间每秒刷新各路摄像头的帧率和丢帧数"""
+        if not self.recorder.recording:
+            return
+        lines = []
+        for s in self.recorder.camera_stats():
+            line = f"{s['name']}: {s['fps']:5.1f} fps  采集 {s['captured']}  丢弃 {s['dropped']}"
+            source = s.get('source')
+            if source and 'jitter_ms' in source:
+                line += f"  抖动 {source['jitter_ms']:.0f}ms  重连 {source['reconnects']}"
+            elif source and 'grab_ms' in source:
+                line += f"  抓取 {source['grab_ms']:.1f}ms  未变化 {source['unchanged']}"
+            lines.append(line)
+        audio = self.recorder.audio_stats()
+        if audio:
+            lines.append(f"audio: 缓冲 {audio['frames_per_buffer']}  抖动 {audio['jitter_ms']:.1f}ms  "
+                         f"溢出 {audio['input_overflows']}/{audio['overruns']}")
+        self.camera_stats_label.config(text="\n".join(lines))
+        self.root.after(1000, self.refresh_camera_stats)
+        
+    def show_stats(self):
+        """各阶段耗时分布和计数的统计面板，每秒刷新"""
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("性能统计")
+        columns = ("count", "mean", "p50", "p95", "p99", "max")
+        tree = ttk.Treeview(window, columns=columns, height=12)
+        tree.heading("#0", text="指标")
+        tree.column("#0", width=200)
+        for column, title in zip(columns, ("次数", "平均", "p50", "p95", "p99", "最大")):
+            tree.heading(column, text=title)
+            tree.column(column, width=70, anchor=tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        gauges = tk.Label(window, justify=tk.LEFT, font=("Courier", 9), anchor=tk.W)
+        gauges.pack(fill=tk.X, padx=5, pady=5)
+        self.stats_window = window
+        
+        def refresh():
+            if not window.winfo_exists():
+                return
+            snapshot = self.recorder.metrics_snapshot()
+            for name, h in snapshot['histograms'].items():
+                values = (h['count'], f"{h['mean']:.2f}", f"{h['p50']:.2f}", f"{h['p95']:.2f}",
+                          f"{h['p99']:.2f}", f"{h['max']:.2f}")
+                if tree.exists(name):
+                    tree.item(name, values=values)
+                else:
+                    tree.insert("", tk.END, iid=name, text=name, values=values)
+            items = list(snapshot['gauges'].items()) + list(snapshot['counters'].items())
+            gauges.config(text="\n".join(f"{name:<28}{value:>12.2f}" for name, value in items))
+            window.after(1000, refresh)
+        
+        refresh()
         
     def merge_videos(self):
         """合并视频"""
@@ -202,18 +768,58 @@ class RecorderApp:
             self.log(f"合并失败: {str(e)}")
             messagebox.showerror("错误", f"合并失败：{str(e)}")
             
+    def merge_all(self):
+        """把所有尚未合并的录制加入合并队列"""
+        try:
+            self.recorder.merge_videos(self.merge_method.get())
+        except Exception as e:
+            self.log(f"合并失败: {str(e)}")
+            messagebox.showerror("错误", f"合并失败：{str(e)}")
+            
+    def cancel_merge(self):
+        """取消列表中选中的合并任务"""
+        selection = self.merge_tree.selection()
+        if not selection:
+            messagebox.showinfo("提示", "请先在列表中选择要取消的合并任务")
+            return
+        for item in selection:
+            if not self.recorder.cancel_merge(int(item)):
+                self.log("该任务已结束或无法中途取消")
+                
+    def update_merge_workers(self):
+        """更新同时运行的合并任务数"""
+        workers = int(self.merge_workers.get())
+        if self.recorder is None:
+            return
+        self.recorder.set_merge_workers(workers)
+        self.log(f"合并并发数: {workers}")
+        
+    def refresh_merge_jobs(self):
+        """在主线程中刷新合并任务的状态和进度"""
+        jobs = self.recorder.merge_jobs() if self.recorder is not None else []
+        for job in jobs:
+            item = str(job.id)
+            if self.merge_tree.exists(item):
+                self.merge_tree.item(item, values=(job.name, job.describe()))
+            else:
+                self.merge_tree.insert("", tk.END, iid=item, values=(job.name, job.describe()))
+        self.root.after(500, self.refresh_merge_jobs)
+            
     def quit_app(self):
         try:
-            if self.recorder.recording:
-                self.stop_recording()
-            # 确保释放所有资源    
-            if hasattr(self.recorder, 'cap'):
-                self.recorder.cap.release()
-            if hasattr(self.recorder, 'video_writer'):
-                self.recorder.video_writer.release()
-            if hasattr(self.recorder, 'audio'):
-                self.recorder.audio.terminate()
-            cv2.destroyAllWindows()
+            if self.recorder is not None:
+                if self.recorder.recording:
+                    self.stop_recording()
+                # 取消还在进行的合并和帧率检测
+                for job in self.recorder.merge_jobs():
+                    self.recorder.cancel_merge(job.id)
+                self.recorder.stop_fps_probe()
+                self.recorder.stop_monitor()
+                # 确保释放所有资源    
+                self.recorder.video_source.release()
+                self.recorder.audio_source.close()
+            if 'cv2' in sys.modules:
+                sys.modules['cv2'].destroyAllWindows()
             self.root.destroy()  # 使用destroy代替quit
         except Exception as e:
             print(f"退出时发生错误: {e}")
@@ -223,6 +829,8 @@ class RecorderApp:
         self.root.mainloop()
 
     def show_sync_settings(self):
+        if self.recorder is None:
+            return
         settings_window = tk.Toplevel(self.root)
         settings_window.title("同步设置")
         
@@ -241,19 +849,118 @@ class RecorderApp:
         
         tk.Button(settings_window, text="应用", command=apply_settings).pack()
 
+    def update_output_mode(self):
+        """更新输出方式"""
+        mode = self.output_mode.get()
+        if self.recorder is None:
+            return
+        self.recorder.output_mode = mode
+        self.log("输出方式: " + ("实时合流" if mode == "muxed" else "分别保存"))
+
+    def update_encoder(self):
+        """更新视频编码方式（下一次开始录制时生效）"""
+        if self.recorder is None:
+            return
+        if self.encoder.get() != self.recorder.encoder:
+            self.recorder.encoder = self.encoder.get()
+            self.log(f"视频编码: {self.recorder.encoder}")
+            
+    def calibrate_encoders(self):
+        """在后台实测各编码方式，完成后切换到自动选择"""
+        if self.recorder.recording:
+            messagebox.showwarning("提示", "请先停止录制！")
+            return
+        if not self.recorder.video_ready:
+            messagebox.showwarning("提示", "摄像头尚未就绪！")
+            return
+        self.calibrate_encoder_btn.config(state='disabled')
+        self.start_btn.config(state='disabled')
+        
+        def calibrate():
+            try:
+                self.recorder.calibrate_encoders()
+                error = None
+            except Exception as e:
+                error = e
+            self.root.after(0, self._on_encoders_calibrated, error)
+        
+        thread = threading.Thread(target=calibrate)
+        thread.daemon = True
+        thread.start()
+        
+    def _on_encoders_calibrated(self, error):
+        self.calibrate_encoder_btn.config(state='normal')
+        self._update_ready_state()
+        if error is not None:
+            self.log(f"编码器校准失败: {str(error)}")
+        else:
+            self.encoder.set('auto')
+            self.update_encoder()
+            
+    def update_still_interval(self):
+        """更新录制时的截图间隔"""
+        try:
+            seconds = max(float(self.still_seconds.get()), 0)
+        except ValueError:
+            seconds = 0
+            self.still_seconds.set("0")
+        if self.recorder is None:
+            return
+        if seconds != self.recorder.still_interval:
+            self.recorder.still_interval = seconds
+            self.log(f"录制时每 {seconds:g} 秒保存一张截图" if seconds else "录制截图已关闭")
+
+    def update_motion_adaptive(self):
+        """开关静止跳帧（下一次开始录制时生效）"""
+        if self.recorder is None:
+            return
+        self.recorder.motion_adaptive = self.motion_adaptive.get()
+        self.log("静止跳帧已" + ("开启" if self.recorder.motion_adaptive else "关闭"))
+
+    def update_load_shedding(self):
+        """开关过载降级"""
+        if self.recorder is None:
+            return
+        self.recorder.load_shedding = self.load_shedding.get()
+        self.log("过载降级已" + ("开启，CPU 不足时可能隔帧编码" if self.recorder.load_shedding else "关闭"))
+
+    def update_segment_length(self):
+        """更新分段时长"""
+        try:
+            minutes = max(float(self.segment_minutes.get()), 0)
+        except ValueError:
+            minutes = 0
+            self.segment_minutes.set("0")
+        if self.recorder is None:
+            return
+        if minutes * 60 != self.recorder.segment_seconds:
+            self.recorder.segment_seconds = minutes * 60
+            self.log(f"分段时长: {minutes:g} 分钟" if minutes else "分段录制已关闭")
+
     def update_buffer(self, value):
         """更新音频缓冲区大小"""
         buffer_size = int(float(value))
         self.buffer_value_label.config(text=str(buffer_size))
-        if hasattr(self.recorder, 'buffer_size'):
-            self.recorder.buffer_size = buffer_size
+        if self.recorder is not None:
+            self.recorder.set_buffer_size(buffer_size)
             self.log(f"缓冲区大小已调整为: {buffer_size}")
             
+    def update_adaptive_buffer(self):
+        if self.recorder is not None:
+            self.recorder.adaptive_buffer = self.adaptive_buffer.get()
+            
+    def update_preview_fps(self, value):
+        """更新预览帧率"""
+        preview_fps = int(float(value))
+        self.preview_value_label.config(text=f"{preview_fps} fps")
+        if self.recorder is not None:
+            self.recorder.set_preview_fps(preview_fps)
+            
     def update_delay(self, value):
         """更新音频延迟"""
         delay_value = int(float(value))
         self.delay_value_label.config(text=f"{delay_value} ms")
-        if hasattr(self.recorder, 'audio_delay'):
+        if self.recorder is not None:
             self.recorder.audio_delay = delay_value
             self.log(f"音频延迟已调整为: {delay_value}ms")
             
@@ -261,11 +968,26 @@ class RecorderApp:
         """更新帧率设置"""
         try:
             fps = float(fps)
-            self.recorder.fps = fps
             self.fps_value_label.config(text=f"{fps:.1f} fps")
+            if self.recorder is not None:
+                self.recorder.fps = fps
         except ValueError:
             pass
 
+    def on_fps_detected(self, fps):
+        """后台帧率检测完成"""
+        if not self.recorder.recording:
+            self.fps_scale.set(fps)
+            self.update_fps(fps)
+            
+    def reprobe_fps(self):
+        """忽略缓存，重新实测摄像头帧率"""
+        if self.recorder.recording:
+            messagebox.showwarning("提示", "请先停止录制！")
+            return
+        if not self.recorder.start_fps_probe():
+            self.log("当前视频来源不需要检测帧率，或检测正在进行")
+
     def reset_settings(self):
         """重置所有设置"""
         if self.recorder.recording:  # 使用 recorder 的 recording 属性
@@ -280,40 +1002,54 @@ class RecorderApp:
         self.update_fps(self.recorder.detected_fps)
         
         # 重置其他设置
-        self.sync_mode.set("delay")
-        self.update_sync_mode()
         self.delay_scale.set(0)
         self.update_delay(0)
         self.buffer_scale.set(1024)
         self.update_buffer(1024)
+        self.adaptive_buffer.set(True)
+        self.update_adaptive_buffer()
+        self.preview_scale.set(15)
+        self.update_preview_fps(15)
+        self.output_mode.set("separate")
+        self.update_output_mode()
+        self.segment_minutes.set("0")
+        self.update_segment_length()
+        self.motion_adaptive.set(False)
+        self.update_motion_adaptive()
+        self.load_shedding.set(False)
+        self.update_load_shedding()
+        self.still_seconds.set("0")
+        self.update_still_interval()
+        self.encoder.set("opencv_mp4v")
+        self.update_encoder()
         
         self.merge_combo.config(state='normal')
         self.log("所有设置已重置为默认值")
         
     def log(self, message):
-        """添加日志"""
-        if hasattr(self, 'log_text'):
+        """添加日志，可以在任意线程中调用"""
+        if threading.current_thread() is not threading.main_thread():
+            self.pending_logs.put(message)
+            return
+        self._drain_logs()
+        self.log_text.insert(tk.END, f"{message}\n")
+        self.log_text.see(tk.END)
+
+    def flush_logs(self):
+        """定时把后台线程（包括录制器工作线程）的日志写入文本框"""
+        self._drain_logs()
+        self.root.after(100, self.flush_logs)
+
+    def _drain_logs(self):
+        while True:
+            try:
+                message = self.pending_logs.get_nowait()
+            except queue.Empty:
+                break
             self.log_text.insert(tk.END, f"{message}\n")
             self.log_text.see(tk.END)
-
-    def update_sync_mode(self):
-        """更新同步模式"""
-        mode = self.sync_mode.get()
-        # 确保先隐藏所有控制面板
-        if hasattr(self, 'fps_frame'):
-            self.fps_frame.pack_forget()
-        if hasattr(self, 'delay_frame'):
-            self.delay_frame.pack_forget()
-        
-        # 根据模式显示对应的控制面板
-        if mode == "delay":
-            self.delay_frame.pack(fill=tk.X, expand=True)
-        else:
-            self.fps_frame.pack(fill=tk.X, expand=True)
-        
-        if hasattr(self, 'recorder'):
-            self.recorder.sync_mode = mode
-            self.log(f"切换到{mode}同步模式")
+        if self.recorder is not None:
+            self.recorder.flush_logs()
 
 if __name__ == "__main__":
     app = RecorderApp()
@@ -0,0 +1,85 @@
+"""查询录制目录索引
+
+用法:
+    python recordings.py                      # 列出最近的录制
+    python recordings.py --unmerged           # 只列出还没有合并的录制
+    python recordings.py --rescan             # 先扫描录制目录同步索引
+    python recordings.py --show 20240101_120000 --json
+"""
+import argparse
+import json
+import os
+import sys
+
+from src.recorder.catalog import RecordingCatalog, MERGE_PENDING, MERGE_FAILED
+
+
+def format_size(size):
+    size = float(size or 0)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f}{unit}" if unit != 'B' else f"{int(size)}B"
+        size /= 1024
+
+
+def format_row(row):
+    duration = f"{row['duration']:.1f}s" if row['duration'] is not None else "-"
+    resolution = f"{row['width']}x{row['height']}" if row['width'] else "-"
+    fps = f"{row['fps']:.0f}fps" if row['fps'] else "-"
+    size = format_size((row['video_bytes'] or 0) + (row['audio_bytes'] or 0))
+    return (f"{row['session']:<17}{row['mode'] or '-':<10}{duration:>9}  {resolution:>10} {fps:>6}"
+            f"  {size:>9}  {row['segments'] or 0:>4}  {row['merge_status'] or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询录制目录索引")
+    parser.add_argument('--dir', default=os.path.join(os.getcwd(), "recordings"), help="录制目录")
+    parser.add_argument('--unmerged', action='store_true', help="只列出还没有合并的录制")
+    parser.add_argument('--rescan', action='store_true', help="先扫描录制目录同步索引")
+    parser.add_argument('--limit', type=int, default=50, help="最多列出的数量（0 为不限）")
+    parser.add_argument('--show', metavar='SESSION', help="显示一次录制的全部字段")
+    parser.add_argument('--json', action='store_true', help="以 JSON 格式输出")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"录制目录不存在: {args.dir}", file=sys.stderr)
+        return 1
+
+    catalog = RecordingCatalog(args.dir)
+    try:
+        if args.rescan:
+            added, updated, removed = catalog.reconcile()
+            print(f"新增 {added}，更新 {updated}，移除 {removed}", file=sys.stderr)
+
+        if args.show:
+            row = catalog.get(args.show)
+            if row is None:
+                print(f"找不到录制: {args.show}", file=sys.stderr)
+                return 1
+            if row['metrics']:
+                row['metrics'] = json.loads(row['metrics'])
+            if args.json:
+                print(json.dumps(row, ensure_ascii=False, indent=2))
+            else:
+                for key, value in row.items():
+                    if key != 'metrics':
+                        print(f"{key:<14}{value}")
+            return 0
+
+        status = (MERGE_PENDING, MERGE_FAILED) if args.unmerged else None
+        rows = catalog.sessions(status, limit=args.limit or None)
+        if args.json:
+            for row in rows:
+                row.pop('metrics', None)
+            print(json.dumps(rows, ensure_ascii=False, indent=2))
+        else:
+            print(f"{'会话':<15}{'模式':<8}{'时长':>8}  {'分辨率':>7} {'帧率':>4}  {'大小':>7}  {'分段':>2}  合并")
+            for row in rows:
+                print(format_row(row))
+        return 0
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
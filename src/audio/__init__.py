@@ -1 +1,2 @@
-from .audio_recorder import AudioRecorder
\ No newline at end of file
+from .audio_recorder import AudioRecorder
+from .wav_writer import StreamingWavWriter
\ No newline at end of file
@@ -1,24 +1,32 @@
-import pyaudio
-import wave
 import threading
 from datetime import datetime
 import os
+from src.audio.wav_writer import StreamingWavWriter
 
 class AudioRecorder:
     def __init__(self, output_dir):
+        # 与 MicrophoneSource 相同，用到时才导入 pyaudio，没有安装 PyAudio 时也能导入本包
+        import pyaudio
         self.output_dir = output_dir
         self.CHUNK = 1024
         self.FORMAT = pyaudio.paInt16
         self.RATE = 44100
         self.CHANNELS = 1
         self.recording = False
-        self.frames = []
+        self.writer = None
         self.audio = pyaudio.PyAudio()
         
     def start(self, device_index):
         if not self.recording:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = os.path.join(self.output_dir, f"audio_{timestamp}.wav")
+            self.writer = StreamingWavWriter(
+                filename,
+                self.CHANNELS,
+                self.audio.get_sample_size(self.FORMAT),
+                self.RATE
+            ).open()
             self.recording = True
-            self.frames = []
             self.device_index = device_index
             self.audio_thread = threading.Thread(target=self._record)
             self.audio_thread.start()
@@ -42,7 +50,7 @@ class AudioRecorder:
         while self.recording:
             try:
                 data = stream.read(self.CHUNK)
-                self.frames.append(data)
+                self.writer.write(data)
             except Exception as e:
                 print(f"录音错误: {e}")
                 break
@@ -51,20 +59,16 @@ class AudioRecorder:
         stream.close()
         
     def _save(self):
-        if not self.frames:
-            return None
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(self.output_dir, f"audio_{timestamp}.wav")
-        
         try:
-            wf = wave.open(filename, 'wb')
-            wf.setnchannels(self.CHANNELS)
-            wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
-            wf.setframerate(self.RATE)
-            wf.writeframes(b''.join(self.frames))
-            wf.close()
-            return filename
+            self.writer.close()
         except Exception as e:
             print(f"保存音频失败: {e}")
-            return None 
\ No newline at end of file
+            return None
+        if not self.writer.data_size:
+            # 没有录到任何音频，不留下空文件
+            try:
+                os.remove(self.writer.filename)
+            except OSError:
+                pass
+            return None
+        return self.writer.filename 
\ No newline at end of file
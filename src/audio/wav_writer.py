@@ -0,0 +1,129 @@
+import queue
+import struct
+import threading
+import time
+
+# WAV 头长度：RIFF + JUNK（为 ds64 预留）+ fmt + data 块头
+WAV_HEADER_SIZE = 80
+# RIFF 的 32 位长度字段上限，超过后文件头改写为 RF64
+_MAX_RIFF_SIZE = 0xFFFFFFFF
+
+
+class StreamingWavWriter:
+    """流式 WAV 写入器
+
+    音频块通过 write() 放入队列（不阻塞回调线程），由后台线程顺序写入磁盘。
+    写入线程每隔 header_interval 秒回填一次 RIFF/data 长度并 flush，
+    因此即使程序崩溃，已写入的部分也是可以正常播放的 WAV 文件。
+
+    文件头中预留一个 JUNK 块，数据超过 4GB（48kHz 立体声约 3.4 小时）时
+    原地改写为 RF64 + ds64 块保存 64 位长度，不需要移动已写入的数据。
+    """
+
+    def __init__(self, filename, channels=1, sample_width=2, rate=44100, header_interval=1.0):
+        self.filename = filename
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.header_interval = header_interval
+        self.queue = queue.Queue()
+        self.file = None
+        self.thread = None
+        self.error = None
+
+        # 统计
+        self.bytes_received = 0
+        self.data_size = 0
+        self.rf64 = False
+
+    def open(self):
+        """创建文件并启动写入线程"""
+        self.file = open(self.filename, 'wb')
+        self.file.write(self._build_header(0))
+        self.file.flush()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def write(self, data):
+        """提交一块 PCM 数据，可在音频回调中调用"""
+        self.bytes_received += len(data)
+        self.queue.put(data)
+
+    @property
+    def frames_received(self):
+        """已提交的采样帧数"""
+        return self.bytes_received // (self.channels * self.sample_width)
+
+    @property
+    def duration(self):
+        """已提交音频的时长（秒）"""
+        return self.frames_received / float(self.rate)
+
+    def close(self):
+        """写完队列中剩余的数据，回填最终文件头并关闭文件"""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        if self.error is not None:
+            raise Exception(f"写入音频文件失败: {self.error}")
+
+    def _build_header(self, data_size):
+        byte_rate = self.rate * self.channels * self.sample_width
+        block_align = self.channels * self.sample_width
+        return struct.pack(
+            '<4sI4s4sI28s4sIHHIIHH4sI',
+            b'RIFF', WAV_HEADER_SIZE - 8 + data_size, b'WAVE',
+            b'JUNK', 28, bytes(28),
+            b'fmt ', 16, 1, self.channels, self.rate,
+            byte_rate, block_align, self.sample_width * 8,
+            b'data', data_size
+        )
+
+    def _patch_header(self):
+        """回填 RIFF 和 data 块的长度，超过 32 位时改写为 RF64"""
+        riff_size = WAV_HEADER_SIZE - 8 + self.data_size
+        position = self.file.tell()
+        if riff_size > _MAX_RIFF_SIZE or self.rf64:
+            self.rf64 = True
+            frames = self.data_size // (self.channels * self.sample_width)
+            self.file.seek(0)
+            self.file.write(struct.pack('<4sI', b'RF64', 0xFFFFFFFF))
+            self.file.seek(12)
+            self.file.write(struct.pack('<4sIQQQI', b'ds64', 28, riff_size, self.data_size, frames, 0))
+            self.file.seek(WAV_HEADER_SIZE - 4)
+            self.file.write(struct.pack('<I', 0xFFFFFFFF))
+        else:
+            self.file.seek(4)
+            self.file.write(struct.pack('<I', riff_size))
+            self.file.seek(WAV_HEADER_SIZE - 4)
+            self.file.write(struct.pack('<I', self.data_size))
+        self.file.seek(position)
+        self.file.flush()
+
+    def _run(self):
+        last_patch = time.monotonic()
+        try:
+            while True:
+                try:
+                    data = self.queue.get(timeout=self.header_interval)
+                except queue.Empty:
+                    data = b''
+                if data is None:
+                    break
+                if data:
+                    self.file.write(data)
+                    self.data_size += len(data)
+                if time.monotonic() - last_patch >= self.header_interval:
+                    self._patch_header()
+                    last_patch = time.monotonic()
+        except Exception as e:
+            self.error = e
+        finally:
+            try:
+                self._patch_header()
+            finally:
+                self.file.close()
@@ -1 +1,39 @@
-from .av_recorder import AVRecorder
\ No newline at end of file
+# 各子模块在第一次访问对应名称时才导入（PEP 562），
+# 导入 src.recorder.xxx 或 AVRecorder 时不会连带加载合并、ffmpeg、屏幕抓取等无关模块
+_EXPORTS = {
+    'AVRecorder': 'av_recorder',
+    'CameraSource': 'sources', 'VideoFileSource': 'sources', 'SyntheticVideoSource': 'sources',
+    'MicrophoneSource': 'sources', 'WavFileSource': 'sources', 'SyntheticAudioSource': 'sources',
+    'FrameQueue': 'pipeline',
+    'PreviewRenderer': 'preview',
+    'FFmpegMuxWriter': 'ffmpeg_writer',
+    'MasterClock': 'sync',
+    'Segment': 'segments',
+    'MergeQueue': 'merge_queue', 'MergeJob': 'merge_queue',
+    'DeviceCapabilityCache': 'device_cache',
+    'CameraTrack': 'camera_track',
+    'discover_cameras': 'discovery', 'CameraInfo': 'discovery',
+    'MJPEGStreamSource': 'mjpeg',
+    'LevelMeter': 'levels',
+    'OffsetEstimate': 'calibration', 'calibrate_files': 'calibration',
+    'AudioRingBuffer': 'audio_buffer', 'AdaptiveBufferController': 'audio_buffer',
+    'Metrics': 'metrics', 'Histogram': 'metrics',
+    'MotionGate': 'motion',
+    'ScreenSource': 'screen',
+    'StillCapture': 'stills',
+    'RecordingCatalog': 'catalog',
+    'EncoderPreset': 'encoders', 'register_encoder': 'encoders', 'get_encoder': 'encoders',
+    'calibrate_encoder': 'encoders', 'choose_encoder': 'encoders',
+    'LoadShedder': 'load_shedding',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,183 @@
+import threading
+import time
+
+import numpy as np
+
+# PortAudio 回调 status 中表示输入溢出（设备缓冲区被覆盖，采样丢失）的标志
+INPUT_OVERFLOW = 0x2
+
+
+class AudioRingBuffer:
+    """预分配的音频环形缓冲区
+
+    音频回调只把采样拷贝进预先分配的 NumPy 数组并记录该块的采集时间，
+    不分配新对象、不做文件 IO；写文件由录制线程 read() 取出后完成。
+    写入速度超过读取、缓冲区写满时丢弃新到的块并计入 overruns。
+
+    丢失的采样不会被忽略：缓冲区丢弃的帧数是确切的；PortAudio 报告输入溢出时
+    丢失的帧数未知，按该块与上一块采集时间之差估计。两者都记在下一个写入的块上，
+    read() 返回时由录制线程补上同样长度的静音，后面的音频不会提前、与视频错开。
+    """
+
+    def __init__(self, rate, channels=1, seconds=10.0, max_chunks=4096):
+        self.rate = rate
+        self.channels = channels
+        self.capacity = max(int(rate * seconds), 1)
+        self.samples = np.zeros(self.capacity * channels, dtype=np.int16)
+        # 每块的起始位置、帧数和采集时间（NaN 表示没有时间戳）
+        self.chunk_start = np.zeros(max_chunks, dtype=np.int64)
+        self.chunk_frames = np.zeros(max_chunks, dtype=np.int64)
+        self.chunk_time = np.zeros(max_chunks, dtype=np.float64)
+        self.chunk_gap = np.zeros(max_chunks, dtype=np.int64)   # 该块之前丢失的帧数
+        self.max_chunks = max_chunks
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.write_pos = 0     # 累计写入的帧数
+            self.read_pos = 0      # 累计读出的帧数
+            self.chunk_write = 0
+            self.chunk_read = 0
+            self.overruns = 0
+            self.lost_frames = 0
+            self.gap = 0              # 丢弃后还没有记到下一块上的帧数
+            self.gap_frames = 0       # 累计补静音的帧数（含输入溢出的估计值）
+            self.last_time = None     # 上一个写入块的采集时间和帧数，用于估计输入溢出丢失的帧数
+            self.last_frames = 0
+            self.max_fill = 0
+        self.ready.clear()
+
+    def write(self, data, timestamp, overflow=False):
+        """在音频回调中写入一块 16 位 PCM，返回 False 表示缓冲区已满、该块被丢弃
+
+        overflow 为 True 表示 PortAudio 在这一块之前丢弃了输入（status 带 INPUT_OVERFLOW）。
+        """
+        block = np.frombuffer(data, dtype=np.int16)
+        frames = len(block) // self.channels
+        with self.lock:
+            if (self.write_pos + frames - self.read_pos > self.capacity
+                    or self.chunk_write - self.chunk_read >= self.max_chunks):
+                self.overruns += 1
+                self.lost_frames += frames
+                self.gap += frames
+                return False
+            gap = self.gap
+            if overflow and timestamp is not None and self.last_time is not None:
+                expected = self.last_time + self.last_frames / float(self.rate)
+                gap = max(gap, int(round((timestamp - expected) * self.rate)))
+            self.gap = 0
+            self.gap_frames += gap
+            if timestamp is not None:
+                self.last_time, self.last_frames = timestamp, frames
+            start = (self.write_pos % self.capacity) * self.channels
+            count = frames * self.channels
+            first = min(count, len(self.samples) - start)
+            self.samples[start:start + first] = block[:first]
+            if first < count:
+                self.samples[:count - first] = block[first:count]
+            slot = self.chunk_write % self.max_chunks
+            self.chunk_start[slot] = self.write_pos
+            self.chunk_frames[slot] = frames
+            self.chunk_time[slot] = np.nan if timestamp is None else timestamp
+            self.chunk_gap[slot] = gap
+            self.chunk_write += 1
+            self.write_pos += frames
+            self.max_fill = max(self.max_fill, self.write_pos - self.read_pos)
+        self.ready.set()
+        return True
+
+    def read(self, timeout=None):
+        """取出所有已写入的块，返回 [(数据, 采集时间, 之前丢失的帧数)]；timeout 内没有数据时返回空列表"""
+        if timeout is not None and not self.ready.wait(timeout):
+            return []
+        self.ready.clear()
+        with self.lock:
+            chunks = []
+            while self.chunk_read < self.chunk_write:
+                slot = self.chunk_read % self.max_chunks
+                frames = int(self.chunk_frames[slot])
+                start = (int(self.chunk_start[slot]) % self.capacity) * self.channels
+                count = frames * self.channels
+                first = min(count, len(self.samples) - start)
+                data = self.samples[start:start + first].tobytes()
+                if first < count:
+                    data += self.samples[:count - first].tobytes()
+                t = float(self.chunk_time[slot])
+                chunks.append((data, None if np.isnan(t) else t, int(self.chunk_gap[slot])))
+                self.chunk_read += 1
+                self.read_pos += frames
+            return chunks
+
+    def stats(self):
+        with self.lock:
+            return {
+                'written': self.write_pos,
+                'fill': self.write_pos - self.read_pos,
+                'max_fill': self.max_fill,
+                'capacity': self.capacity,
+                'overruns': self.overruns,
+                'lost_frames': self.lost_frames,
+                'gap_frames': self.gap_frames,
+            }
+
+
+class AdaptiveBufferController:
+    """根据回调间隔抖动和输入溢出自动选择 frames_per_buffer
+
+    observe() 在音频回调中调用，统计实际回调间隔相对缓冲区时长的抖动以及
+    PortAudio 报告的输入溢出；recommend() 给出下次打开音频流时使用的缓冲区大小：
+    出现溢出或抖动超过缓冲区时长的一半时加倍（更稳定、延迟更大），
+    长时间稳定且抖动很小时减半（延迟更小）。
+    """
+
+    def __init__(self, rate, minimum=512, maximum=4096, stable_seconds=30.0):
+        self.rate = rate
+        self.minimum = minimum
+        self.maximum = maximum
+        self.stable_seconds = stable_seconds
+        self.frames = minimum
+        self.reset()
+        self.input_overflows = 0
+
+    def reset(self, frames=None):
+        """开始统计一个新的音频流"""
+        if frames is not None:
+            self.frames = min(max(int(frames), self.minimum), self.maximum)
+        self.last_call = None
+        self.jitter = 0.0
+        self.window_overflows = 0
+        self.window_start = time.monotonic()
+
+    def observe(self, frame_count, status, now=None):
+        """记录一次回调，返回与上一次回调的间隔（秒），第一次返回 None"""
+        now = time.perf_counter() if now is None else now
+        if status & INPUT_OVERFLOW:
+            self.input_overflows += 1
+            self.window_overflows += 1
+        interval = None
+        if self.last_call is not None and frame_count:
+            interval = now - self.last_call
+            deviation = abs(interval - frame_count / float(self.rate))
+            self.jitter += (deviation - self.jitter) / 16.0
+        self.last_call = now
+        return interval
+
+    def recommend(self):
+        """下一次打开音频流时应使用的缓冲区大小"""
+        period = self.frames / float(self.rate)
+        if self.window_overflows or self.jitter > period * 0.5:
+            return min(self.frames * 2, self.maximum)
+        if (time.monotonic() - self.window_start >= self.stable_seconds
+                and self.jitter < period * 0.1):
+            return max(self.frames // 2, self.minimum)
+        return self.frames
+
+    def stats(self):
+        return {
+            'frames_per_buffer': self.frames,
+            'latency_ms': self.frames * 1000.0 / self.rate,
+            'jitter_ms': self.jitter * 1000,
+            'input_overflows': self.input_overflows,
+        }
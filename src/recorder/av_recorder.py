@@ -1,17 +1,41 @@
 import cv2
-import pyaudio
-import wave
+import queue
 import threading
 from datetime import datetime
 import os
 import numpy as np
 import tkinter as tk
-from PIL import Image, ImageTk
 import time
+from src.recorder.sources import CameraSource, MicrophoneSource
+from src.recorder.pipeline import FrameQueue, RateMeter, POLICY_DROP_OLDEST
+from src.recorder.camera_track import CameraTrack
+from src.recorder.preview import PreviewRenderer
+from src.recorder.mp4_timing import apply_frame_times, read_duration
+from src.recorder.encoders import (
+    ENCODERS, DEFAULT_ENCODER, DEFAULT_MUX_ENCODER, KIND_FFMPEG,
+    get_encoder, calibrate_encoders, cached_calibrations, choose_encoder,
+)
+from src.recorder.catalog import RecordingCatalog, MERGE_PENDING, MERGE_DONE, MERGE_FAILED, MERGE_NOT_NEEDED
+from src.recorder.sync import (
+    MasterClock, AudioAligner, TimestampLog, sidecar_filename,
+    load_timestamps, fit_audio_clock, video_frame_times,
+)
+from src.recorder.segments import Segment, segment_name, write_manifest, read_manifest
+from src.recorder.device_cache import DeviceCapabilityCache
+from src.recorder.levels import LevelMeter
+from src.recorder.audio_buffer import AudioRingBuffer, AdaptiveBufferController, INPUT_OVERFLOW
+from src.recorder.metrics import Metrics
+from src.recorder.motion import MotionGate
+from src.recorder.load_shedding import LoadShedder, LEVEL_NAMES, LEVEL_HALF_RATE
+from src.recorder.screen import ScreenSource
+from src.recorder.stills import StillCapture
+from src.audio.wav_writer import StreamingWavWriter
 
 class AVRecorder:
-    def __init__(self, log_text, video_label):
+    def __init__(self, log_text, video_label, video_source=None, audio_source=None, init_devices=True):
         self.log_text = log_text
+        # 工作线程的日志先放进队列，由主线程调用 flush_logs() 写入文本框（Tk 控件只能在主线程操作）
+        self.pending_logs = queue.Queue()
         self.video_label = video_label
         self.recording = False
         
@@ -19,112 +43,296 @@ class AVRecorder:
         self.output_dir = os.path.join(os.getcwd(), "recordings")
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # 设备能力缓存：已知设备直接使用上次实测的帧率，也记录上次选择的摄像头
+        self.device_cache = DeviceCapabilityCache()
+        
+        # 音视频来源，未指定时使用上次选择的摄像头和默认麦克风
+        self.video_source = video_source or self._default_camera()
+        self.audio_source = audio_source or MicrophoneSource()
+        
+        # 附加摄像头：与主摄像头同时录制到各自的文件，共用同一个主时钟
+        self.extra_video_sources = []
+        self.camera_tracks = []
+        self.capture_rate = RateMeter()
+        
+        # 电平表：音频回调中统计电平；未录制时可打开监听，录制前就能看到输入电平
+        self.level_meter = LevelMeter(self.audio_source.channels)
+        self.monitor_audio = False  # 空闲时是否监听音频输入
+        self.monitoring = False     # 监听用的音频流是否正在运行
+        
         # 音频设置
-        self.CHUNK = 1024
-        self.FORMAT = pyaudio.paInt16
-        self.CHANNELS = 1  # 单声道
-        self.RATE = 44100
-        self.audio = pyaudio.PyAudio()
+        self.CHUNK = self.audio_source.chunk
+        self.CHANNELS = self.audio_source.channels  # 单声道
+        self.RATE = self.audio_source.rate
         
         # 添加时间戳相关变量
         self.start_time = None
-        self.audio_frames_timestamp = []
-        self.video_frames_timestamp = []
+        self.clock = MasterClock()
+        self.aligner = None
+        self.last_audio_stamp = None  # 最近一块音频的 (采样位置, 采集时间)
         self.fps = 30.0  # 设置固定的视频帧率
-        self.frame_time = 1.0 / self.fps  # 每帧的理想时间
         self.frame_count = 0
-        self.last_audio_time = 0
         
         self.audio_delay = 0
+        self.save_thread = None
         
-        self.current_fps = self.fps
-        self.sync_threshold = 0.1  # 100ms的同步阈值
+        self.av_drift = 0.0  # 音频时长与视频时长之差（秒），仅用于显示
         
-        self.sync_mode = "delay"  # 默认使用音频延迟模式
+        # 各阶段性能统计，每次录制重新开始，结束时导出到录制目录
+        self.metrics = Metrics()
+        self.export_metrics = True
+        
+        # 音频缓冲：回调只写入预分配的环形缓冲区，由录制线程写文件；
+        # buffer_size 为 frames_per_buffer 的下限，开启自动调整时按抖动和溢出情况增大
         self.buffer_size = 1024
+        self.adaptive_buffer = True
+        self.buffer_controller = None
+        self.audio_ring = None
+        
+        # 采集 → 编码 → 预览 流水线设置
+        self.queue_size = 60  # 编码队列长度（帧）
+        self.drop_policy = POLICY_DROP_OLDEST  # 编码跟不上时的丢帧策略
+        self.encode_queue = None
+        
+        # 静止跳帧：画面几乎不变时不编码，输出可变帧率视频（适合屏幕和桌面录制）
+        self.motion_adaptive = False
+        self.motion_gate = MotionGate()
+        
+        # CPU 紧张时逐级降低预览帧率、暂停截图、隔帧编码，负载下降后逐级恢复；
+        # 隔帧编码会降低输出视频的帧率，默认关闭，由用户在界面上开启
+        self.load_shedding = False
+        self.load_shedder = LoadShedder()
+        
+        # 录制时定期保存截图（秒，0 表示关闭），由后台线程编码，不影响采集和编码
+        self.still_interval = 0
+        self.still_format = 'jpg'
+        self.stills = None
+        
+        # 输出方式："separate" 分别保存视频和音频，"muxed" 由 ffmpeg 实时编码合流
+        self.output_mode = "separate"
+        self.backpressure_threshold = 0.8
+        self.encoder_backpressured = False
+        
+        # 分段录制：按时长（秒）或大小（MB）切分，0 表示不分段
+        self.segment_seconds = 0
+        self.segment_megabytes = 0
+        self.segment = None
+        self.audio_segment = None
+        self.next_audio_segment = None
+        self.finished_segments = []
+        self.finalize_threads = []
+        self.video_manifest = None
+        self.audio_manifest = None
+        self.segment_lock = threading.Lock()
+        self.manifest_lock = threading.Lock()
+        
+        # 合并任务队列，merge_workers 为同时运行的合并进程数；第一次合并时才创建
+        self.merge_workers = 2
+        self._merge_queue = None
+        
+        # 视频编码方式（encoders.ENCODERS 中的名称），'auto' 时按本机校准结果选择
+        # 能以 fps × encoder_headroom 的速度编码、文件最小的一种
+        self.encoder = DEFAULT_ENCODER
+        self.encoder_headroom = 1.5
+        # 本次录制实际使用的编码方式，start_recording() 时确定
+        self.active_encoder = get_encoder(DEFAULT_ENCODER)
+        
+        # 录制目录索引（SQLite），每次录制结束时写入；第一次使用时打开
+        self.catalog_enabled = True
+        self._catalog = None
         
+        # 预览在 Tk 主线程中按固定频率渲染，与采集帧率无关
+        self.preview_fps = 15.0
+        self.preview_renderer = None
+        if self.video_label is not None:
+            self.preview_renderer = PreviewRenderer(self.video_label, (640, 480), self.preview_fps, log=self.log)
+            self.preview_renderer.metrics = self.metrics
+        
+        self.probe_thread = None
+        self.probe_stop = threading.Event()
+        self.fps_callback = None  # 后台检测完成时调用 fps_callback(fps)
+        
+        # 设备初始化可能需要数秒；init_devices 为 False 时由调用者
+        # 在后台线程中调用 init_video()/init_audio()，界面可以先显示出来
+        self.video_ready = False
+        self.audio_ready = False
+        self.detected_fps = self.video_source.fps
+        self.fps = self.detected_fps
+        if init_devices:
+            self.init_video()
+            self.init_audio()
+        
+    def init_video(self):
+        """打开视频来源并确定录制帧率"""
         # 先初始化摄像头
         self.init_camera()
         
-        # 然后检测帧率
-        self.detected_fps = self._detect_camera_fps()
+        # 然后确定帧率（合成/文件来源的帧率是已知的，无需实测）
+        self.detected_fps = self.video_source.fps
+        if self.video_source.probe_fps:
+            cached = self.device_cache.get(self.video_source.device_key())
+            if cached:
+                self.detected_fps = cached['fps']
+                self.log(f"使用缓存的摄像头帧率: {self.detected_fps:.1f}")
+            else:
+                # 未知设备先用报告的帧率，在后台实测
+                self.detected_fps = max(min(self.video_source.fps, 60.0), 15.0)
+                self.start_fps_probe()
         self.fps = self.detected_fps
-        self.log(f"检测到摄像头实际帧率: {self.detected_fps:.1f}")
+        self.video_ready = True
+        
+    def init_audio(self):
+        """打开音频来源（PyAudio 初始化和设备枚举较慢）"""
+        self.audio_source.open()
+        self.log(f"找到{self.audio_source.describe()}")
+        self.CHANNELS = self.audio_source.channels
+        self.RATE = self.audio_source.rate
+        self.level_meter.configure(self.CHANNELS)
+        self.buffer_controller = AdaptiveBufferController(self.RATE, minimum=self.buffer_size)
+        self.buffer_controller.reset(self.buffer_size)
+        self.audio_ring = AudioRingBuffer(self.RATE, self.CHANNELS)
+        self.audio_ready = True
+        
+    def set_buffer_size(self, frames):
+        """设置 frames_per_buffer（开启自动调整时为下限），下次打开音频流时生效"""
+        self.buffer_size = int(frames)
+        if self.buffer_controller is not None:
+            self.buffer_controller.minimum = self.buffer_size
+            
+    def _apply_buffer_size(self):
+        """打开音频流之前确定本次使用的缓冲区大小"""
+        controller = self.buffer_controller
+        frames = controller.recommend() if self.adaptive_buffer else self.buffer_size
+        frames = max(frames, self.buffer_size)
+        if frames != self.audio_source.chunk:
+            self.log(f"音频缓冲区: {self.audio_source.chunk} → {frames} 帧"
+                     f"（抖动 {controller.jitter * 1000:.1f}ms，输入溢出 {controller.window_overflows} 次）")
+        self.audio_source.chunk = frames
+        self.CHUNK = frames
+        controller.reset(frames)
+        
+    def audio_stats(self):
+        """音频缓冲统计：缓冲区大小、回调抖动、输入溢出和环形缓冲区溢出"""
+        stats = self.buffer_controller.stats() if self.buffer_controller is not None else {}
+        if self.audio_ring is not None:
+            stats.update(self.audio_ring.stats())
+        return stats
+        
+    def start_monitor(self):
+        """空闲时也打开音频输入，只更新电平表不写文件"""
+        self.monitor_audio = True
+        if self.audio_ready and not self.recording and not self.monitoring:
+            self._apply_buffer_size()
+            self.audio_source.start(self._audio_callback)
+            self.monitoring = True
+            
+    def stop_monitor(self, keep=False):
+        """停止监听；keep 为 True 时录制结束后自动恢复监听"""
+        self.monitor_audio = keep and self.monitor_audio
+        if self.monitoring:
+            self.audio_source.stop()
+            self.monitoring = False
         
     def log(self, message):
-        """添加日志"""
-        if hasattr(self, 'log_text'):
-            self.log_text.insert(tk.END, f"{message}\n")
-            self.log_text.see(tk.END)
+        """添加日志，可以在任意线程中调用"""
+        if self.log_text is not None:
+            if threading.current_thread() is threading.main_thread():
+                self.flush_logs()
+                self._append_log(message)
+            else:
+                self.pending_logs.put(message)
         print(message)
+
+    def flush_logs(self):
+        """把工作线程产生的日志写入文本框，只能在主线程中调用"""
+        while True:
+            try:
+                message = self.pending_logs.get_nowait()
+            except queue.Empty:
+                return
+            self._append_log(message)
+
+    def _append_log(self, message):
+        self.log_text.insert(tk.END, f"{message}\n")
+        self.log_text.see(tk.END)
         
     def start_recording(self):
         """开始录制"""
         try:
-            # 检查音频设备
-            device_count = self.audio.get_device_count()
-            found_input = False
-            for i in range(device_count):
-                device_info = self.audio.get_device_info_by_index(i)
-                if device_info.get('maxInputChannels') > 0:
-                    found_input = True
-                    self.log(f"找到音频输入设备: {device_info.get('name')}")
-                    break
-                    
-            if not found_input:
-                raise Exception("未找到可用的音频输入设备")
+            # 后台帧率检测还没完成时中止，使用当前帧率录制
+            self.stop_fps_probe()
+            # 录制线程会重新启动音频流，电平表继续由录制时的回调更新
+            self.stop_monitor(keep=True)
+            
+            # 检查音频设备（启动时已初始化则直接使用）
+            if not self.audio_ready:
+                self.init_audio()
             
             # 初始化视频录制
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
-                raise Exception("无法打开摄像头")
-            
-            # 创建视频写入器
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            self.video_filename = os.path.join(self.output_dir, f"video_{timestamp}.mp4")
-            self.audio_filename = os.path.join(self.output_dir, f"audio_{timestamp}.wav")
-            
-            # 设置视频编码器和参数
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.video_writer = cv2.VideoWriter(
-                self.video_filename,
-                fourcc,
-                self.fps,
-                (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
-                 int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))),
-                True
-            )
+            if not self.video_source.is_opened():
+                self.video_source.open()
+            
+            # 创建第一个分段的写入器
+            self.session_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.segmented = bool(self.segment_seconds or self.segment_megabytes)
+            self.finished_segments = []
+            self.finalize_threads = []
+            self.active_encoder = self._resolve_encoder()
+            self.segment = self._open_segment(0)
+            self.audio_segment = self.segment
+            self.next_audio_segment = None
+            self._set_session_filenames()
+            self.camera_tracks = self._open_camera_tracks()
+            self.stills = None
+            if self.still_interval:
+                still_dir = os.path.splitext(self.video_filename)[0] + "_stills"
+                self.stills = StillCapture(still_dir, self.still_interval,
+                                           image_format=self.still_format).start()
             
             # 重置计数器
             self.frame_count = 0
-            self.audio_frames = []
-            
-            # 初始化音频录制
-            self.audio_frames = []
-            self.audio_stream = self.audio.open(
-                format=self.FORMAT,
-                channels=self.CHANNELS,
-                rate=self.RATE,
-                input=True,
-                frames_per_buffer=self.CHUNK
-            )
+            self.encoded_count = 0
+            self.encoder_backpressured = False
+            self.motion_gate.reset()
+            self.load_shedder.reset()
+            self._apply_preview_fps()
+            
+            # 创建编码队列
+            self.encode_queue = FrameQueue(self.queue_size, self.drop_policy, "encode")
             
             # 设置视频帧率
-            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+            self.video_source.set_fps(self.fps)
             
-            # 记录开始时间
+            # 记录开始时间，所有音视频时间戳都基于同一个单调时钟
             self.start_time = time.time()
-            self.audio_frames = []
-            self.audio_frames_timestamp = []
-            self.video_frames_timestamp = []
+            self.clock = MasterClock()
+            self.aligner = AudioAligner(self.RATE, self.CHANNELS, self.audio_source.sample_width)
+            self.last_audio_stamp = None
+            self.last_size_check = 0.0
+            self.av_drift = 0.0
+            self.capture_rate.reset()
+            self.metrics.reset()
             
             self.recording = True
             
-            # 启动视频录制线程
+            # 启动视频编码线程
+            self.encode_thread = threading.Thread(target=self._encode_video)
+            self.encode_thread.daemon = True
+            self.encode_thread.start()
+            
+            # 启动预览刷新（在调用者所在的 Tk 主线程中调度）
+            if self.preview_renderer is not None:
+                self.preview_renderer.start()
+            
+            # 启动视频采集线程
             self.video_thread = threading.Thread(target=self._record_video)
             self.video_thread.daemon = True
             self.video_thread.start()
             
+            # 启动附加摄像头，各自独立采集和编码
+            for track in self.camera_tracks:
+                track.start(self.clock)
+            
             # 启动音频录制线程
             self.audio_thread = threading.Thread(target=self._record_audio)
             self.audio_thread.daemon = True
@@ -135,252 +343,1110 @@ class AVRecorder:
             self.monitor_thread.daemon = True
             self.monitor_thread.start()
             
-            self.log("开始录制音视频...")
+            if self.camera_tracks:
+                self.log(f"开始录制音视频（共 {len(self.camera_tracks) + 1} 路摄像头）...")
+            else:
+                self.log("开始录制音视频...")
             
         except Exception as e:
             self.log(f"启动录制失败: {str(e)}")
             self.recording = False
+            for track in self.camera_tracks:
+                track.stop()
+                track.finish()
+            self.camera_tracks = []
+            if self.stills is not None:
+                self.stills.finish()
+                self.stills = None
             import traceback
             self.log(traceback.format_exc())
             
-    def _record_video(self):
-        """视频录制循环"""
+    def _open_segment(self, index):
+        """创建一个分段并打开它的写入器"""
+        video_base = f"video_{self.session_timestamp}"
+        audio_base = f"audio_{self.session_timestamp}"
+        if self.output_mode == "muxed":
+            video_base += "_with_audio"
+        if self.segmented:
+            video_base = segment_name(video_base, index)
+            audio_base = segment_name(audio_base, index)
+        video_filename = os.path.join(self.output_dir, f"{video_base}.mp4")
+        
+        if self.output_mode == "muxed":
+            # 视频帧和音频一起送入 ffmpeg，分段结束时直接得到合流文件
+            segment = Segment(index, video_filename, None)
+            segment.video_writer = self.active_encoder.create_mux_writer(
+                video_filename,
+                self.video_source.width,
+                self.video_source.height,
+                self.fps,
+                self.RATE,
+                self.CHANNELS,
+                self.audio_source.sample_width
+            )
+            segment.audio_writer = segment.video_writer.audio_sink
+        else:
+            # 分别写入视频和 WAV 音频
+            segment = Segment(index, video_filename, os.path.join(self.output_dir, f"{audio_base}.wav"))
+            segment.video_writer = self.active_encoder.create_writer(
+                video_filename,
+                self.video_source.width,
+                self.video_source.height,
+                self.fps
+            )
+            # 音频边录边写入磁盘
+            segment.audio_writer = StreamingWavWriter(
+                segment.audio_filename,
+                self.CHANNELS,
+                self.audio_source.sample_width,
+                self.RATE
+            ).open()
+        
+        segment.timestamp_log = TimestampLog(sidecar_filename(video_filename))
+        return segment
+        
+    def _resolve_encoder(self):
+        """确定本次录制使用的编码方式"""
+        muxed = self.output_mode == "muxed"
+        if self.encoder == 'auto':
+            width, height = self.video_source.width, self.video_source.height
+            results = cached_calibrations(self.device_cache, width, height)
+            if muxed:
+                results = [r for r in results if ENCODERS[r['encoder']].kind == KIND_FFMPEG]
+            preset = choose_encoder(results, self.fps, self.encoder_headroom)
+            if preset is None:
+                preset = get_encoder(DEFAULT_MUX_ENCODER if muxed else DEFAULT_ENCODER)
+                if results:
+                    self.log(f"没有能以 {self.fps * self.encoder_headroom:.0f} 帧/秒编码 {width}x{height} 的编码器，"
+                             f"使用 {preset.name}")
+                else:
+                    self.log(f"还没有 {width}x{height} 的编码器校准结果，使用 {preset.name}")
+        else:
+            preset = get_encoder(self.encoder)
+            if not preset.mp4:
+                raise Exception(f"{preset.name} 不能写入 MP4，录制时不能使用")
+            if muxed and preset.kind != KIND_FFMPEG:
+                self.log(f"实时合流需要 ffmpeg 编码器，{preset.name} 改用 {DEFAULT_MUX_ENCODER}")
+                preset = get_encoder(DEFAULT_MUX_ENCODER)
+        self.log(f"视频编码: {preset.name}（{preset.description}）")
+        return preset
+        
+    def calibrate_encoders(self, frames=60, names=None):
+        """按当前摄像头的分辨率实测各编码方式的速度和文件大小，结果保存到设备能力缓存"""
+        width, height = self.video_source.width, self.video_source.height
+        self.log(f"正在校准编码器（{width}x{height}）...")
+        results = calibrate_encoders(width, height, self.fps, frames, names,
+                                     cache=self.device_cache, log=self.log)
+        preset = choose_encoder(results, self.fps, self.encoder_headroom)
+        if preset is not None:
+            self.log(f"{self.fps:.0f} fps 下推荐使用 {preset.name}（{preset.description}）")
+        else:
+            self.log(f"没有编码器能以 {self.fps * self.encoder_headroom:.0f} 帧/秒编码 {width}x{height}")
+        return results
+        
+    def add_camera(self, source):
+        """添加一路附加摄像头（下一次开始录制时生效）"""
+        self.extra_video_sources.append(source)
+        
+    def clear_cameras(self):
+        for source in self.extra_video_sources:
+            source.release()
+        self.extra_video_sources = []
+        
+    def _open_camera_tracks(self):
+        """并行打开所有附加摄像头及其输出文件，打不开的摄像头跳过"""
+        tracks = []
+        for i, source in enumerate(self.extra_video_sources, 1):
+            track = CameraTrack(f"cam{i}", source, self.queue_size, self.drop_policy, self.log)
+            track.filename = os.path.join(self.output_dir, f"video_{self.session_timestamp}_cam{i}.mp4")
+            tracks.append(track)
+        
+        def open_track(track):
+            try:
+                track.open(track.filename, self.fps, self.active_encoder)
+            except Exception as e:
+                track.error = e
+        
+        threads = [threading.Thread(target=open_track, args=(track,)) for track in tracks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        opened = []
+        for track in tracks:
+            if track.error is not None:
+                self.log(f"{track.name}（{track.source.describe()}）无法打开，跳过: {track.error}")
+                track.source.release()
+            else:
+                opened.append(track)
+        return opened
+        
+    def camera_stats(self):
+        """每路摄像头的实际帧率和丢帧统计，第一项为主摄像头"""
+        queue_stats = self.encode_queue.stats() if self.encode_queue is not None else {}
+        stats = [{
+            'name': 'cam0',
+            'fps': self.capture_rate.rate,
+            'captured': self.frame_count,
+            'encoded': getattr(self, 'encoded_count', 0),
+            'dropped': queue_stats.get('dropped', 0),
+            'depth': queue_stats.get('depth', 0),
+            'first_time': self.aligner.video_start if self.aligner is not None else None,
+            'source': self.video_source.stats() if hasattr(self.video_source, 'stats') else None,
+        }]
+        stats += [track.stats() for track in self.camera_tracks]
+        return stats
+        
+    def _set_session_filenames(self):
+        """设置本次录制的输出文件名；分段时为拼接后的文件名和 concat 清单"""
+        if not self.segmented:
+            self.video_filename = self.segment.video_filename
+            self.audio_filename = self.segment.audio_filename
+            self.video_manifest = None
+            self.audio_manifest = None
+            return
+        
+        video_base = f"video_{self.session_timestamp}"
+        if self.output_mode == "muxed":
+            video_base += "_with_audio"
+            self.audio_filename = None
+            self.audio_manifest = None
+        else:
+            audio_base = f"audio_{self.session_timestamp}"
+            self.audio_filename = os.path.join(self.output_dir, f"{audio_base}.wav")
+            self.audio_manifest = os.path.join(self.output_dir, f"{audio_base}.ffconcat")
+        self.video_filename = os.path.join(self.output_dir, f"{video_base}.mp4")
+        self.video_manifest = os.path.join(self.output_dir, f"{video_base}.ffconcat")
+        
+    def _segment_due(self, timestamp):
+        """当前分段是否已达到切分条件（在编码线程中调用）"""
+        segment = self.segment
+        if not self.segmented or segment.start_time is None or self.next_audio_segment is not None:
+            return False
+        if self.segment_seconds and timestamp - segment.start_time >= self.segment_seconds:
+            return True
+        if self.segment_megabytes and timestamp - self.last_size_check >= 1.0:
+            self.last_size_check = timestamp
+            try:
+                size = os.path.getsize(segment.video_filename)
+            except OSError:
+                return False
+            return size >= self.segment_megabytes * 1024 * 1024
+        return False
+        
+    def _rotate_segment(self, timestamp):
+        """从采集时间为 timestamp 的这一帧开始切换到新分段（在编码线程中调用）
+        
+        旧分段的写入器在后台线程中收尾，编码线程立即继续写新分段；
+        音频切换点取该帧时间对应的采样位置，由音频回调线程完成切换。
+        """
+        with self.segment_lock:
+            if not self.recording:
+                return
+            old = self.segment
+            new = self._open_segment(old.index + 1)
+            new.start_time = timestamp
+            new.audio_start = self._audio_position_at(timestamp)
+            old.end_time = timestamp
+            self.segment = new
+            self.next_audio_segment = new
+        self._start_finalize(old)
+        
+    def _audio_position_at(self, timestamp):
+        """估计某一采集时间对应的音频采样位置"""
+        if self.last_audio_stamp is None:
+            return self.aligner.position
+        position, stamp = self.last_audio_stamp
+        return max(int(round(position + (timestamp - stamp) * self.RATE)), 0)
+        
+    def _switch_audio_segment(self):
+        """音频写入切换到下一分段，旧分段的音频到此结束"""
+        old = self.audio_segment
+        self.audio_segment = self.next_audio_segment
+        self.next_audio_segment = None
+        old.audio_closed.set()
+        
+    def _start_finalize(self, segment):
+        thread = threading.Thread(target=self._finalize_segment, args=(segment,))
+        thread.daemon = True
+        thread.start()
+        self.finalize_threads.append(thread)
+        
+    def _finalize_segment(self, segment):
+        """分段结束：关闭音频、释放视频写入器、写入时间表并更新清单"""
         try:
-            start_time = time.perf_counter()
-            self.current_fps = self.fps  # 初始帧率
+            segment.audio_closed.wait()
+            segment.audio_writer.close()
+            segment.video_writer.release()
+            if segment.end_time is not None:
+                segment.timestamp_log.end(segment.frame_count, segment.end_time)
+            segment.timestamp_log.close()
+            self._apply_video_timestamps(segment)
+            
+            with self.manifest_lock:
+                self.finished_segments.append(segment)
+                self.finished_segments.sort(key=lambda s: s.index)
+                if self.segmented:
+                    self._write_manifests()
+            if self.segmented:
+                self.log(f"分段 {segment.index:03d} 已完成: {os.path.basename(segment.video_filename)}")
+        except Exception as e:
+            self.log(f"完成分段 {segment.index:03d} 失败: {str(e)}")
             
+    def _write_manifests(self):
+        """更新分段的 concat 清单，最终拼接时直接流复制"""
+        write_manifest(self.video_manifest, [s.video_filename for s in self.finished_segments])
+        if self.audio_manifest is not None:
+            write_manifest(self.audio_manifest, [s.audio_filename for s in self.finished_segments])
+        
+    def _check_backpressure(self):
+        """根据写入器反馈的背压更新状态，供采集流水线参考"""
+        backpressure = getattr(self.segment.video_writer, 'backpressure', 0.0)
+        backpressured = backpressure >= self.backpressure_threshold
+        if backpressured != self.encoder_backpressured:
+            self.encoder_backpressured = backpressured
+            if backpressured:
+                self.log(f"编码器背压过高({backpressure:.0%})，"
+                         f"编码队列深度 {self.encode_queue.qsize()}")
+            else:
+                self.log("编码器背压已恢复")
+        
+    def _update_load_shedding(self):
+        """根据编码队列、编码耗时和实际帧率调整降级级别"""
+        if not self.load_shedding:
+            return
+        shedder = self.load_shedder
+        queue_stats = self.encode_queue.stats()
+        # 写入器背压高时编码队列很快就会堆积，按队列已占满处理
+        queue_fill = self.encode_queue.qsize() / float(self.encode_queue.maxsize)
+        if self.encoder_backpressured:
+            queue_fill = max(queue_fill, 0.5)
+        change = shedder.update(queue_fill, queue_stats['dropped'], self.capture_rate.rate, self.fps)
+        if change is None:
+            return
+        old, new = change
+        if new > old:
+            self.log(f"负载过高，降级: {LEVEL_NAMES[new]}（{shedder.describe_signals()}）")
+        else:
+            self.log(f"负载已下降，恢复: {LEVEL_NAMES[old]}（{shedder.describe_signals()}）")
+        self._apply_preview_fps()
+        
+    def _log_load_shedding(self):
+        """录制结束时汇总降级情况；需要隔帧编码时，下次自动选择更快的编码方式"""
+        stats = self.load_shedder.stats()
+        if not stats['transitions']:
+            return
+        self.log(f"负载降级: 切换 {stats['transitions']} 次，最高 {LEVEL_NAMES[stats['peak_level']]}，"
+                 f"降级跳过 {stats['shed_frames']} 帧")
+        if stats['peak_level'] >= LEVEL_HALF_RATE:
+            if self.encoder == 'auto':
+                self.encoder_headroom = min(self.encoder_headroom * 1.5, 4.0)
+                self.log(f"下次录制将选择更快的编码方式（速度余量 {self.encoder_headroom:.1f} 倍）")
+            else:
+                self.log(f"{self.active_encoder.name} 编码跟不上，建议选择更快的编码方式或使用 auto")
+        
+    def _record_video(self):
+        """视频采集循环，只负责读帧并分发到编码和预览队列"""
+        try:
+            # read() 本身按摄像头帧率阻塞，无需额外等待
+            metrics = self.metrics
+            last_time = None
             while self.recording:
-                # 使用当前帧率计算延迟
-                frame_delay = 1.0 / self.current_fps
-                
-                ret, frame = self.cap.read()
+                read_start = time.perf_counter()
+                ret, frame = self.video_source.read()
+                if not ret and self.video_source.finished:
+                    self.log(f"{self.video_source.describe()} 已播放完毕")
+                    break
                 if ret:
-                    self.video_writer.write(frame)
+                    # 读到帧后立即打上采集时间戳
+                    now = self.clock.now()
+                    metrics.observe('capture_read_ms', (time.perf_counter() - read_start) * 1000)
+                    if last_time is not None:
+                        metrics.observe('capture_interval_ms', (now - last_time) * 1000)
+                    last_time = now
+                    self.encode_queue.put((frame, now))
+                    metrics.observe('encode_queue_depth', self.encode_queue.qsize())
+                    if self.stills is not None and not self.load_shedder.skip_stills:
+                        self.stills.offer(frame, now)
                     self.update_preview(frame)
+                    self.capture_rate.tick(now)
                     self.frame_count += 1
                     
-                    # 精确控制帧率
-                    elapsed = time.perf_counter() - start_time
-                    expected_frame_time = self.frame_count * frame_delay
-                    sleep_time = expected_frame_time - elapsed
-                    
-                    if sleep_time > 0:
-                        time.sleep(sleep_time)
-                    
         except Exception as e:
             self.log(f"视频录制错误: {str(e)}")
+        finally:
+            # 采集结束后关闭队列，编码线程会写完剩余的帧
+            self.encode_queue.close()
+    
+    def _encode_video(self):
+        """视频编码循环"""
+        # 最近一个被跳过的帧（静止跳帧或降级跳帧），录制结束时写入，使视频时长延续到最后一次采集
+        pending = None
+        pending_gated = False
+        try:
+            while True:
+                item = self.encode_queue.get()
+                if item is None:
+                    break
+                frame, timestamp = item
+                if self.encoded_count == 0:
+                    # 第一帧写入的视频决定音频的起点
+                    self.aligner.set_video_start(timestamp)
+                rotated = self._segment_due(timestamp)
+                if rotated:
+                    self._rotate_segment(timestamp)
+                
+                # 新分段的第一帧总是写入
+                if not rotated and self.load_shedder.drop_frame():
+                    pending, pending_gated = item, False
+                    continue
+                if self.motion_adaptive and not self.motion_gate.check(frame, timestamp, force=rotated):
+                    pending, pending_gated = item, True
+                    continue
+                pending = None
+                self._write_frame(frame, timestamp)
+            if pending is not None:
+                self._write_frame(*pending)
+                if pending_gated:
+                    self.motion_gate.commit(pending[1])
+                else:
+                    self.load_shedder.commit()
+        except Exception as e:
+            self.log(f"视频编码错误: {str(e)}")
+            self.encode_queue.close()
+    
+    def _write_frame(self, frame, timestamp):
+        """把一帧写入当前分段并记录它的采集时间"""
+        segment = self.segment
+        if segment.start_time is None:
+            segment.start_time = timestamp
+        # 采集到开始编码的等待时间（排队延迟）和编码写入耗时
+        self.metrics.observe('encode_latency_ms', (self.clock.now() - timestamp) * 1000)
+        start = time.perf_counter()
+        segment.video_writer.write(frame)
+        elapsed = time.perf_counter() - start
+        self.metrics.observe('encode_ms', elapsed * 1000)
+        self.load_shedder.add_encode_time(elapsed)
+        segment.timestamp_log.video(segment.frame_count, timestamp)
+        segment.frame_count += 1
+        self.encoded_count += 1
     
     def _record_audio(self):
         """音频录制循环"""
         try:
-            stream = self.audio.open(
-                format=self.FORMAT,
-                channels=self.CHANNELS,
-                rate=self.RATE,
-                input=True,
-                frames_per_buffer=self.CHUNK,
-                stream_callback=self._audio_callback  # 使用回调方式处理音频
-            )
-            
-            stream.start_stream()
-            while self.recording:
-                time.sleep(0.1)
+            self._apply_buffer_size()
+            self.audio_ring.reset()
+            self.audio_source.start(self._audio_callback)
+            while self.recording and not self.audio_source.finished:
+                self._drain_audio(timeout=0.1)
                 
-            stream.stop_stream()
-            stream.close()
+            self.audio_source.stop()
+            self._drain_audio()
             
         except Exception as e:
             self.log(f"音频录制错误: {str(e)}")
 
     def _audio_callback(self, in_data, frame_count, time_info, status):
-        """音频回调处理"""
+        """音频回调处理：只做统计和拷贝，写文件由录制线程完成"""
+        self.level_meter.feed(in_data)
+        interval = self.buffer_controller.observe(frame_count, status)
         if self.recording:
-            self.audio_frames.append(in_data)
-        return (None, pyaudio.paContinue)
+            if interval is not None:
+                self.metrics.observe('audio_callback_interval_ms', interval * 1000)
+            timestamp = self.clock.from_portaudio(time_info, frame_count, self.RATE)
+            self.audio_ring.write(in_data, timestamp, bool(status & INPUT_OVERFLOW))
+            
+    def _drain_audio(self, timeout=None):
+        """把环形缓冲区中的音频交给对齐器并写入文件"""
+        for data, timestamp, lost in self.audio_ring.read(timeout):
+            if lost:
+                # 缓冲区或设备丢失的采样补成静音，后面的音频仍落在正确的时间位置
+                self._write_audio(self.aligner.fill_gap(lost))
+            self._write_audio(self.aligner.feed(data, timestamp))
+    
+    def _write_audio(self, chunks):
+        """写入对齐后的音频块并记录时间戳，跨越分段切换点的音频块会被拆开"""
+        frame_bytes = self.CHANNELS * self.audio_source.sample_width
+        for data, position, timestamp in chunks:
+            next_segment = self.next_audio_segment
+            if next_segment is not None and position + len(data) // frame_bytes >= next_segment.audio_start:
+                cut = max(next_segment.audio_start - position, 0)
+                if cut:
+                    self._write_audio_chunk(self.audio_segment, data[:cut * frame_bytes], position, timestamp)
+                    data = data[cut * frame_bytes:]
+                    position += cut
+                    if timestamp is not None:
+                        timestamp += cut / float(self.RATE)
+                next_segment.audio_start = position
+                self._switch_audio_segment()
+            self._write_audio_chunk(self.audio_segment, data, position, timestamp)
+    
+    def _write_audio_chunk(self, segment, data, position, timestamp):
+        if not data:
+            return
+        segment.audio_writer.write(data)
+        if timestamp is not None:
+            segment.timestamp_log.audio(position - segment.audio_start, timestamp)
+            self.last_audio_stamp = (position, timestamp)
     
     def update_preview(self, frame):
-        """更新视频预览"""
-        try:
-            # 转换OpenCV的BGR格式到RGB格式
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            # 转换为PhotoImage
-            image = Image.fromarray(rgb_frame)
-            # 调整图像大小以适应预览窗口
-            image = image.resize((640, 480), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(image=image)
-            # 更新预览标签
-            self.video_label.configure(image=photo)
-            self.video_label.image = photo  # 保持引用防止垃圾回收
-        except Exception as e:
-            self.log(f"更新预览失败: {str(e)}")
+        """提交预览帧，实际渲染由 Tk 主线程按预览帧率完成"""
+        if self.preview_renderer is not None:
+            self.preview_renderer.submit(frame)
+    
+    def set_preview_fps(self, fps):
+        """设置预览刷新帧率，0 表示关闭预览"""
+        self.preview_fps = max(float(fps), 0.0)
+        self._apply_preview_fps()
+        
+    def _apply_preview_fps(self):
+        """负载降级期间预览帧率不超过降级帧率"""
+        if self.preview_renderer is None:
+            return
+        fps = self.preview_fps
+        if self.recording and self.load_shedder.throttle_preview:
+            fps = min(fps, self.load_shedder.preview_fps)
+        self.preview_renderer.fps = fps
             
     def stop_recording(self):
         """停止录制"""
         if self.recording:
             self.recording = False
             self.log("正在停止录制...")
+            for track in self.camera_tracks:
+                track.stop()
+            if self.preview_renderer is not None:
+                self.preview_renderer.stop()
+            self._apply_preview_fps()
             
             # 创建后台保存线程
-            save_thread = threading.Thread(target=self._save_recording)
-            save_thread.daemon = True
-            save_thread.start()
+            self.save_thread = threading.Thread(target=self._save_recording)
+            self.save_thread.daemon = True
+            self.save_thread.start()
             
     def _save_recording(self):
         """在后台线程中保存录制文件"""
         try:
+            # 附加摄像头在各自的线程中收尾，不等待主摄像头
+            track_threads = [threading.Thread(target=track.finish) for track in self.camera_tracks]
+            for thread in track_threads:
+                thread.start()
+            
             # 等待录制线程结束
             if hasattr(self, 'video_thread'):
                 self.video_thread.join(timeout=1)  # 设置超时时间
             if hasattr(self, 'audio_thread'):
                 self.audio_thread.join(timeout=1)  # 设置超时时间
-            
-            # 保存音频
+            # 保存音频（实时合流时 ffmpeg 需要先收到音频结束，才能继续消费视频帧）
             self._save_audio()
             
+            # 编码线程需要把队列中剩余的帧写完，才能释放写入器
+            if hasattr(self, 'encode_thread'):
+                self.encode_thread.join()
+            
+            stats = self.encode_queue.stats()
+            self.log(f"采集 {self.frame_count} 帧，编码 {self.encoded_count} 帧，"
+                     f"丢弃 {stats['dropped']} 帧（最大队列深度 {stats['max_depth']}）")
+            if self.motion_adaptive:
+                stats = self.motion_gate.stats()
+                self.log(f"静止跳帧: 跳过 {stats['skipped']} 帧（{stats['skip_ratio']:.0%}）")
+            self._log_load_shedding()
+            self._finish_stills()
+            stats = self.audio_stats()
+            self.log(f"音频缓冲 {stats['frames_per_buffer']} 帧（{stats['latency_ms']:.0f}ms），"
+                     f"回调抖动 {stats['jitter_ms']:.1f}ms，输入溢出 {stats['input_overflows']} 次，"
+                     f"环形缓冲溢出 {stats['overruns']} 次（丢失 {stats['lost_frames']} 帧），"
+                     f"补静音 {stats['gap_frames']} 帧")
+            
+            if isinstance(self.video_source, ScreenSource):
+                stats = self.video_source.stats()
+                self.log(f"屏幕抓取: 整幅 {stats['full_grabs']} 次，局部 {stats['partial_grabs']} 次，"
+                         f"无变化 {stats['unchanged']} 次，平均 {stats['grab_ms']:.1f}ms"
+                         f"（共享内存{'开' if stats['shm'] else '关'}，DAMAGE {'开' if stats['damage'] else '关'}）")
+            
             # 释放视频资源
-            if hasattr(self, 'video_writer'):
-                self.video_writer.release()
-            if hasattr(self, 'cap'):
-                self.cap.release()
+            self.video_source.release()
             
             # 释放音资源
-            if hasattr(self, 'audio_stream'):
-                self.audio_stream.stop_stream()
-                self.audio_stream.close()
+            self.audio_source.stop()
+            if self.monitor_audio and not self.recording:
+                self.start_monitor()
+            
+            # 完成最后一个分段，并等待之前的分段收尾
+            self._finalize_segment(self.segment)
+            for thread in self.finalize_threads:
+                thread.join()
             
-            self.log(f"录制已完成\n视频: {self.video_filename}\n音频: {self.audio_filename}")
+            if self.segmented and self.audio_filename is None:
+                self._join_segments()
+            
+            for thread in track_threads:
+                thread.join()
+            self._log_camera_stats()
+            self._save_metrics()
+            self._catalog_session()
+            
+            if self.audio_filename is None:
+                self.log(f"录制已完成\n合流文件: {self.video_filename}")
+            elif self.segmented:
+                self.log(f"录制已完成，共 {len(self.finished_segments)} 个分段\n"
+                         f"视频清单: {self.video_manifest}\n音频清单: {self.audio_manifest}")
+            else:
+                self.log(f"录制已完成\n视频: {self.video_filename}\n音频: {self.audio_filename}")
             
         except Exception as e:
             self.log(f"停止录制时出错: {str(e)}")
             import traceback
             self.log(traceback.format_exc())
             
+    def _finish_stills(self):
+        """等待截图写完并生成缩略图总览"""
+        if self.stills is None:
+            return
+        try:
+            sheet = self.stills.finish()
+            stats = self.stills.stats()
+            text = f"截图 {stats['saved']} 张"
+            if stats['dropped'] or stats['errors']:
+                text += f"（跳过 {stats['dropped']} 张，失败 {stats['errors']} 张）"
+            if sheet is not None:
+                text += f"\n缩略图总览: {sheet}"
+            self.log(text)
+        except Exception as e:
+            self.log(f"保存截图失败: {str(e)}")
+            
+    def _catalog_session(self):
+        """把本次录制的文件、参数和统计摘要写入录制目录索引"""
+        if not self.catalog_enabled:
+            return
+        try:
+            def size(filename):
+                return os.path.getsize(filename) if filename and os.path.exists(filename) else 0
+            
+            if self.audio_filename is None:
+                # 实时合流：最终文件就是合流文件（分段时为拼接结果）
+                fields = {
+                    'mode': 'muxed',
+                    'video_input': self.video_filename,
+                    'merged_file': self.video_filename,
+                    'merge_status': MERGE_NOT_NEEDED,
+                    'duration': read_duration(self.video_filename),
+                    'video_bytes': size(self.video_filename),
+                }
+            else:
+                fields = {
+                    'mode': 'separate',
+                    'video_input': self.video_manifest or self.video_filename,
+                    'audio_input': self.audio_manifest or self.audio_filename,
+                    'merged_file': self.video_filename.replace('.mp4', '_with_audio.mp4'),
+                    'merge_status': MERGE_PENDING,
+                    'duration': sum(read_duration(s.video_filename) for s in self.finished_segments),
+                    'video_bytes': sum(size(s.video_filename) for s in self.finished_segments),
+                    'audio_bytes': sum(size(s.audio_filename) for s in self.finished_segments),
+                }
+            snapshot = self.metrics.snapshot()
+            summary = {
+                'gauges': snapshot['gauges'],
+                'counters': snapshot['counters'],
+                'histograms': {name: {key: h[key] for key in ('count', 'mean', 'p50', 'p95', 'max')}
+                               for name, h in snapshot['histograms'].items()},
+            }
+            # 降级会改变输出帧率，单独记录是否开启和最高降到哪一级
+            shedding = self.load_shedder.stats()
+            summary['load_shedding'] = {
+                'enabled': self.load_shedding,
+                'peak_level': shedding['peak_level'],
+                'peak': LEVEL_NAMES[shedding['peak_level']],
+                'transitions': shedding['transitions'],
+                'shed_frames': shedding['shed_frames'],
+            }
+            self.catalog.record(
+                self.session_timestamp,
+                segments=len(self.finished_segments) if self.segmented else 0,
+                width=self.video_source.width,
+                height=self.video_source.height,
+                fps=self.fps,
+                audio_delay=self.audio_delay,
+                source=self.video_source.describe(),
+                metrics=summary,
+                **fields
+            )
+        except Exception as e:
+            self.log(f"写入录制索引失败: {str(e)}")
+            
+    @property
+    def catalog(self):
+        """录制目录索引（第一次使用时打开）"""
+        if self._catalog is None:
+            self._catalog = RecordingCatalog(self.output_dir)
+        return self._catalog
+        
+    def reconcile_catalog(self):
+        """扫描录制目录，补录外部拷入的录制并清理已删除的录制"""
+        added, updated, removed = self.catalog.reconcile()
+        if added or updated or removed:
+            self.log(f"录制索引已同步: 新增 {added}，更新 {updated}，移除 {removed}")
+        return added, updated, removed
+        
+    def _log_camera_stats(self):
+        """录制结束时输出附加摄像头的统计和相对主摄像头的起始偏移"""
+        video_start = self.aligner.video_start if self.aligner is not None else None
+        for track in self.camera_tracks:
+            stats = track.stats()
+            text = (f"{track.name}: 采集 {stats['captured']} 帧，编码 {stats['encoded']} 帧，"
+                    f"丢弃 {stats['dropped']} 帧")
+            if video_start is not None and stats['first_time'] is not None:
+                text += f"，起始偏移 {stats['first_time'] - video_start:+.3f}s"
+            source = stats['source']
+            if source and 'jitter_ms' in source:
+                text += (f"\n  接收 {source['received']} 帧，跳过 {source['skipped']} 帧，"
+                         f"抖动 {source['jitter_ms']:.1f}ms，解码延迟 {source['decode_latency_ms']:.1f}ms，"
+                         f"重连 {source['reconnects']} 次")
+            self.log(f"{text}\n  {track.filename}")
+            
     def _save_audio(self):
-        """保存音频文件"""
-        if self.audio_frames:
-            try:
-                wf = wave.open(self.audio_filename, 'wb')
-                wf.setnchannels(self.CHANNELS)
-                wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
-                wf.setframerate(self.RATE)
-                wf.writeframes(b''.join(self.audio_frames))
-                wf.close()
-            except Exception as e:
-                self.log(f"保存音频失败: {str(e)}")
+        """写完剩余音频并关闭最后一个音频分段"""
+        try:
+            self._write_audio(self.aligner.flush())
+            with self.segment_lock:
+                # 视频已切到新分段但音频还没越过切换点时，直接切换
+                if self.next_audio_segment is not None:
+                    self._switch_audio_segment()
+            self.audio_segment.audio_closed.set()
+            self.audio_segment.audio_writer.close()
+        except Exception as e:
+            self.log(f"保存音频失败: {str(e)}")
                 
-    def merge_av(self, merge_method="FFmpeg"):
-        """合并音视频"""
+    def _apply_video_timestamps(self, segment):
+        """把每帧的采集时间换算到音频时钟上，写入视频文件的时间表（可变帧率）"""
         try:
-            # 检查文件是否存在
-            if not os.path.exists(self.video_filename):
-                self.log(f"找不到视频文件: {self.video_filename}")
-                return
-            if not os.path.exists(self.audio_filename):
-                self.log(f"找不到音频文件: {self.audio_filename}")
-                return
+            video_times, audio_points, end_time = load_timestamps(segment.timestamp_log.filename)
+            frame_times, end = video_frame_times(video_times, audio_points, self.RATE, end_time)
+            apply_frame_times(segment.video_filename, frame_times, end)
+            fit = fit_audio_clock(audio_points, self.RATE)
+            if fit is not None and not self.segmented:
+                self.log(f"音频时钟偏差: {(fit[1] / self.RATE - 1) * 1e6:+.0f} ppm")
+            if not self.segmented:
+                self.log(f"已按采集时间戳写入视频时间表（{len(frame_times)} 帧）")
+        except Exception as e:
+            self.log(f"写入视频时间戳失败，保留固定帧率: {str(e)}")
+            
+    def _join_segments(self):
+        """把实时合流的分段无损拼接成一个文件（流复制）"""
+        import subprocess
+        try:
+            cmd = [
+                'ffmpeg', '-y', '-loglevel', 'error',
+                '-f', 'concat', '-safe', '0', '-i', self.video_manifest,
+                '-c', 'copy', '-movflags', '+faststart',
+                self.video_filename
+            ]
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            self.log(f"拼接分段失败: {e.stderr}")
+        except Exception as e:
+            self.log(f"拼接分段失败: {str(e)}")
+                
+    def av_offset_key(self):
+        """音画偏移按 摄像头 + 音频设备 组合保存"""
+        video = self.video_source.device_key() or self.video_source.describe()
+        return f"av_offset|{video.split('|')[0]}|{self.audio_source.describe()}"
+        
+    def stored_av_offset(self):
+        """当前设备组合上次校准的音频延迟（毫秒），没有时返回 None"""
+        entry = self.device_cache.get(self.av_offset_key())
+        return entry.get('audio_delay') if entry else None
+        
+    def calibrate_av_offset(self, duration=5.0, max_offset=0.5):
+        """录制一小段校准片段，检测拍手声和对应的画面变化，自动设置音频延迟
+        
+        阻塞直到分析完成（应在后台线程中调用），返回 OffsetEstimate。
+        结果可靠时写入 audio_delay 并按设备组合保存；校准片段分析后删除。
+        """
+        from src.recorder.calibration import calibrate_files
+        if self.recording:
+            raise Exception("录制过程中不能校准")
+        
+        # 校准片段单独保存，不分段、不跳帧、不截图、不录附加摄像头，也不会出现在待合并列表中；
+        # 本方法在工作线程中运行，预览的 after 调度只能在 Tk 主线程中进行，校准期间不刷新预览
+        saved = (self.output_dir, self.output_mode, self.segment_seconds,
+                 self.segment_megabytes, self.extra_video_sources, self.export_metrics,
+                 self.motion_adaptive, self.still_interval, self.catalog_enabled,
+                 self.preview_renderer)
+        self.output_dir = os.path.join(saved[0], "calibration")
+        self.preview_renderer = None
+        self.export_metrics = False
+        self.catalog_enabled = False
+        self.motion_adaptive = False
+        self.still_interval = 0
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.output_mode = "separate"
+        self.segment_seconds = self.segment_megabytes = 0
+        self.extra_video_sources = []
+        try:
+            self.start_recording()
+            if not self.recording:
+                raise Exception("无法开始校准录制")
+            time.sleep(duration)
+            self.stop_recording()
+            self.save_thread.join()
+        finally:
+            (self.output_dir, self.output_mode, self.segment_seconds,
+             self.segment_megabytes, self.extra_video_sources, self.export_metrics,
+             self.motion_adaptive, self.still_interval, self.catalog_enabled,
+             self.preview_renderer) = saved
+        
+        video_file, audio_file = self.video_filename, self.audio_filename
+        sidecar = sidecar_filename(video_file)
+        try:
+            video_times, audio_points, _ = load_timestamps(sidecar)
+            frame_times, _ = video_frame_times(video_times, audio_points, self.RATE)
+            result = calibrate_files(video_file, audio_file, frame_times, max_offset)
+        finally:
+            for filename in (video_file, audio_file, sidecar):
+                if os.path.exists(filename):
+                    os.remove(filename)
+        
+        self.log(f"音画校准: {result.describe()}")
+        if result.reliable:
+            self.audio_delay = result.delay_ms
+            self.device_cache.put(self.av_offset_key(), {
+                'audio_delay': result.delay_ms,
+                'confidence': round(result.confidence, 3),
+            })
+        else:
+            self.log("未检测到清晰的拍手或闪光，音频延迟保持不变")
+        return result
+        
+    def merge_av(self, merge_method="Remux"):
+        """把本次录制的音视频合并任务加入队列，返回任务（无需合并时返回 None）"""
+        try:
+            if self.audio_filename is None:
+                self.log(f"本次录制已实时合流，无需再合并: {self.video_filename}")
+                return None
+            
+            # 检查文件是否存在（分段录制时检查 concat 清单）
+            video_input = self.video_manifest or self.video_filename
+            audio_input = self.audio_manifest or self.audio_filename
+            if not os.path.exists(video_input):
+                self.log(f"找不到视频文件: {video_input}")
+                return None
+            if not os.path.exists(audio_input):
+                self.log(f"找不到音频文件: {audio_input}")
+                return None
             
-            self.log("开始合并音视频...")
-            # 创建后台合并线程
-            merge_thread = threading.Thread(target=self._do_merge_av, args=(merge_method,))
-            merge_thread.daemon = True
-            merge_thread.start()
+            output_file = self.video_filename.replace('.mp4', '_with_audio.mp4')
+            return self._submit_merge(video_input, audio_input, output_file, merge_method)
         except Exception as e:
             self.log(f"合并准备失败: {str(e)}")
             raise
-
-    def _do_merge_av(self, merge_method):
+            
+    def merge_videos(self, merge_method="Remux"):
+        """把输出目录中所有尚未合并的录制加入合并队列，返回新加入的任务"""
+        if not os.path.exists(self.output_dir):
+            raise Exception("输出目录不存在")
+        
+        recordings = self._find_unmerged()
+        if not recordings:
+            self.log("没有需要合并的录制")
+            return []
+        
+        jobs = []
+        for video_input, audio_input, output_file in recordings:
+            job = self._submit_merge(video_input, audio_input, output_file, merge_method)
+            if job is not None:
+                jobs.append(job)
+        self.log(f"已加入 {len(jobs)} 个合并任务")
+        return jobs
+        
+    @property
+    def merge_queue(self):
+        """合并任务队列（第一次使用时创建，启动时不导入合并相关模块）"""
+        if self._merge_queue is None:
+            from src.recorder.merge_queue import MergeQueue
+            self._merge_queue = MergeQueue(self.merge_workers, on_update=self._on_merge_update)
+        return self._merge_queue
+        
+    def merge_jobs(self):
+        """当前的合并任务列表，还没有合并过时为空"""
+        if self._merge_queue is None:
+            return []
+        return list(self._merge_queue.jobs)
+        
+    def set_merge_workers(self, workers):
+        """设置同时运行的合并任务数"""
+        self.merge_workers = max(int(workers), 1)
+        if self._merge_queue is not None:
+            self._merge_queue.set_workers(self.merge_workers)
+        
+    def cancel_merge(self, job_id=None):
+        """取消指定的合并任务，未指定时取消全部"""
+        if job_id is None:
+            self.merge_queue.cancel_all()
+            return True
+        return self.merge_queue.cancel(job_id)
+        
+    def _find_unmerged(self):
+        """从录制目录索引中查找还没有合并结果的录制，返回 [(视频输入, 音频输入, 输出文件)]
+        
+        分段录制以 concat 清单作为输入；正在录制的这一次不包括在内。
+        """
+        current = getattr(self, 'session_timestamp', None) if self.recording else None
+        catalog = self.catalog
+        recordings = []
+        for row in catalog.unmerged(exclude=current):
+            video_input = catalog.path(row['video_input'])
+            audio_input = catalog.path(row['audio_input'])
+            output_file = catalog.path(row['merged_file'])
+            if os.path.exists(output_file):
+                catalog.set_merge_status(output_file, MERGE_DONE)
+                continue
+            if not os.path.exists(video_input) or not os.path.exists(audio_input):
+                continue
+            recordings.append((video_input, audio_input, output_file))
+        return recordings
+        
+    def _submit_merge(self, video_input, audio_input, output_file, merge_method):
+        """创建合并任务并加入队列；同一输出文件已有任务在排队或进行时不重复加入"""
+        existing = self.merge_queue.find(output_file)
+        if existing is not None:
+            self.log(f"合并任务已在队列中: {existing.name}")
+            return None
+        
+        from src.recorder.merge_queue import MergeJob
+        concat = video_input.endswith('.ffconcat')
+        name = os.path.basename(output_file)
+        if merge_method == "Remux" and not self._remux_applicable(video_input):
+            self.log(f"{name} 不能快速封装，改用 FFmpeg 合并")
+            merge_method = "FFmpeg"
+        if merge_method == "Remux":
+            job = MergeJob(
+                name,
+                output_file,
+                cmd=self._build_remux_command(video_input, audio_input, output_file, concat),
+                duration=self._media_duration(video_input)
+            )
+            # 快速封装失败时（例如容器不支持复制该视频流）改用滤镜方式重新合并
+            job.fallback = (video_input, audio_input, output_file, "FFmpeg")
+        elif merge_method == "FFmpeg":
+            job = MergeJob(
+                name,
+                output_file,
+                cmd=self._build_merge_command(video_input, audio_input, output_file, concat),
+                duration=self._media_duration(video_input)
+            )
+        else:
+            if concat:
+                raise Exception("分段录制请使用 FFmpeg 合并")
+            job = MergeJob(
+                name,
+                output_file,
+                func=lambda: self._merge_with_moviepy(video_input, audio_input, output_file)
+            )
+        return self.merge_queue.submit(job)
+        
+    def _remux_applicable(self, video_input):
+        """录制器写出的 MP4（或 MP4 分段清单）都可以直接复制视频流"""
+        if video_input.endswith('.ffconcat'):
+            return all(f.endswith('.mp4') for f in read_manifest(video_input))
+        return video_input.endswith('.mp4')
+        
+    def _build_remux_command(self, video_input, audio_input, output_file, concat=False):
+        """生成快速封装命令
+        
+        视频流直接复制；音频延迟通过输入时间戳偏移实现，不经过滤镜和重采样；
+        音频只编码一次（已经是 AAC 时直接复制）；输出 faststart MP4。
+        """
+        delay = self.audio_delay / 1000.0
+        cmd = ['ffmpeg', '-y']
+        if concat:
+            cmd += ['-f', 'concat', '-safe', '0']
+        cmd += ['-i', video_input]
+        if delay > 0:
+            # 音频延迟（正值）：整体推后音频的时间戳
+            cmd += ['-itsoffset', f'{delay:.3f}']
+        elif delay < 0:
+            # 音频提前（负值）：读取音频时跳过开头
+            cmd += ['-ss', f'{-delay:.3f}']
+        if concat:
+            cmd += ['-f', 'concat', '-safe', '0']
+        cmd += ['-i', audio_input, '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy']
+        if os.path.splitext(audio_input)[1].lower() in ('.m4a', '.aac'):
+            cmd += ['-c:a', 'copy']
+        else:
+            cmd += ['-c:a', 'aac']
+        cmd += ['-movflags', '+faststart', output_file]
+        return cmd
+        
+    def _build_merge_command(self, video_input, audio_input, output_file, concat=False):
+        """生成 FFmpeg 合并命令"""
+        # 根据延迟值的正负选择不同的处理方式
+        if self.audio_delay >= 0:
+            # 音频延迟（正值）：使用 adelay
+            filter_complex = f'adelay={self.audio_delay}|{self.audio_delay}'
+        else:
+            # 音频提前（负值）：使用 atrim 和 asetpts
+            delay_sec = abs(self.audio_delay) / 1000.0  # 转换为秒
+            filter_complex = f'atrim=start={delay_sec},asetpts=PTS-STARTPTS'
+        
+        cmd = ['ffmpeg', '-y']
+        if concat:
+            # 分段录制：通过 concat 清单直接读取所有分段
+            cmd += ['-f', 'concat', '-safe', '0', '-i', video_input,
+                    '-f', 'concat', '-safe', '0', '-i', audio_input]
+        else:
+            cmd += ['-i', video_input, '-i', audio_input]
+        cmd += [
+            '-c:v', 'copy',
+            '-c:a', 'aac',
+            '-vsync', 'cfr',
+            '-async', '1',
+            '-af', filter_complex,
+            output_file
+        ]
+        return cmd
+        
+    def _media_duration(self, video_input):
+        """合并输入的视频时长（秒），用于计算进度，读取失败时返回 None"""
         try:
-            output_file = self.video_filename.replace('.mp4', '_with_audio.mp4')
+            if video_input.endswith('.ffconcat'):
+                return sum(read_duration(f) for f in read_manifest(video_input))
+            return read_duration(video_input)
+        except Exception:
+            return None
+        
+    def _merge_with_moviepy(self, video_input, audio_input, output_file):
+        from moviepy.editor import VideoFileClip, AudioFileClip
+        video = VideoFileClip(video_input)
+        audio = AudioFileClip(audio_input)
+        try:
+            # 计算音频偏移（秒）
+            offset = self.audio_delay / 1000.0
             
-            if merge_method == "FFmpeg":
-                import subprocess
-                
-                # 根据延迟值的正负选择不同的处理方式
-                if self.audio_delay >= 0:
-                    # 音频延迟（正值）：使用 adelay
-                    filter_complex = f'adelay={self.audio_delay}|{self.audio_delay}'
-                else:
-                    # 音频提前（负值）：使用 atrim 和 asetpts
-                    delay_sec = abs(self.audio_delay) / 1000.0  # 转换为秒
-                    filter_complex = f'atrim=start={delay_sec},asetpts=PTS-STARTPTS'
-                
-                cmd = [
-                    'ffmpeg', '-y',
-                    '-i', self.video_filename,
-                    '-i', self.audio_filename,
-                    '-c:v', 'copy',
-                    '-c:a', 'aac',
-                    '-vsync', 'cfr',
-                    '-async', '1',
-                    '-af', filter_complex,
-                    output_file
-                ]
-                
-                # 添加错误输出捕获
-                result = subprocess.run(
-                    cmd,
-                    check=True,
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.stderr:
-                    self.log(f"FFmpeg 输出: {result.stderr}")
-                    
+            if offset >= 0:
+                # 音频延迟
+                final_clip = video.set_audio(audio.set_start(offset))
             else:
-                # moviepy 方式保持不变
-                from moviepy.editor import VideoFileClip, AudioFileClip
-                video = VideoFileClip(self.video_filename)
-                audio = AudioFileClip(self.audio_filename)
-                
-                # 计算音频偏移（秒）
-                offset = self.audio_delay / 1000.0
-                
-                if offset >= 0:
-                    # 音频延迟
-                    final_clip = video.set_audio(audio.set_start(offset))
-                else:
-                    # 音频提前
-                    final_clip = video.set_audio(audio).subclip(abs(offset))
-                
-                final_clip.write_videofile(output_file,
-                                         codec='libx264',
-                                         audio_codec='aac',
-                                         temp_audiofile='temp-audio.m4a',
-                                         remove_temp=True)
-                
-                # 清理资源
-                video.close()
-                audio.close()
-                
-            self.log(f"音视频合并完成: {output_file}")
+                # 音频提前
+                final_clip = video.set_audio(audio).subclip(abs(offset))
             
-        except Exception as e:
-            self.log(f"合并音视频失败: {str(e)}")
-            import traceback
-            self.log(traceback.format_exc())
+            # 临时音频文件按输出文件命名，多个任务同时运行时互不覆盖
+            final_clip.write_videofile(output_file,
+                                     codec='libx264',
+                                     audio_codec='aac',
+                                     temp_audiofile=output_file + '.temp-audio.m4a',
+                                     remove_temp=True,
+                                     logger=None)
+        finally:
+            # 清理资源
+            video.close()
+            audio.close()
+            
+    def _on_merge_update(self, job):
+        """合并任务状态变化时记录日志（进度由界面定期读取）"""
+        from src.recorder.merge_queue import JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED
+        if job.status == JOB_RUNNING and job.out_time == 0:
+            self.log(f"开始合并: {job.name}")
+        elif job.status == JOB_DONE:
+            self.log(f"音视频合并完成: {job.output_file}")
+            self._set_merge_status(job.output_file, MERGE_DONE)
+        elif job.status == JOB_FAILED:
+            if job.fallback is not None:
+                self.log(f"快速封装失败，改用 FFmpeg 重新合并: {job.name}\n" + '\n'.join(job.stderr_lines or [job.error]))
+                try:
+                    if self._submit_merge(*job.fallback) is not None:
+                        return
+                except Exception as e:
+                    self.log(f"合并准备失败: {str(e)}")
+            self.log(f"合并音视频失败: {job.name}\n" + '\n'.join(job.stderr_lines or [job.error]))
+            self._set_merge_status(job.output_file, MERGE_FAILED)
+        elif job.status == JOB_CANCELLED:
+            self.log(f"已取消合并: {job.name}")
 
+    def _set_merge_status(self, output_file, status):
+        try:
+            self.catalog.set_merge_status(output_file, status)
+        except Exception as e:
+            self.log(f"更新录制索引失败: {str(e)}")
+            
+    def _update_metric_gauges(self):
+        """把各组件的累计统计写入 Metrics 的当前值"""
+        metrics = self.metrics
+        queue_stats = self.encode_queue.stats()
+        metrics.gauge('capture_fps', self.capture_rate.rate)
+        metrics.gauge('frames_captured', self.frame_count)
+        metrics.gauge('frames_encoded', self.encoded_count)
+        metrics.gauge('frames_dropped', queue_stats['dropped'])
+        metrics.gauge('frames_static_skipped', self.motion_gate.skipped)
+        metrics.gauge('frames_load_shed', self.load_shedder.shed_frames)
+        metrics.gauge('load_shed_level', self.load_shedder.level)
+        metrics.gauge('load_shed_peak_level', self.load_shedder.peak_level)
+        metrics.gauge('load_shedding_enabled', int(self.load_shedding))
+        if self.stills is not None:
+            stats = self.stills.stats()
+            metrics.gauge('stills_saved', stats['saved'])
+            metrics.gauge('stills_dropped', stats['dropped'])
+        metrics.gauge('encode_queue_max_depth', queue_stats['max_depth'])
+        metrics.gauge('av_drift_ms', self.av_drift * 1000)
+        audio = self.audio_stats()
+        if audio:
+            metrics.gauge('audio_frames_per_buffer', audio['frames_per_buffer'])
+            metrics.gauge('audio_callback_jitter_ms', audio['jitter_ms'])
+            metrics.gauge('audio_input_overflows', audio['input_overflows'])
+            metrics.gauge('audio_ring_overruns', audio['overruns'])
+            metrics.gauge('audio_lost_frames', audio['lost_frames'])
+            metrics.gauge('audio_gap_frames', audio['gap_frames'])
+            metrics.gauge('audio_ring_max_fill', audio['max_fill'])
+        if self.preview_renderer is not None:
+            metrics.gauge('preview_skipped', self.preview_renderer.skipped)
+        for track in self.camera_tracks:
+            stats = track.stats()
+            metrics.gauge(f"{track.name}_fps", stats['fps'])
+            metrics.gauge(f"{track.name}_dropped", stats['dropped'])
+            
+    def metrics_snapshot(self):
+        """当前（或最近一次）录制的性能统计"""
+        if self.recording and self.encode_queue is not None:
+            self._update_metric_gauges()
+        return self.metrics.snapshot()
+        
+    def _save_metrics(self):
+        """录制结束时导出本次的性能统计（JSON 和 Prometheus 文本格式）"""
+        if not self.export_metrics:
+            return
+        try:
+            self._update_metric_gauges()
+            base = os.path.splitext(self.video_filename)[0]
+            labels = {
+                'session': self.session_timestamp,
+                'video': self.video_source.describe(),
+                'audio': self.audio_source.describe(),
+            }
+            json_file, _ = self.metrics.save(base, labels)
+            self.log(f"性能统计已保存: {json_file}")
+        except Exception as e:
+            self.log(f"保存性能统计失败: {str(e)}")
+            
     def _monitor_sync(self):
-        """监控并纠正音视频同步状态"""
+        """定期写出时间戳、估计音视频时长偏差并检查编码背压"""
         while self.recording:
-            video_time = self.frame_count / self.fps
-            audio_time = len(self.audio_frames) * self.CHUNK / float(self.RATE)
-            drift = audio_time - video_time  # 正值表示音频快于视频
+            self.segment.timestamp_log.flush()
+            self.audio_segment.timestamp_log.flush()
+            for track in self.camera_tracks:
+                track.flush()
             
-            if abs(drift) > 0.1:  # 超过100ms就纠正
-                self.log(f"检测到同步偏差: {drift:.3f}秒")
-                
-                if drift > 0:  # 音频快于视频
-                    # 调整视频帧率以追赶音频
-                    self.current_fps = self.fps * 1.1  # 临时提高10%的帧率
-                    self.log("加快视频采集速度")
-                else:  # 视频快于音频
-                    # 降低视频帧率以等待音频
-                    self.current_fps = self.fps * 0.9  # 临时降低10%的帧率
-                    self.log("降低视频采集速度")
-            else:
-                # 恢复正常帧率
-                self.current_fps = self.fps
+            # 对齐后的音频时长与已写入视频时长之差，只用于显示；
+            # 真正的同步在停止录制时按时间戳完成，不再调整采集帧率
+            if self.aligner.video_start is not None:
+                video_time = self.clock.now() - self.aligner.video_start
+                audio_time = self.aligner.position / float(self.RATE)
+                self.av_drift = audio_time - video_time
+                self.metrics.observe('av_drift_abs_ms', abs(self.av_drift) * 1000)
+            
+            self._check_backpressure()
+            self._update_load_shedding()
+            self._update_metric_gauges()
                 
             time.sleep(0.5)  # 每0.5秒检查一次
 
@@ -393,36 +1459,106 @@ class AVRecorder:
         """设置帧率"""
         self._fps = float(value)
         if hasattr(self, 'recording') and self.recording:
-            self.current_fps = self._fps  # 如果正在录制，同时更新当前帧率
             self.log(f"帧率已调整为: {self._fps:.1f}")
 
     def init_camera(self):
         """初始化摄像头"""
-        self.log("正在初始化摄像头...")
-        self.cap = cv2.VideoCapture(0)  # 默认使用第一个摄像头
-        
-        if not self.cap.isOpened():
-            raise Exception("无法打开摄像头")
-            
-        # 设置摄像头属性
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        self.log(f"正在初始化{self.video_source.describe()}...")
+        self.video_source.open()
         
         # 读取一帧测试
-        ret, _ = self.cap.read()
+        ret, _ = self.video_source.read()
         if not ret:
             raise Exception("无法从摄像头读取画面")
             
         self.log("摄像头初始化成功")
         
+    def _default_camera(self):
+        selected = self.device_cache.get("selected_camera") or {}
+        return CameraSource(selected.get('index', 0),
+                            selected.get('width', 1280),
+                            selected.get('height', 720))
+        
+    def discover_cameras(self, refresh=False, timeout=3.0):
+        """并行探测可用的摄像头，正在使用的摄像头不会被重新打开"""
+        from src.recorder.discovery import discover_cameras
+        in_use = [getattr(source, 'index', None)
+                  for source in [self.video_source] + self.extra_video_sources]
+        return discover_cameras(timeout=timeout, exclude=in_use, refresh=refresh, cache=self.device_cache)
+        
+    def select_camera(self, index, width=1280, height=720):
+        """切换主摄像头并记住选择，下次启动时直接使用"""
+        if self.recording:
+            raise Exception("录制中不能切换摄像头")
+        self.stop_fps_probe()
+        self.video_source.release()
+        self.extra_video_sources = [s for s in self.extra_video_sources
+                                    if getattr(s, 'index', None) != index]
+        self.video_source = CameraSource(index, width, height)
+        self.video_ready = False
+        self.device_cache.put("selected_camera", {'index': index, 'width': width, 'height': height})
+        self.init_video()
+        
+    def select_screen(self, region=None, window=None):
+        """切换为屏幕录制（X11 全屏、窗口或区域），帧率沿用当前设置"""
+        if self.recording:
+            raise Exception("录制中不能切换视频来源")
+        self.stop_fps_probe()
+        self.video_source.release()
+        self.video_source = ScreenSource(region=region, window=window, fps=self.fps)
+        self.video_ready = False
+        self.init_video()
+        
+    def start_fps_probe(self):
+        """在后台实测摄像头帧率并写入缓存（也用于用户要求重新检测）"""
+        if self.recording or not self.video_source.probe_fps:
+            return False
+        if self.probe_thread is not None and self.probe_thread.is_alive():
+            return False
+        self.probe_stop.clear()
+        self.probe_thread = threading.Thread(target=self._probe_fps)
+        self.probe_thread.daemon = True
+        self.probe_thread.start()
+        return True
+        
+    def stop_fps_probe(self):
+        """中止后台检测（开始录制前调用，检测与录制不能同时读取摄像头）"""
+        if self.probe_thread is not None:
+            self.probe_stop.set()
+            self.probe_thread.join()
+            self.probe_thread = None
+        
+    def _probe_fps(self):
+        try:
+            fps = self._detect_camera_fps()
+            if fps is None:
+                self.log("帧率检测已中止，继续使用当前帧率")
+                return
+            self.device_cache.put(self.video_source.device_key(), {
+                'fps': fps,
+                'width': self.video_source.width,
+                'height': self.video_source.height,
+                'reported_fps': self.video_source.fps,
+            })
+            self.detected_fps = fps
+            if not self.recording:
+                self.fps = fps
+            self.log(f"检测到摄像头实际帧率: {fps:.1f}（已缓存）")
+            if self.fps_callback is not None:
+                self.fps_callback(fps)
+        except Exception as e:
+            self.log(f"帧率检测失败: {str(e)}")
+        
     def _detect_camera_fps(self, test_duration=3.0):
-        """检测摄像头实际帧率"""
+        """检测摄像头实际帧率，被中止时返回 None"""
         self.log("正在检测摄像头实际帧率...")
         frames = 0
         start_time = time.perf_counter()
         
         while (time.perf_counter() - start_time) < test_duration:
-            ret, _ = self.cap.read()
+            if self.probe_stop.is_set():
+                return None
+            ret, _ = self.video_source.read()
             if ret:
                 frames += 1
             else:
@@ -430,6 +1566,8 @@ class AVRecorder:
                 break
                 
         actual_time = time.perf_counter() - start_time
+        if frames == 0:
+            raise Exception("无法从摄像头读取画面")
         detected_fps = frames / actual_time
         
         # 为了稳定性，略微降低检测到的帧率
@@ -438,26 +1576,16 @@ class AVRecorder:
         # 确保帧率在合理范围内
         return max(min(safe_fps, 60.0), 15.0)
 
-    def merge_videos(self):
-        """合并视频"""
-        # 检查是否有录制文件
-        if not os.path.exists(self.output_dir):
-            raise Exception("输出目录不存在")
-            
-        video_files = [f for f in os.listdir(self.output_dir) 
-                      if f.endswith('.mp4') and f.startswith('temp_')]
-                      
-        if not video_files:
-            raise Exception("没有找到可合并的视频文件")
-
     def __del__(self):
         try:
-            if hasattr(self, 'cap'):
-                self.cap.release()
-            if hasattr(self, 'video_writer'):
-                self.video_writer.release()
-            if hasattr(self, 'audio'):
-                self.audio.terminate()
+            if getattr(self, '_merge_queue', None) is not None:
+                self._merge_queue.shutdown()
+            if hasattr(self, 'video_source'):
+                self.video_source.release()
+            for source in getattr(self, 'extra_video_sources', []):
+                source.release()
+            if hasattr(self, 'audio_source'):
+                self.audio_source.close()
             cv2.destroyAllWindows()
         except:
             pass
\ No newline at end of file
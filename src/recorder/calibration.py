@@ -0,0 +1,169 @@
+import wave
+
+import cv2
+import numpy as np
+
+# 分析用的时间分辨率（秒）
+STEP = 0.005
+# 低于该相关度时认为没有找到对应的声音和画面事件
+MIN_CONFIDENCE = 0.3
+
+
+class OffsetEstimate:
+    """一次音画偏移校准的结果
+
+    offset 为画面事件相对声音事件的延后时间（秒），
+    即合并时需要的音频延迟；confidence 为最佳偏移处的归一化相关度（0~1）。
+    """
+
+    def __init__(self, offset, confidence, audio_events, video_events):
+        self.offset = offset
+        self.confidence = confidence
+        self.audio_events = audio_events
+        self.video_events = video_events
+
+    @property
+    def delay_ms(self):
+        return int(round(self.offset * 1000))
+
+    @property
+    def reliable(self):
+        return self.confidence >= MIN_CONFIDENCE and self.audio_events > 0 and self.video_events > 0
+
+    def describe(self):
+        return (f"音频延迟 {self.delay_ms:+d}ms（相关度 {self.confidence:.2f}，"
+                f"声音事件 {self.audio_events} 个，画面事件 {self.video_events} 个）")
+
+
+def audio_onsets(samples, rate, step=STEP):
+    """音频起音强度：每 step 秒的对数能量的正向变化"""
+    hop = max(int(rate * step), 1)
+    count = len(samples) // hop
+    if count < 2:
+        return np.zeros(count)
+    frames = samples[:count * hop].astype(np.float32).reshape(count, hop)
+    energy = np.log10(np.einsum('ij,ij->i', frames, frames) / hop + 1.0)
+    return np.maximum(np.diff(energy, prepend=energy[0]), 0.0)
+
+
+def video_activity(video_filename, size=(64, 36)):
+    """逐帧的画面变化量（缩小后灰度图的平均帧差），拍手和闪光都会形成尖峰
+
+    整体变暗的部分（闪光熄灭）不计入，避免与闪光亮起混淆。
+    """
+    cap = cv2.VideoCapture(video_filename)
+    if not cap.isOpened():
+        raise Exception(f"无法打开校准视频: {video_filename}")
+    frames = []
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            gray = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            frames.append(gray)
+    finally:
+        cap.release()
+    if len(frames) < 2:
+        return np.zeros(len(frames))
+    stack = np.stack(frames).astype(np.int16)
+    diffs = np.diff(stack, axis=0)
+    activity = np.abs(diffs).mean(axis=(1, 2)) - np.maximum(-diffs.mean(axis=(1, 2)), 0.0)
+    return np.concatenate(([0.0], activity))
+
+
+def _spikes(values, width):
+    """去掉缓慢变化的背景，只保留尖峰"""
+    if len(values) == 0:
+        return values
+    width = max(int(width) | 1, 3)
+    padded = np.pad(values, width // 2, mode='edge')
+    windows = np.lib.stride_tricks.sliding_window_view(padded, width)
+    return np.maximum(values - np.median(windows, axis=1), 0.0)
+
+
+def _count_events(values, ratio=0.5):
+    """高于最大值一定比例的独立尖峰个数"""
+    if len(values) == 0 or values.max() <= 0:
+        return 0
+    above = values >= values.max() * ratio
+    return int(np.count_nonzero(above[1:] & ~above[:-1]) + above[0])
+
+
+def _smooth(values, sigma):
+    """高斯平滑，使相邻几个采样点上的事件也能对上"""
+    radius = max(int(sigma * 3), 1)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / max(sigma, 1e-6)) ** 2)
+    return np.convolve(values, kernel / kernel.sum(), mode='same')
+
+
+def estimate_offset(audio_strength, video_strength, video_times, step=STEP, max_offset=0.5):
+    """互相关估计画面相对声音的延后时间
+
+    audio_strength 为每 step 秒一个值的声音起音强度，
+    video_strength 为每帧的画面变化量，video_times 为各帧时间（秒，与音频同一时间轴）。
+    """
+    audio_strength = np.asarray(audio_strength, dtype=np.float64)
+    video_strength = np.asarray(video_strength, dtype=np.float64)
+    video_times = np.asarray(video_times, dtype=np.float64)[:len(video_strength)]
+    video_strength = video_strength[:len(video_times)]
+    length = len(audio_strength)
+    if length < 2 or len(video_strength) < 3:
+        return OffsetEstimate(0.0, 0.0, 0, 0)
+
+    # 帧间隔内的时间无法分辨，按帧间隔对两路信号做同样的平滑
+    frame_step = float(np.median(np.diff(video_times))) if len(video_times) > 1 else 1 / 30.0
+    sigma = max(frame_step / step / 2, 1.0)
+
+    audio = _spikes(audio_strength, frame_step * 4 / step)
+    video_spikes = _spikes(video_strength, 5)
+    video = np.zeros(length)
+    bins = np.round(video_times / step).astype(int)
+    valid = (bins >= 0) & (bins < length)
+    np.add.at(video, bins[valid], video_spikes[valid])
+
+    audio_events = _count_events(audio)
+    video_events = _count_events(video_spikes)
+    audio = _smooth(audio, sigma)
+    video = _smooth(video, sigma)
+    audio -= audio.mean()
+    video -= video.mean()
+    norm = np.linalg.norm(audio) * np.linalg.norm(video)
+    if norm <= 0:
+        return OffsetEstimate(0.0, 0.0, audio_events, video_events)
+
+    # correlation[k] = sum(audio[n] * video[n + lag])，lag = k - (length - 1)
+    correlation = np.correlate(video, audio, mode='full') / norm
+    lags = np.arange(-(length - 1), length)
+    max_lag = int(max_offset / step)
+    window = np.abs(lags) <= max_lag
+    best = int(np.argmax(np.where(window, correlation, -np.inf)))
+    return OffsetEstimate(lags[best] * step, float(max(correlation[best], 0.0)),
+                          audio_events, video_events)
+
+
+def read_wav_samples(audio_filename):
+    """读取 16 位 PCM WAV，多声道混为单声道，返回 (采样, 采样率)"""
+    with wave.open(audio_filename, 'rb') as wf:
+        rate = wf.getframerate()
+        channels = wf.getnchannels()
+        data = wf.readframes(wf.getnframes())
+    samples = np.frombuffer(data, dtype=np.int16)
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def calibrate_files(video_filename, audio_filename, frame_times, max_offset=0.5):
+    """分析一段录制的视频和音频文件，返回 OffsetEstimate
+
+    frame_times 为各帧在音频时间轴上的时间（秒），与写入视频文件的时间表一致。
+    """
+    samples, rate = read_wav_samples(audio_filename)
+    return estimate_offset(
+        audio_onsets(samples, rate),
+        video_activity(video_filename),
+        frame_times,
+        max_offset=max_offset,
+    )
@@ -0,0 +1,149 @@
+import threading
+
+from src.recorder.encoders import get_encoder, DEFAULT_ENCODER
+from src.recorder.pipeline import FrameQueue, RateMeter, POLICY_DROP_OLDEST
+from src.recorder.mp4_timing import apply_frame_times
+from src.recorder.sync import TimestampLog, sidecar_filename, load_timestamps, video_frame_times
+
+
+class CameraTrack:
+    """一路附加摄像头的录制
+
+    每路摄像头有自己的采集线程、编码队列、编码线程和输出文件，互不等待：
+    某一路读帧或编码变慢只会让它自己的队列丢帧，不会拖慢其他摄像头。
+    所有帧都用录制器共享的 MasterClock 打时间戳并写入各自的旁路文件，
+    与主摄像头和音频的时间戳处于同一时间轴上，之后可以据此对齐。
+    """
+
+    def __init__(self, name, source, queue_size=60, drop_policy=POLICY_DROP_OLDEST, log=print):
+        self.name = name
+        self.source = source
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.log = log
+
+        self.filename = None
+        self.writer = None
+        self.timestamp_log = None
+        self.encode_queue = None
+        self.capture_thread = None
+        self.encode_thread = None
+        self.running = False
+        self.error = None
+
+        # 统计
+        self.frame_count = 0
+        self.encoded_count = 0
+        self.first_time = None
+        self.rate = RateMeter()
+
+    def open(self, filename, fps, encoder=None):
+        """打开摄像头（尚未打开时）和输出文件；encoder 为 EncoderPreset，默认 mp4v"""
+        if not self.source.is_opened():
+            self.source.open()
+        self.filename = filename
+        encoder = encoder or get_encoder(DEFAULT_ENCODER)
+        self.writer = encoder.create_writer(filename, self.source.width, self.source.height, fps)
+        self.timestamp_log = TimestampLog(sidecar_filename(filename))
+        self.encode_queue = FrameQueue(self.queue_size, self.drop_policy, self.name)
+
+    def start(self, clock):
+        """开始采集；clock 为录制器共享的主时钟"""
+        self.clock = clock
+        self.frame_count = 0
+        self.encoded_count = 0
+        self.first_time = None
+        self.error = None
+        self.rate.reset()
+        self.running = True
+
+        self.encode_thread = threading.Thread(target=self._encode)
+        self.encode_thread.daemon = True
+        self.encode_thread.start()
+        self.capture_thread = threading.Thread(target=self._capture)
+        self.capture_thread.daemon = True
+        self.capture_thread.start()
+
+    def stop(self):
+        """通知采集线程停止，不等待"""
+        self.running = False
+
+    def finish(self):
+        """等待剩余的帧写完，释放资源并按采集时间戳改写时间表"""
+        if self.capture_thread is not None:
+            self.capture_thread.join(timeout=1)
+        if self.encode_queue is not None:
+            self.encode_queue.close()
+        if self.encode_thread is not None:
+            self.encode_thread.join()
+        self.capture_thread = None
+        self.encode_thread = None
+
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        self.source.release()
+        if self.timestamp_log is not None:
+            self.timestamp_log.close()
+        if self.encoded_count:
+            try:
+                video_times, _, _ = load_timestamps(self.timestamp_log.filename)
+                # 附加摄像头没有音频，直接使用主时钟上的采集时间
+                frame_times, _ = video_frame_times(video_times, [], 1)
+                apply_frame_times(self.filename, frame_times)
+            except Exception as e:
+                self.log(f"{self.name} 写入视频时间戳失败，保留固定帧率: {str(e)}")
+
+    def flush(self):
+        if self.timestamp_log is not None:
+            self.timestamp_log.flush()
+
+    def stats(self):
+        """实际帧率与丢帧统计"""
+        queue_stats = self.encode_queue.stats() if self.encode_queue is not None else {}
+        return {
+            'name': self.name,
+            'fps': self.rate.rate,
+            'captured': self.frame_count,
+            'encoded': self.encoded_count,
+            'dropped': queue_stats.get('dropped', 0),
+            'depth': queue_stats.get('depth', 0),
+            'first_time': self.first_time,
+            # 网络来源（如 MJPEG）额外提供的抖动、重连等统计
+            'source': self.source.stats() if hasattr(self.source, 'stats') else None,
+        }
+
+    def _capture(self):
+        try:
+            while self.running:
+                ret, frame = self.source.read()
+                if not ret and self.source.finished:
+                    self.log(f"{self.name} 已播放完毕")
+                    break
+                if ret:
+                    now = self.clock.now()
+                    self.encode_queue.put((frame, now))
+                    self.rate.tick(now)
+                    self.frame_count += 1
+        except Exception as e:
+            self.error = e
+            self.log(f"{self.name} 采集错误: {str(e)}")
+        finally:
+            self.encode_queue.close()
+
+    def _encode(self):
+        try:
+            while True:
+                item = self.encode_queue.get()
+                if item is None:
+                    break
+                frame, timestamp = item
+                if self.first_time is None:
+                    self.first_time = timestamp
+                self.writer.write(frame)
+                self.timestamp_log.video(self.encoded_count, timestamp)
+                self.encoded_count += 1
+        except Exception as e:
+            self.error = e
+            self.log(f"{self.name} 编码错误: {str(e)}")
+            self.encode_queue.close()
@@ -0,0 +1,234 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from src.recorder.mp4_timing import read_duration
+from src.recorder.segments import read_manifest
+
+# 合并状态
+MERGE_PENDING = "pending"      # 分别保存，尚未合并
+MERGE_DONE = "done"
+MERGE_FAILED = "failed"
+MERGE_NOT_NEEDED = "muxed"     # 实时合流录制，本身就是合流文件
+
+_SESSION_RE = re.compile(r'^(video|audio)_(\d{8}_\d{6})(_with_audio)?(_\d{3})?\.(mp4|wav|ffconcat)$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session TEXT PRIMARY KEY,
+    created TEXT,
+    mode TEXT,
+    video_input TEXT,
+    audio_input TEXT,
+    merged_file TEXT,
+    segments INTEGER DEFAULT 0,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    fps REAL,
+    video_bytes INTEGER DEFAULT 0,
+    audio_bytes INTEGER DEFAULT 0,
+    audio_delay INTEGER,
+    merge_status TEXT,
+    source TEXT,
+    metrics TEXT,
+    updated TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_merge_status ON sessions (merge_status);
+CREATE INDEX IF NOT EXISTS sessions_merged_file ON sessions (merged_file);
+"""
+
+_COLUMNS = ('session', 'created', 'mode', 'video_input', 'audio_input', 'merged_file', 'segments',
+            'duration', 'width', 'height', 'fps', 'video_bytes', 'audio_bytes', 'audio_delay',
+            'merge_status', 'source', 'metrics', 'updated')
+
+
+def default_catalog_filename(output_dir):
+    return os.path.join(output_dir, "catalog.sqlite3")
+
+
+def _session_created(session):
+    """会话名（YYYYmmdd_HHMMSS）转换为可读时间"""
+    try:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.strptime(session, "%Y%m%d_%H%M%S"))
+    except ValueError:
+        return None
+
+
+class RecordingCatalog:
+    """录制目录的 SQLite 索引
+
+    每次录制结束时写入该次录制的文件、时长、分辨率、帧率、大小、音频延迟、
+    合并状态和性能统计摘要；查找未合并的录制、列出历史录制都只查询数据库，
+    不再遍历录制目录。reconcile() 扫描一次目录，补录外部拷入的文件、
+    清理已被删除的录制，启动时在后台调用。
+    文件路径以相对录制目录的文件名保存，整个目录可以移动。
+    """
+
+    def __init__(self, directory, filename=None):
+        self.directory = directory
+        self.filename = filename or default_catalog_filename(directory)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            # WAL 模式下批处理工具读取时不会阻塞录制程序写入
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def path(self, name):
+        """数据库中保存的文件名转换为绝对路径"""
+        return os.path.join(self.directory, name) if name else None
+
+    def _name(self, path):
+        return os.path.basename(path) if path else None
+
+    def record(self, session, **fields):
+        """新增或更新一次录制，只修改给出的字段；文件字段可以是绝对路径"""
+        for key in ('video_input', 'audio_input', 'merged_file'):
+            if key in fields:
+                fields[key] = self._name(fields[key])
+        if 'metrics' in fields and not isinstance(fields['metrics'], (str, type(None))):
+            fields['metrics'] = json.dumps(fields['metrics'], ensure_ascii=False)
+        unknown = set(fields) - set(_COLUMNS)
+        if unknown:
+            raise ValueError(f"未知的字段: {', '.join(sorted(unknown))}")
+        fields['updated'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        fields.setdefault('created', _session_created(session))
+        columns = ', '.join(['session'] + list(fields))
+        placeholders = ', '.join('?' * (len(fields) + 1))
+        # created 只在第一次写入时设置
+        updates = ', '.join(f"{key} = excluded.{key}" for key in fields if key != 'created')
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"INSERT INTO sessions ({columns}) VALUES ({placeholders}) "
+                f"ON CONFLICT(session) DO UPDATE SET {updates}",
+                [session] + list(fields.values()))
+
+    def get(self, session):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM sessions WHERE session = ?", (session,)).fetchone()
+        return dict(row) if row else None
+
+    def sessions(self, merge_status=None, limit=None):
+        """按时间倒序列出录制，可按合并状态筛选"""
+        query = "SELECT * FROM sessions"
+        params = []
+        if merge_status is not None:
+            statuses = [merge_status] if isinstance(merge_status, str) else list(merge_status)
+            query += f" WHERE merge_status IN ({', '.join('?' * len(statuses))})"
+            params += statuses
+        query += " ORDER BY session DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def unmerged(self, exclude=None):
+        """需要合并的录制（尚未合并或上次合并失败），按时间顺序"""
+        rows = self.sessions((MERGE_PENDING, MERGE_FAILED))
+        return [row for row in reversed(rows) if row['session'] != exclude]
+
+    def set_merge_status(self, merged_file, status):
+        """按合并输出文件更新合并状态，返回是否找到对应的录制"""
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "UPDATE sessions SET merge_status = ?, updated = ? WHERE merged_file = ?",
+                (status, time.strftime("%Y-%m-%d %H:%M:%S"), self._name(merged_file)))
+        return cursor.rowcount > 0
+
+    def remove(self, session):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE session = ?", (session,))
+
+    def reconcile(self):
+        """扫描录制目录，与数据库对账，返回 (新增, 更新, 删除) 的数量"""
+        found = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                match = _SESSION_RE.match(entry.name)
+                if match is None or not entry.is_file():
+                    continue
+                kind, session, with_audio, segment, ext = match.groups()
+                files = found.setdefault(session, {'segments': 0, 'video_bytes': 0, 'audio_bytes': 0})
+                size = entry.stat().st_size
+                if segment:
+                    # 分段文件只计入大小和数量，输入以 concat 清单为准
+                    if kind == 'video':
+                        files['segments'] += 1
+                        files['video_bytes'] += size
+                    else:
+                        files['audio_bytes'] += size
+                elif with_audio:
+                    if ext == 'mp4':
+                        files['merged_file'] = entry.name
+                        files['merged_bytes'] = size
+                    elif kind == 'video' and ext == 'ffconcat':
+                        # 实时合流分段录制的 concat 清单（分段拼接失败时只有它和各分段）
+                        files['muxed_manifest'] = entry.name
+                else:
+                    files[f'{kind}_input'] = entry.name
+                    if ext != 'ffconcat':
+                        files[f'{kind}_bytes'] += size
+
+        known = {row['session']: row for row in self.sessions()}
+        added = updated = 0
+        for session, files in found.items():
+            row = known.get(session)
+            if files.get('video_input') and files.get('audio_input'):
+                mode = 'separate'
+                status = MERGE_DONE if files.get('merged_file') else MERGE_PENDING
+                merged_file = files.get('merged_file') or f"video_{session}_with_audio.mp4"
+            elif files.get('merged_file') or files.get('muxed_manifest'):
+                # 实时合流：有拼接好的文件时以它为准，否则把分段的 concat 清单当作合流文件
+                mode = 'muxed'
+                status = MERGE_NOT_NEEDED
+                merged_file = files.get('merged_file') or files['muxed_manifest']
+                files['video_input'] = merged_file
+                if files.get('merged_file'):
+                    files['video_bytes'] = files.get('merged_bytes', 0)
+            else:
+                # 只有视频或只有音频，无法合并，也不算完整的录制
+                continue
+
+            if row is None:
+                duration = None
+                video = files.get('video_input') if mode == 'separate' else merged_file
+                if video:
+                    try:
+                        duration = self._duration(os.path.join(self.directory, video))
+                    except Exception:
+                        pass
+                self.record(session, mode=mode, video_input=files['video_input'],
+                            audio_input=files.get('audio_input'), merged_file=merged_file,
+                            segments=files['segments'], duration=duration,
+                            video_bytes=files['video_bytes'], audio_bytes=files['audio_bytes'],
+                            merge_status=status)
+                added += 1
+            elif row['merge_status'] != status \
+                    and not (status == MERGE_PENDING and row['merge_status'] == MERGE_FAILED):
+                self.record(session, merge_status=status)
+                updated += 1
+
+        removed = [session for session in known if session not in found]
+        for session in removed:
+            self.remove(session)
+        return added, updated, len(removed)
+
+    @staticmethod
+    def _duration(filename):
+        """MP4 文件的时长；concat 清单为各分段时长之和"""
+        if filename.endswith('.ffconcat'):
+            return sum(read_duration(name) for name in read_manifest(filename))
+        return read_duration(filename)
@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+import time
+
+
+def default_cache_filename():
+    """设备能力缓存的默认位置（用户目录下，与录制目录无关）"""
+    return os.path.join(os.path.expanduser("~"), ".av_recorder", "devices.json")
+
+
+class DeviceCapabilityCache:
+    """设备能力缓存
+
+    以“设备标识|请求的模式”为键，保存实测帧率、实际分辨率等探测结果，
+    持久化为 JSON 文件。已知设备启动时直接使用缓存，不再实测；
+    设备或请求的模式变化时键也随之变化，自然会重新探测。
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename or default_cache_filename()
+        self.lock = threading.Lock()
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.filename, encoding='utf-8') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            # 缓存不存在或已损坏时当作空缓存，重新探测即可
+            return {}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            return dict(entry) if entry else None
+
+    def put(self, key, info):
+        """保存一个设备的探测结果并写盘"""
+        entry = dict(info)
+        entry['probed_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            self.entries[key] = entry
+            self._save()
+
+    def remove(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_name = self.filename + ".tmp"
+        with open(temp_name, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(temp_name, self.filename)
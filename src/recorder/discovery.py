@@ -0,0 +1,194 @@
+import os
+import re
+import threading
+import time
+
+import cv2
+
+from src.recorder.device_cache import DeviceCapabilityCache
+from src.recorder.sources import CameraSource
+
+# 逐个尝试的常见分辨率
+COMMON_MODES = [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+# 逐个尝试的常见像素格式
+COMMON_FOURCCS = ['MJPG', 'YUYV', 'YUY2', 'H264']
+
+# 本进程内的探测结果，同一设备不重复打开
+_session_cache = {}
+_session_lock = threading.Lock()
+
+
+class CameraInfo:
+    """一个摄像头的探测结果"""
+
+    def __init__(self, index, identity):
+        self.index = index
+        self.identity = identity
+        self.name = None
+        self.available = False
+        self.timed_out = False
+        self.in_use = False
+        self.error = None
+        self.modes = []      # [(宽, 高, 帧率)]
+        self.fourccs = []
+        self.probe_time = 0.0
+        self.cached = False
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'available': self.available,
+            'modes': [list(mode) for mode in self.modes],
+            'fourccs': list(self.fourccs),
+        }
+
+    @classmethod
+    def from_dict(cls, index, identity, data):
+        info = cls(index, identity)
+        info.name = data.get('name')
+        info.available = data.get('available', False)
+        info.modes = [tuple(mode) for mode in data.get('modes', [])]
+        info.fourccs = list(data.get('fourccs', []))
+        info.cached = True
+        return info
+
+    def best_mode(self, width=1280, height=720):
+        """最接近请求分辨率的模式"""
+        if not self.modes:
+            return None
+        return min(self.modes, key=lambda m: abs(m[0] * m[1] - width * height))
+
+    def describe(self):
+        if self.timed_out:
+            return f"{self.index}: 打开超时"
+        if not self.available:
+            return f"{self.index}: 不可用"
+        name = self.name or f"摄像头 {self.index}"
+        if self.in_use:
+            name += "（使用中）"
+        details = [", ".join(f"{w}x{h}@{fps:.0f}" for w, h, fps in self.modes[:3]), "/".join(self.fourccs)]
+        details = "; ".join(d for d in details if d)
+        return f"{self.index}: {name} ({details})" if details else f"{self.index}: {name}"
+
+
+def candidate_indexes(max_index=10):
+    """需要探测的摄像头索引；Linux 上只探测实际存在的 /dev/video* 设备"""
+    sysfs = "/sys/class/video4linux"
+    if os.path.isdir(sysfs):
+        indexes = []
+        for name in os.listdir(sysfs):
+            match = re.match(r'video(\d+)$', name)
+            if match:
+                indexes.append(int(match.group(1)))
+        return sorted(indexes)
+    return list(range(max_index))
+
+
+def _fourcc_text(value):
+    value = int(value)
+    text = "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+    return text if text.isprintable() and text.strip() else None
+
+
+def probe_camera(index, modes=COMMON_MODES, fourccs=COMMON_FOURCCS):
+    """打开摄像头并逐个尝试分辨率和像素格式（不显示画面）"""
+    source = CameraSource(index)
+    info = CameraInfo(index, source.device_identity())
+    start = time.perf_counter()
+    cap = cv2.VideoCapture(index)
+    try:
+        if not cap.isOpened():
+            return info
+        ret, _ = cap.read()
+        info.available = bool(ret)
+        if not ret:
+            return info
+        if info.identity.startswith("v4l2:"):
+            info.name = info.identity[5:].split("@")[0]
+
+        default = _fourcc_text(cap.get(cv2.CAP_PROP_FOURCC))
+        for fourcc in fourccs:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+            actual = _fourcc_text(cap.get(cv2.CAP_PROP_FOURCC))
+            if actual == fourcc and fourcc not in info.fourccs:
+                info.fourccs.append(fourcc)
+        if default and default not in info.fourccs:
+            info.fourccs.insert(0, default)
+        if default:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*default))
+
+        # 设置后读回实际值，驱动不支持的分辨率会被调整到最接近的模式
+        for width, height in modes:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            mode = (
+                int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+            )
+            if mode[0] and mode[1] and mode not in info.modes:
+                info.modes.append(mode)
+        info.modes.sort()
+    except Exception as e:
+        info.error = str(e)
+    finally:
+        cap.release()
+        info.probe_time = time.perf_counter() - start
+    return info
+
+
+def discover_cameras(indexes=None, timeout=3.0, exclude=(), refresh=False, cache=None):
+    """并行探测摄像头，每个设备最多等待 timeout 秒
+
+    Linux 上设备标识稳定（设备名 + 总线路径），结果会持久化到设备能力缓存，
+    之后启动时不再打开这些设备；refresh 为 True 时忽略所有缓存重新探测。
+    exclude 中的索引（如正在使用的摄像头）不打开，只返回标识。
+    返回按索引排序的 CameraInfo 列表，超时的设备 timed_out 为 True。
+    """
+    if indexes is None:
+        indexes = candidate_indexes()
+    cache = cache or DeviceCapabilityCache()
+
+    results = {}
+    pending = []
+    for index in indexes:
+        identity = CameraSource(index).device_identity()
+        with _session_lock:
+            info = None if refresh else _session_cache.get(identity)
+        if info is None and not refresh and identity.startswith("v4l2:"):
+            cached = cache.get(f"{identity}|modes")
+            if cached:
+                info = CameraInfo.from_dict(index, identity, cached)
+        if info is None and index in exclude:
+            info = CameraInfo(index, identity)
+            info.available = True
+            info.in_use = True
+        if info is not None:
+            results[index] = info
+        else:
+            pending.append(index)
+
+    # 每个设备一个守护线程，打开卡住的设备不会阻塞其他设备，也不会阻止程序退出
+    threads = {}
+    for index in pending:
+        slot = []
+        thread = threading.Thread(target=lambda i=index, s=slot: s.append(probe_camera(i)))
+        thread.daemon = True
+        thread.start()
+        threads[index] = (thread, slot)
+
+    deadline = time.monotonic() + timeout
+    for index, (thread, slot) in threads.items():
+        thread.join(max(deadline - time.monotonic(), 0))
+        if slot:
+            info = slot[0]
+            with _session_lock:
+                _session_cache[info.identity] = info
+            if info.available and info.identity.startswith("v4l2:"):
+                cache.put(f"{info.identity}|modes", info.to_dict())
+        else:
+            info = CameraInfo(index, CameraSource(index).device_identity())
+            info.timed_out = True
+        results[index] = info
+
+    return [results[index] for index in sorted(results)]
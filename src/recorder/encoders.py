@@ -0,0 +1,248 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+KIND_OPENCV = "opencv"    # cv2.VideoWriter + fourcc
+KIND_FFMPEG = "ffmpeg"    # 原始帧通过管道送入 ffmpeg
+
+DEFAULT_ENCODER = "opencv_mp4v"
+# 实时合流只能使用 ffmpeg 编码器，选择了 OpenCV 编码器时改用这一个
+DEFAULT_MUX_ENCODER = "x264_veryfast"
+
+
+class EncoderPreset:
+    """一种视频编码方式（编码器 + 参数）
+
+    mp4 表示可以写入 MP4 并被 ffmpeg 直接复制合并（录制器只能使用这类编码），
+    extension 为单独使用时推荐的文件扩展名。
+    """
+
+    def __init__(self, name, kind, codec, description, extension='.mp4', mp4=True,
+                 lossless=False, preset=None, crf=None, video_args=None):
+        self.name = name
+        self.kind = kind
+        self.codec = codec
+        self.description = description
+        self.extension = extension
+        self.mp4 = mp4
+        self.lossless = lossless
+        self.preset = preset
+        self.crf = crf
+        self.video_args = list(video_args or [])
+
+    def available(self):
+        if self.kind == KIND_OPENCV:
+            return _opencv_fourcc_available(self.codec, '.mp4' if self.mp4 else self.extension)
+        return self.codec in _ffmpeg_encoders()
+
+    def create_writer(self, filename, width, height, fps):
+        """创建只写视频的写入器，接口与 cv2.VideoWriter 一致（write/release/isOpened）"""
+        if self.kind == KIND_OPENCV:
+            writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*self.codec), fps, (width, height), True)
+            if not writer.isOpened():
+                raise Exception(f"无法创建视频文件（{self.name}）: {filename}")
+            return writer
+        from src.recorder.ffmpeg_writer import FFmpegVideoWriter
+        return FFmpegVideoWriter(filename, width, height, fps, video_codec=self.codec,
+                                 **self._ffmpeg_options()).open()
+
+    def create_mux_writer(self, filename, width, height, fps, audio_rate, audio_channels, sample_width):
+        """创建实时合流写入器（仅 ffmpeg 编码器）"""
+        if self.kind != KIND_FFMPEG:
+            raise Exception(f"{self.name} 不能用于实时合流")
+        from src.recorder.ffmpeg_writer import FFmpegMuxWriter
+        return FFmpegMuxWriter(filename, width, height, fps, audio_rate, audio_channels, sample_width,
+                               video_codec=self.codec, **self._ffmpeg_options()).open()
+
+    def _ffmpeg_options(self):
+        options = {'video_args': self.video_args}
+        if self.preset is not None:
+            options['preset'] = self.preset
+        if self.crf is not None:
+            options['crf'] = self.crf
+        return options
+
+    def __repr__(self):
+        return f"EncoderPreset({self.name})"
+
+
+ENCODERS = {}
+
+
+def register_encoder(preset):
+    ENCODERS[preset.name] = preset
+    return preset
+
+
+def get_encoder(name):
+    if name not in ENCODERS:
+        raise Exception(f"未知的编码器: {name}")
+    return ENCODERS[name]
+
+
+for _preset in [
+    EncoderPreset("opencv_mp4v", KIND_OPENCV, 'mp4v', "OpenCV MPEG-4 Part 2"),
+    EncoderPreset("opencv_mjpg", KIND_OPENCV, 'MJPG', "OpenCV Motion JPEG（编码快、文件大）"),
+    # 写入 MP4 时 OpenCV 会改用 mp4v（与 opencv_mp4v 相同），因此只用于 AVI（VideoRecorder）
+    EncoderPreset("opencv_xvid", KIND_OPENCV, 'XVID', "OpenCV Xvid", extension='.avi', mp4=False),
+    EncoderPreset("x264_ultrafast", KIND_FFMPEG, 'libx264', "H.264 ultrafast", preset='ultrafast', crf=23),
+    EncoderPreset("x264_veryfast", KIND_FFMPEG, 'libx264', "H.264 veryfast", preset='veryfast', crf=23),
+    EncoderPreset("x264_medium", KIND_FFMPEG, 'libx264', "H.264 medium", preset='medium', crf=23),
+    EncoderPreset("x265_ultrafast", KIND_FFMPEG, 'libx265', "H.265 ultrafast", preset='ultrafast', crf=28,
+                  video_args=['-tag:v', 'hvc1']),
+    EncoderPreset("x265_fast", KIND_FFMPEG, 'libx265', "H.265 fast", preset='fast', crf=28,
+                  video_args=['-tag:v', 'hvc1']),
+    # 无损：x264 RGB 模式可以写入 MP4；FFV1 只能写入 MKV，录制器不能使用
+    EncoderPreset("x264_lossless", KIND_FFMPEG, 'libx264rgb', "H.264 RGB 无损", lossless=True,
+                  preset='ultrafast', crf=0),
+    EncoderPreset("ffv1", KIND_FFMPEG, 'ffv1', "FFV1 无损（MKV）", extension='.mkv', mp4=False,
+                  lossless=True, video_args=['-level', '3', '-slices', '4']),
+]:
+    register_encoder(_preset)
+
+
+_ffmpeg_encoder_names = None
+_opencv_fourccs = {}
+
+
+def _ffmpeg_encoders():
+    """本机 ffmpeg 支持的视频编码器名称（只查询一次）"""
+    global _ffmpeg_encoder_names
+    if _ffmpeg_encoder_names is None:
+        names = set()
+        if shutil.which('ffmpeg'):
+            try:
+                output = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                        capture_output=True, text=True, timeout=10).stdout
+                names = {line.split()[1] for line in output.splitlines()
+                         if line.startswith(' V') and len(line.split()) > 1}
+            except (OSError, subprocess.SubprocessError):
+                pass
+        _ffmpeg_encoder_names = names
+    return _ffmpeg_encoder_names
+
+
+def _opencv_fourcc_available(fourcc, extension='.mp4'):
+    key = (fourcc, extension)
+    if key not in _opencv_fourccs:
+        directory = tempfile.mkdtemp(prefix="encoder_probe_")
+        try:
+            writer = cv2.VideoWriter(os.path.join(directory, "probe" + extension),
+                                     cv2.VideoWriter_fourcc(*fourcc), 30.0, (64, 64), True)
+            _opencv_fourccs[key] = writer.isOpened()
+            writer.release()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return _opencv_fourccs[key]
+
+
+def available_encoders(mp4_only=False):
+    return [preset for preset in ENCODERS.values() if preset.available() and (preset.mp4 or not mp4_only)]
+
+
+def calibration_key(name, width, height):
+    return f"encoder|{name}|{width}x{height}"
+
+
+def calibrate_encoder(preset, width, height, fps=30.0, frames=60, directory=None):
+    """在本机实测一种编码方式：编码吞吐量（帧/秒）和平均每帧字节数
+
+    使用合成图案并叠加轻微噪声（模拟摄像头传感器噪声），
+    只统计 write() 与 release() 的耗时，不包括生成测试帧的时间。
+    """
+    from src.recorder.sources import SyntheticVideoSource
+    own_directory = directory is None
+    directory = directory or tempfile.mkdtemp(prefix="encoder_calibration_")
+    extension = '.mp4' if preset.mp4 else preset.extension
+    filename = os.path.join(directory, f"calibration_{preset.name}{extension}")
+    source = SyntheticVideoSource(width, height, fps, realtime=False)
+    source.open()
+    rng = np.random.default_rng(0)
+    noise = [rng.integers(0, 6, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+    try:
+        writer = preset.create_writer(filename, width, height, fps)
+        elapsed = 0.0
+        for i in range(frames):
+            _, frame = source.read()
+            frame = cv2.add(frame, noise[i % len(noise)])
+            start = time.perf_counter()
+            writer.write(frame)
+            elapsed += time.perf_counter() - start
+        start = time.perf_counter()
+        writer.release()
+        elapsed += time.perf_counter() - start
+        size = os.path.getsize(filename)
+        return {
+            'encoder': preset.name,
+            'width': width,
+            'height': height,
+            'frames': frames,
+            'fps': frames / elapsed if elapsed > 0 else 0.0,
+            'encode_ms': elapsed * 1000.0 / frames,
+            'bytes_per_frame': size / float(frames),
+        }
+    finally:
+        source.release()
+        if own_directory:
+            shutil.rmtree(directory, ignore_errors=True)
+        elif os.path.exists(filename):
+            os.remove(filename)
+
+
+def calibrate_encoders(width, height, fps=30.0, frames=60, names=None, cache=None, log=print):
+    """逐个实测本机可用的编码方式，结果写入 cache（DeviceCapabilityCache），返回结果列表"""
+    presets = [get_encoder(name) for name in names] if names else available_encoders()
+    results = []
+    directory = tempfile.mkdtemp(prefix="encoder_calibration_")
+    try:
+        for preset in presets:
+            if not preset.available():
+                log(f"编码器 {preset.name} 不可用，跳过")
+                continue
+            try:
+                result = calibrate_encoder(preset, width, height, fps, frames, directory)
+            except Exception as e:
+                log(f"编码器 {preset.name} 校准失败: {str(e)}")
+                continue
+            log(f"{preset.name:<16}{width}x{height}: {result['fps']:7.1f} 帧/秒，"
+                f"{result['bytes_per_frame'] / 1024:8.1f} KB/帧")
+            if cache is not None:
+                cache.put(calibration_key(preset.name, width, height), result)
+            results.append(result)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def cached_calibrations(cache, width, height):
+    """cache 中已有的该分辨率的校准结果"""
+    results = []
+    for name in ENCODERS:
+        result = cache.get(calibration_key(name, width, height))
+        if result:
+            results.append(result)
+    return results
+
+
+def choose_encoder(results, fps, headroom=1.5, lossless=False, mp4_only=True):
+    """选出能以 fps × headroom 的速度编码、每帧字节数最小的编码方式
+
+    留出余量是因为录制时采集、预览和音频也在占用 CPU。
+    lossless 为 True 时只在无损编码中选择，否则排除无损编码。
+    没有一种编码能满足速度要求时返回 None。
+    """
+    candidates = []
+    for result in results:
+        preset = ENCODERS.get(result.get('encoder'))
+        if preset is None or preset.lossless != lossless or (mp4_only and not preset.mp4):
+            continue
+        if result['fps'] >= fps * headroom:
+            candidates.append((result['bytes_per_frame'], -result['fps'], preset.name))
+    if not candidates:
+        return None
+    return ENCODERS[min(candidates)[2]]
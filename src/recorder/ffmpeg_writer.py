@@ -0,0 +1,254 @@
+import queue
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+
+def _free_port():
+    """向系统申请一个空闲的本地端口"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class FFmpegMuxWriter:
+    """实时合流写入器
+
+    启动一个常驻的 ffmpeg 进程：原始 BGR 帧通过 stdin 送入，
+    PCM 音频通过本地 TCP 连接送入（Windows 上也可用，不依赖命名管道），
+    ffmpeg 实时编码并合流，停止录制时输出文件即已完成。
+
+    write() 与 cv2.VideoWriter.write 接口一致，会在管道写满时阻塞，
+    阻塞程度通过 backpressure（0~1）和 stalls 反馈给采集流水线。
+    """
+
+    def __init__(self, filename, width, height, fps, audio_rate=44100, audio_channels=1,
+                 sample_width=2, video_codec='libx264', preset='veryfast', crf=23,
+                 audio_codec='aac', ffmpeg='ffmpeg', video_args=None):
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_rate = audio_rate
+        self.audio_channels = audio_channels
+        self.sample_width = sample_width
+        self.video_codec = video_codec
+        self.preset = preset
+        self.crf = crf
+        self.video_args = list(video_args or [])
+        self.audio_codec = audio_codec
+        self.ffmpeg = ffmpeg
+
+        self.process = None
+        self.audio_queue = queue.Queue()
+        self.audio_thread = None
+        self.stderr_thread = None
+        self.stderr_lines = []
+        self.error = None
+
+        # 背压统计
+        self.frames_written = 0
+        self.audio_bytes = 0
+        self.stalls = 0
+        self.backpressure = 0.0
+        self.max_write_time = 0.0
+
+    def video_input_args(self):
+        return [
+            self.ffmpeg, '-y', '-hide_banner', '-loglevel', 'error',
+            # 输入参数都已明确给出，跳过探测以缩短启动时间
+            '-probesize', '32', '-analyzeduration', '0',
+            # 输入 0：原始视频帧
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f'{self.width}x{self.height}',
+            '-framerate', f'{self.fps:.3f}',
+            '-i', 'pipe:0',
+        ]
+
+    def video_codec_args(self):
+        args = ['-c:v', self.video_codec]
+        if self.video_codec in ('libx264', 'libx265', 'libx264rgb'):
+            args += ['-preset', self.preset, '-crf', str(self.crf)]
+            # libx264rgb 直接编码 BGR，不做色度抽样（无损）
+            if self.video_codec != 'libx264rgb':
+                args += ['-pix_fmt', 'yuv420p']
+        # 不使用 B 帧，录制结束后才能按采集时间戳直接改写时间表
+        if self.video_codec.startswith('libx264'):
+            args += ['-bf', '0']
+        elif self.video_codec == 'libx265':
+            args += ['-x265-params', 'bframes=0:log-level=error']
+        return args + self.video_args
+
+    def build_command(self, audio_port):
+        cmd = self.video_input_args() + [
+            # 输入 1：PCM 音频
+            '-probesize', '32', '-analyzeduration', '0',
+            '-f', f's{self.sample_width * 8}le',
+            '-ar', str(self.audio_rate),
+            '-ac', str(self.audio_channels),
+            '-i', f'tcp://127.0.0.1:{audio_port}?listen=1',
+            '-map', '0:v', '-map', '1:a',
+        ]
+        cmd += self.video_codec_args()
+        cmd += ['-c:a', self.audio_codec, self.filename]
+        return cmd
+
+    def open(self):
+        """启动 ffmpeg 进程及音频发送线程"""
+        if shutil.which(self.ffmpeg) is None:
+            raise Exception("未找到 ffmpeg，无法使用实时合流模式")
+
+        audio_port = _free_port()
+        self.process = subprocess.Popen(
+            self.build_command(audio_port),
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+        self.stderr_thread = threading.Thread(target=self._read_stderr)
+        self.stderr_thread.daemon = True
+        self.stderr_thread.start()
+
+        self.audio_thread = threading.Thread(target=self._send_audio, args=(audio_port,))
+        self.audio_thread.daemon = True
+        self.audio_thread.start()
+        return self
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def write(self, frame):
+        """写入一帧视频，管道满时阻塞"""
+        start = time.perf_counter()
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except (BrokenPipeError, OSError) as e:
+            raise Exception(f"ffmpeg 进程已退出: {self.last_error() or e}")
+        elapsed = time.perf_counter() - start
+
+        # 写入耗时占帧间隔的比例即为背压，取指数平均
+        interval = 1.0 / self.fps
+        self.backpressure = 0.9 * self.backpressure + 0.1 * min(elapsed / interval, 1.0)
+        if elapsed > 2 * interval:
+            self.stalls += 1
+        self.max_write_time = max(self.max_write_time, elapsed)
+        self.frames_written += 1
+
+    def write_audio(self, data):
+        """提交一块 PCM 音频，不阻塞调用者"""
+        self.audio_bytes += len(data)
+        self.audio_queue.put(data)
+
+    def close_audio(self):
+        """结束音频输入"""
+        if self.audio_thread is not None:
+            self.audio_queue.put(None)
+            self.audio_thread.join()
+            self.audio_thread = None
+
+    def release(self):
+        """结束输入并等待 ffmpeg 完成编码"""
+        if self.process is None:
+            return
+        self.close_audio()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        if self.stderr_thread is not None:
+            self.stderr_thread.join(timeout=1)
+        returncode = self.process.returncode
+        self.process = None
+        if returncode != 0:
+            raise Exception(f"ffmpeg 编码失败（返回码 {returncode}）: {self.last_error()}")
+
+    def last_error(self):
+        return '\n'.join(self.stderr_lines[-5:])
+
+    @property
+    def audio_sink(self):
+        """供音频回调使用的写入接口"""
+        return _MuxAudioSink(self)
+
+    def _send_audio(self, port):
+        sock = None
+        try:
+            # ffmpeg 打开输入需要一点时间，重试连接
+            deadline = time.monotonic() + 10
+            while sock is None:
+                try:
+                    sock = socket.create_connection(('127.0.0.1', port), timeout=1)
+                except OSError:
+                    if time.monotonic() > deadline or self.process.poll() is not None:
+                        raise Exception("无法连接 ffmpeg 音频输入")
+                    time.sleep(0.05)
+            sock.settimeout(None)
+            while True:
+                data = self.audio_queue.get()
+                if data is None:
+                    break
+                sock.sendall(data)
+        except Exception as e:
+            self.error = e
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _read_stderr(self):
+        for line in iter(self.process.stderr.readline, b''):
+            self.stderr_lines.append(line.decode('utf-8', 'replace').rstrip())
+            del self.stderr_lines[:-50]
+
+
+class FFmpegVideoWriter(FFmpegMuxWriter):
+    """只写视频的 ffmpeg 管道写入器
+
+    分别保存模式下代替 cv2.VideoWriter 使用 x264/x265 等编码器，
+    write()/release() 以及背压统计与 FFmpegMuxWriter 相同。
+    """
+
+    def build_command(self, audio_port=None):
+        return self.video_input_args() + self.video_codec_args() + ['-an', self.filename]
+
+    def open(self):
+        if shutil.which(self.ffmpeg) is None:
+            raise Exception(f"未找到 ffmpeg，无法使用 {self.video_codec} 编码")
+
+        self.process = subprocess.Popen(
+            self.build_command(),
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        self.stderr_thread = threading.Thread(target=self._read_stderr)
+        self.stderr_thread.daemon = True
+        self.stderr_thread.start()
+        return self
+
+
+class _MuxAudioSink:
+    """把 FFmpegMuxWriter 的音频输入包装成与 StreamingWavWriter 相同的接口"""
+
+    def __init__(self, muxer):
+        self.muxer = muxer
+        self.filename = muxer.filename
+
+    def write(self, data):
+        self.muxer.write_audio(data)
+
+    @property
+    def frames_received(self):
+        return self.muxer.audio_bytes // (self.muxer.audio_channels * self.muxer.sample_width)
+
+    @property
+    def duration(self):
+        return self.frames_received / float(self.muxer.audio_rate)
+
+    def close(self):
+        self.muxer.close_audio()
+        if self.muxer.error is not None:
+            raise Exception(f"音频送入 ffmpeg 失败: {self.muxer.error}")
@@ -0,0 +1,109 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+# 低于该电平视为无声（dBFS）
+SILENCE_DB = -60.0
+# 电平表显示的最低电平（dBFS）
+FLOOR_DB = -90.0
+
+
+def level_db(value, full_scale=32768.0):
+    """线性幅度转换为 dBFS"""
+    if value <= 0:
+        return FLOOR_DB
+    return max(20.0 * math.log10(value / full_scale), FLOOR_DB)
+
+
+class LevelMeter:
+    """音频电平统计（RMS / 峰值 / 削波）
+
+    feed() 在音频回调中对每个缓冲区调用，用 NumPy 一次算出各声道的平方和、
+    峰值和削波采样数，只累加不做其他处理，开销可以忽略；
+    界面按固定频率调用 read()，取得这段时间的 RMS 和峰值后清零累加值。
+    """
+
+    def __init__(self, channels=1, clip_level=0.99, hold=1.5, silence_seconds=3.0):
+        self.lock = threading.Lock()
+        self.clip_threshold = int(clip_level * 32767)
+        self.hold = hold
+        self.silence_seconds = silence_seconds
+        self.configure(channels)
+
+    def configure(self, channels):
+        """声道数变化时重新设置并清空统计"""
+        with self.lock:
+            self.channels = max(int(channels), 1)
+            self.sum_squares = np.zeros(self.channels)
+            self.count = 0
+            self.peak = np.zeros(self.channels, dtype=np.int64)
+            self.clip_count = 0
+            self.last_clip = None
+            self.held_peak = np.zeros(self.channels, dtype=np.int64)
+            self.held_at = 0.0
+            self.loud_at = time.monotonic()
+
+    def feed(self, data):
+        """累加一个 16 位 PCM 缓冲区"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        frames = len(samples) // self.channels
+        if not frames:
+            return
+        samples = samples[:frames * self.channels].reshape(frames, self.channels)
+        values = samples.astype(np.float32)
+        sum_squares = np.einsum('ij,ij->j', values, values)
+        peak = np.maximum(samples.max(axis=0).astype(np.int64), -samples.min(axis=0).astype(np.int64))
+        clips = int(np.count_nonzero(samples >= self.clip_threshold)
+                    + np.count_nonzero(samples <= -self.clip_threshold))
+        with self.lock:
+            self.sum_squares += sum_squares
+            self.count += frames
+            np.maximum(self.peak, peak, out=self.peak)
+            if clips:
+                self.clip_count += clips
+                self.last_clip = time.monotonic()
+
+    def read(self):
+        """返回自上次调用以来的电平，并清零累加值
+
+        返回字典：rms_db / peak_db / hold_db 为各声道的 dBFS 列表，
+        clips 为累计削波采样数，clipping 表示最近 hold 秒内出现过削波，
+        silent 表示已连续 silence_seconds 秒低于 SILENCE_DB。
+        """
+        now = time.monotonic()
+        with self.lock:
+            if self.count:
+                rms = np.sqrt(self.sum_squares / self.count)
+            else:
+                rms = np.zeros(self.channels)
+            peak = self.peak.copy()
+            self.sum_squares[:] = 0
+            self.count = 0
+            self.peak[:] = 0
+
+            # 峰值保持：更高的峰值立即更新，保持 hold 秒后回落到当前峰值
+            if now - self.held_at > self.hold:
+                self.held_peak = peak
+                self.held_at = now
+            elif (peak > self.held_peak).any():
+                np.maximum(self.held_peak, peak, out=self.held_peak)
+                self.held_at = now
+
+            rms_db = [level_db(value) for value in rms]
+            if max(rms_db) > SILENCE_DB:
+                self.loud_at = now
+            return {
+                'rms_db': rms_db,
+                'peak_db': [level_db(value) for value in peak],
+                'hold_db': [level_db(value) for value in self.held_peak],
+                'clips': self.clip_count,
+                'clipping': self.last_clip is not None and now - self.last_clip <= self.hold,
+                'silent': now - self.loud_at >= self.silence_seconds,
+            }
+
+    def reset_clips(self):
+        with self.lock:
+            self.clip_count = 0
+            self.last_clip = None
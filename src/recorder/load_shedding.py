@@ -0,0 +1,153 @@
+import time
+
+# 降级级别，按顺序逐级启用、逆序逐级恢复
+LEVEL_NORMAL = 0
+LEVEL_PREVIEW = 1      # 降低预览帧率
+LEVEL_STILLS = 2       # 暂停录制截图
+LEVEL_HALF_RATE = 3    # 隔一帧编码一帧
+LEVEL_THIRD_RATE = 4   # 每三帧编码一帧
+
+LEVEL_NAMES = {
+    LEVEL_NORMAL: "正常",
+    LEVEL_PREVIEW: "降低预览帧率",
+    LEVEL_STILLS: "暂停截图",
+    LEVEL_HALF_RATE: "隔帧编码",
+    LEVEL_THIRD_RATE: "三帧编码一帧",
+}
+
+_FRAME_STEPS = {LEVEL_HALF_RATE: 2, LEVEL_THIRD_RATE: 3}
+
+
+class LoadShedder:
+    """CPU 紧张时按固定顺序逐级降低录制开销，负载下降后逐级恢复
+
+    update() 由监控线程定期调用，根据编码队列占用、编码线程忙碌比例、
+    队列丢帧和实际采集帧率判断负载：连续 escalate_after 次过载时升一级，
+    连续 recover_after 次空闲时降一级，避免在临界点来回切换。
+
+    降级只影响预览、截图和写入哪些帧：跳过的帧不写入视频也不记录时间戳，
+    停止录制时按实际写入帧的采集时间改写时间表（与静止跳帧相同），
+    音频路径完全不受影响，因此不会丢音频，也不会造成音画不同步。
+    """
+
+    def __init__(self, escalate_after=2, recover_after=10, preview_fps=5.0, max_level=LEVEL_THIRD_RATE):
+        self.escalate_after = escalate_after
+        self.recover_after = recover_after
+        self.preview_fps = preview_fps
+        self.max_level = max_level
+        self.reset()
+
+    def reset(self):
+        self.level = LEVEL_NORMAL
+        self.peak_level = LEVEL_NORMAL
+        self.overloaded_checks = 0
+        self.relaxed_checks = 0
+        self.transitions = 0
+        self.frame_index = 0
+        self.shed_frames = 0
+        self.encode_busy = 0.0
+        self.last_busy = 0.0
+        self.last_dropped = 0
+        self.last_time = None
+        self.signals = {}
+
+    @property
+    def throttle_preview(self):
+        return self.level >= LEVEL_PREVIEW
+
+    @property
+    def skip_stills(self):
+        return self.level >= LEVEL_STILLS
+
+    @property
+    def frame_step(self):
+        return _FRAME_STEPS.get(self.level, 1)
+
+    def add_encode_time(self, seconds):
+        """编码线程每写入一帧调用一次，累计编码耗时"""
+        self.encode_busy += seconds
+
+    def drop_frame(self):
+        """编码线程中调用：当前级别下这一帧是否跳过编码"""
+        index = self.frame_index
+        self.frame_index += 1
+        step = self.frame_step
+        if step > 1 and index % step:
+            self.shed_frames += 1
+            return True
+        return False
+
+    def commit(self):
+        """之前跳过的一帧最终被写入（如录制结束时的最后一帧）"""
+        self.shed_frames -= 1
+
+    def update(self, queue_fill, dropped, capture_fps, target_fps, now=None):
+        """根据当前负载更新级别，级别变化时返回 (旧级别, 新级别)，否则返回 None
+
+        queue_fill 为编码队列占用比例（0~1），dropped 为编码队列累计丢帧数。
+        """
+        now = time.monotonic() if now is None else now
+        if self.last_time is None:
+            self.last_time = now
+            self.last_busy = self.encode_busy
+            self.last_dropped = dropped
+            return None
+        elapsed = now - self.last_time
+        if elapsed <= 0:
+            return None
+        encode_load = (self.encode_busy - self.last_busy) / elapsed
+        new_drops = dropped - self.last_dropped
+        fps_ratio = capture_fps / target_fps if target_fps else 1.0
+        self.last_time = now
+        self.last_busy = self.encode_busy
+        self.last_dropped = dropped
+        self.signals = {
+            'queue_fill': queue_fill,
+            'encode_load': encode_load,
+            'dropped': new_drops,
+            'fps_ratio': fps_ratio,
+        }
+
+        # 采集帧率偏低可能只是摄像头本身慢，需要同时有编码侧的压力才算过载
+        pressured = queue_fill >= 0.25 or encode_load >= 0.6
+        overloaded = (queue_fill >= 0.5 or encode_load >= 0.85 or new_drops > 0
+                      or (pressured and fps_ratio < 0.8))
+        relaxed = queue_fill < 0.1 and encode_load < 0.5 and new_drops == 0
+
+        if overloaded:
+            self.overloaded_checks += 1
+            self.relaxed_checks = 0
+        elif relaxed:
+            self.relaxed_checks += 1
+            self.overloaded_checks = 0
+        else:
+            self.overloaded_checks = 0
+            self.relaxed_checks = 0
+
+        old = self.level
+        if self.overloaded_checks >= self.escalate_after and self.level < self.max_level:
+            self.level += 1
+            self.overloaded_checks = 0
+        elif self.relaxed_checks >= self.recover_after and self.level > LEVEL_NORMAL:
+            self.level -= 1
+            self.relaxed_checks = 0
+        if self.level == old:
+            return None
+        self.transitions += 1
+        self.peak_level = max(self.peak_level, self.level)
+        return old, self.level
+
+    def describe_signals(self):
+        signals = self.signals
+        if not signals:
+            return ""
+        return (f"编码队列 {signals['queue_fill']:.0%}，编码占用 {signals['encode_load']:.0%}，"
+                f"新丢帧 {signals['dropped']}，采集帧率 {signals['fps_ratio']:.0%}")
+
+    def stats(self):
+        return {
+            'level': self.level,
+            'peak_level': self.peak_level,
+            'transitions': self.transitions,
+            'shed_frames': self.shed_frames,
+        }
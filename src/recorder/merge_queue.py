@@ -0,0 +1,282 @@
+import collections
+import itertools
+import os
+import re
+import subprocess
+import threading
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+STATUS_TEXT = {
+    JOB_PENDING: "等待中",
+    JOB_RUNNING: "进行中",
+    JOB_DONE: "已完成",
+    JOB_FAILED: "失败",
+    JOB_CANCELLED: "已取消",
+}
+
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+class MergeJob:
+    """一个合并/转码任务
+
+    cmd 为 ffmpeg 命令时由队列自动加上 -progress，按输出时间计算进度；
+    也可以传入 func（无参数可调用对象，例如 MoviePy 合并），此时没有进度，
+    且只能在开始之前取消。duration 为预计的输出时长（秒），
+    未给出时从 ffmpeg 输出的输入信息中读取。
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name, output_file, cmd=None, func=None, duration=None):
+        if (cmd is None) == (func is None):
+            raise Exception("合并任务需要且只能指定 cmd 或 func 之一")
+        self.id = next(self._ids)
+        self.name = name
+        self.output_file = output_file
+        self.cmd = cmd
+        self.func = func
+        self.duration = duration
+        # 失败时改用的合并参数（由创建者解释，队列本身不使用）
+        self.fallback = None
+
+        self.status = JOB_PENDING
+        self.out_time = 0.0
+        self.speed = None
+        self.error = None
+        self.stderr_lines = collections.deque(maxlen=20)
+        self.process = None
+        self.cancel_requested = False
+
+    @property
+    def progress(self):
+        """0~1 的进度，未知时为 None"""
+        if self.status == JOB_DONE:
+            return 1.0
+        if not self.duration:
+            return None
+        return min(self.out_time / self.duration, 1.0)
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+    def describe(self):
+        """状态的简短文字描述，用于界面显示"""
+        text = STATUS_TEXT[self.status]
+        if self.status == JOB_RUNNING:
+            progress = self.progress
+            if progress is not None:
+                text += f" {progress * 100:.0f}%"
+            if self.speed:
+                text += f" ({self.speed})"
+        elif self.status == JOB_FAILED and self.error:
+            text += f": {self.error}"
+        return text
+
+    def _parse_progress(self, line):
+        """解析 ffmpeg -progress 输出的 key=value 行"""
+        key, _, value = line.partition('=')
+        if key in ('out_time_us', 'out_time_ms'):
+            # 两个字段的单位都是微秒
+            try:
+                self.out_time = max(int(value) / 1e6, 0.0)
+            except ValueError:
+                pass
+        elif key == 'speed':
+            value = value.strip()
+            self.speed = value if value not in ('', 'N/A') else None
+
+    def _parse_stderr(self, line):
+        self.stderr_lines.append(line)
+        if self.duration is None:
+            match = _DURATION_RE.search(line)
+            if match:
+                hours, minutes, seconds = match.groups()
+                self.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class MergeQueue:
+    """合并任务队列
+
+    固定数量的工作线程依次取出任务，每个工作线程同一时间只运行一个 ffmpeg 进程，
+    因此 workers 即同时运行的合并进程数上限。on_update(job) 在任务状态变化时
+    从工作线程中调用。
+    """
+
+    def __init__(self, workers=2, on_update=None):
+        self.on_update = on_update
+        self.workers = 0
+        self.pending = collections.deque()
+        self.jobs = []
+        self.threads = []
+        self.condition = threading.Condition()
+        self.closed = False
+        self.set_workers(workers)
+
+    def set_workers(self, workers):
+        """调整同时运行的任务数；减少时多余的工作线程在当前任务结束后退出"""
+        workers = max(int(workers), 1)
+        with self.condition:
+            self.workers = workers
+            self.threads = [t for t in self.threads if t.is_alive()]
+            while len(self.threads) < workers:
+                thread = threading.Thread(target=self._run)
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+            self.condition.notify_all()
+
+    def submit(self, job):
+        """加入一个任务，返回该任务"""
+        with self.condition:
+            if self.closed:
+                raise Exception("合并队列已关闭")
+            self.jobs.append(job)
+            self.pending.append(job)
+            self.condition.notify()
+        self._notify(job)
+        return job
+
+    def find(self, output_file):
+        """查找输出到同一文件且尚未结束的任务"""
+        with self.condition:
+            for job in self.jobs:
+                if not job.finished and job.output_file == output_file:
+                    return job
+        return None
+
+    def cancel(self, job_id):
+        """取消任务：未开始的直接移出队列，正在运行的结束 ffmpeg 进程"""
+        with self.condition:
+            job = next((j for j in self.jobs if j.id == job_id), None)
+            if job is None or job.finished:
+                return False
+            if job.status == JOB_RUNNING and job.func is not None:
+                # 非 ffmpeg 任务无法中途停止
+                return False
+            job.cancel_requested = True
+            if job.status == JOB_PENDING:
+                self.pending.remove(job)
+                job.status = JOB_CANCELLED
+            elif job.process is not None:
+                # 输出会被删除，不需要等 ffmpeg 正常收尾
+                job.process.kill()
+        if job.status == JOB_CANCELLED:
+            self._notify(job)
+        return True
+
+    def cancel_all(self):
+        with self.condition:
+            ids = [job.id for job in self.jobs if not job.finished]
+        for job_id in ids:
+            self.cancel(job_id)
+
+    def clear_finished(self):
+        with self.condition:
+            self.jobs = [job for job in self.jobs if not job.finished]
+
+    def active_count(self):
+        with self.condition:
+            return sum(1 for job in self.jobs if not job.finished)
+
+    def shutdown(self, cancel=True):
+        """关闭队列；cancel 为 True 时同时取消所有未完成的任务"""
+        if cancel:
+            self.cancel_all()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception:
+                pass
+
+    def _next_job(self):
+        """取出下一个任务；队列关闭或工作线程过多时返回 None"""
+        with self.condition:
+            while True:
+                alive = [t for t in self.threads if t.is_alive()]
+                if self.closed or len(alive) > self.workers:
+                    self.threads.remove(threading.current_thread())
+                    return None
+                if self.pending:
+                    job = self.pending.popleft()
+                    job.status = JOB_RUNNING
+                    return job
+                self.condition.wait()
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._notify(job)
+            try:
+                if job.cmd is not None:
+                    self._run_ffmpeg(job)
+                else:
+                    job.func()
+                job.status = JOB_DONE
+            except Exception as e:
+                job.status = JOB_CANCELLED if job.cancel_requested else JOB_FAILED
+                job.error = str(e)
+                self._remove_output(job)
+            self._notify(job)
+
+    def _run_ffmpeg(self, job):
+        cmd = list(job.cmd)
+        # 进度写到 stdout，日志照常写到 stderr
+        cmd[1:1] = ['-nostdin', '-progress', 'pipe:1', '-nostats']
+        with self.condition:
+            if job.cancel_requested:
+                raise Exception("已取消")
+            job.process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                errors='replace'
+            )
+
+        stderr_thread = threading.Thread(target=self._read_stderr, args=(job,))
+        stderr_thread.daemon = True
+        stderr_thread.start()
+
+        last_time = job.out_time
+        for line in job.process.stdout:
+            job._parse_progress(line.strip())
+            # 每个进度块以 progress= 结尾，只在进度变化时通知
+            if line.startswith('progress=') and job.out_time != last_time:
+                last_time = job.out_time
+                self._notify(job)
+        returncode = job.process.wait()
+        stderr_thread.join(timeout=1)
+        job.process = None
+
+        if job.cancel_requested:
+            raise Exception("已取消")
+        if returncode != 0:
+            raise Exception(job.stderr_lines[-1] if job.stderr_lines else f"ffmpeg 返回码 {returncode}")
+
+    def _read_stderr(self, job):
+        for line in job.process.stderr:
+            job._parse_stderr(line.rstrip())
+
+    def _remove_output(self, job):
+        """删除失败或取消的任务留下的不完整输出文件"""
+        try:
+            if job.output_file and os.path.exists(job.output_file):
+                os.remove(job.output_file)
+        except OSError:
+            pass
@@ -0,0 +1,176 @@
+import bisect
+import json
+import os
+import re
+import threading
+import time
+
+# 默认桶上限（毫秒），覆盖亚毫秒到数秒
+DEFAULT_BOUNDS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 40, 50, 75,
+                  100, 150, 200, 300, 500, 1000, 2000, 5000)
+
+
+class Histogram:
+    """固定桶的直方图，observe() 只做一次二分查找和几次加法"""
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """按桶内线性插值估计百分位数"""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                low = self.bounds[i - 1] if i > 0 else min(self.min, self.bounds[0])
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                low, high = max(low, self.min), min(high, self.max)
+                return low + (high - low) * (target - seen) / count
+            seen += count
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.mean,
+            'min': self.min or 0.0,
+            'max': self.max or 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': dict(zip([str(b) for b in self.bounds] + ['+Inf'], self.counts)),
+        }
+
+
+class Metrics:
+    """录制过程的性能统计
+
+    各阶段在自己的线程中调用 observe()（耗时、间隔，单位毫秒）、
+    count()（累计次数）和 gauge()（当前值），开销只是一次加锁和几次加法；
+    snapshot() 供界面显示，save() 在录制结束时导出 JSON 和 Prometheus 文本格式。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.gauges = {}
+            self.started = time.time()
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def timer(self, name):
+        """with metrics.timer("encode_ms"): ... 记录代码块耗时（毫秒）"""
+        return _Timer(self, name)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'started': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                'duration': time.time() - self.started,
+                'histograms': {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+                'gauges': dict(sorted(self.gauges.items())),
+            }
+
+    def to_prometheus(self, prefix="av_recorder", labels=None):
+        """Prometheus 文本格式（histogram / counter / gauge）"""
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        label_text = ",".join(f'{k}="{escape(v)}"' for k, v in sorted((labels or {}).items()))
+
+        def name_of(name):
+            return f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+        def with_labels(extra=""):
+            parts = [p for p in (label_text, extra) if p]
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        lines = []
+        with self.lock:
+            for name, h in sorted(self.histograms.items()):
+                metric = name_of(name)
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(list(h.bounds) + ['+Inf'], h.counts):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{metric}_bucket{with_labels(le)} {cumulative}")
+                lines.append(f"{metric}_sum{with_labels()} {h.sum:.6f}")
+                lines.append(f"{metric}_count{with_labels()} {h.count}")
+            for name, value in sorted(self.counters.items()):
+                metric = name_of(name) + "_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{with_labels()} {value}")
+            for name, value in sorted(self.gauges.items()):
+                metric = name_of(name)
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric}{with_labels()} {float(value):.6f}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, base_filename, labels=None):
+        """导出 <base>.metrics.json 和 <base>.prom，返回两个文件名"""
+        json_file = base_filename + ".metrics.json"
+        prom_file = base_filename + ".prom"
+        snapshot = self.snapshot()
+        snapshot['labels'] = labels or {}
+        for filename, text in ((json_file, json.dumps(snapshot, ensure_ascii=False, indent=2)),
+                               (prom_file, self.to_prometheus(labels=labels))):
+            temp_name = filename + ".tmp"
+            with open(temp_name, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_name, filename)
+        return json_file, prom_file
+
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
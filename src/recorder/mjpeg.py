@@ -0,0 +1,262 @@
+import threading
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+
+from src.recorder.sources import FrameSource
+
+
+def _parse_boundary(content_type):
+    """从 multipart/x-mixed-replace 的 Content-Type 中取出分隔符"""
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary':
+            value = value.strip().strip('"')
+            # 有的服务器在参数里就带了 "--"
+            return (value if value.startswith('--') else '--' + value).encode('latin-1')
+    return None
+
+
+class MJPEGStreamSource(FrameSource):
+    """MJPEG over HTTP 视频来源（IP Webcam 等）
+
+    网络线程自己解析 multipart 分隔符，只保留最新一帧 JPEG；
+    解码线程只解码最新的 JPEG，来不及解码的旧帧直接丢弃（latest-wins），
+    因此画面延迟不会像 cv2.VideoCapture(url) 那样随内部缓冲累积。
+    连接断开后按指数退避自动重连，期间 read() 超时返回 (False, None)，
+    不会结束录制。stats() 提供到达间隔抖动、解码延迟、丢帧和重连次数。
+    """
+
+    def __init__(self, url, timeout=5.0, read_timeout=1.0, max_backoff=8.0):
+        super().__init__()
+        self.url = url
+        self.timeout = timeout
+        self.read_timeout = read_timeout
+        self.max_backoff = max_backoff
+
+        self.cond = threading.Condition()
+        self.running = False
+        self.net_thread = None
+        self.decode_thread = None
+        self.response = None
+        self.pending = None      # 等待解码的最新 JPEG：(数据, 到达时间)
+        self.latest = None       # 最新解码的帧：(帧, 到达时间, 解码完成时间)
+        self.sequence = 0
+        self.read_sequence = 0
+        self.connected = False
+        self.last_error = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.received = 0
+        self.decoded = 0
+        self.skipped = 0         # 来不及解码被新帧覆盖的 JPEG
+        self.decode_errors = 0
+        self.reconnects = 0
+        self.last_arrival = None
+        self.interval = 0.0      # 平均到达间隔（秒）
+        self.jitter = 0.0        # 到达间隔抖动（秒，RFC 3550 算法）
+        self.decode_latency = 0.0
+        self.read_age = 0.0
+
+    def open(self):
+        """连接并等待第一帧，确定分辨率和帧率"""
+        self.release()
+        self._reset_stats()
+        self.running = True
+        self.net_thread = threading.Thread(target=self._receive_loop)
+        self.net_thread.daemon = True
+        self.net_thread.start()
+        self.decode_thread = threading.Thread(target=self._decode_loop)
+        self.decode_thread.daemon = True
+        self.decode_thread.start()
+
+        deadline = time.monotonic() + self.timeout
+        with self.cond:
+            while self.latest is None and time.monotonic() < deadline:
+                self.cond.wait(0.1)
+            latest = self.latest
+        if latest is None:
+            error = self.last_error
+            self.release()
+            raise Exception(f"无法连接 MJPEG 视频流 {self.url}: {error or '超时'}")
+        self.height, self.width = latest[0].shape[:2]
+
+        # 连接之初服务器常会一次推出积压的几帧，用之后约 1 秒内的到达数估计帧率
+        time.sleep(0.1)
+        start, count = time.perf_counter(), self.received
+        while time.perf_counter() - start < 1.0 and self.received - count < 30:
+            time.sleep(0.02)
+        elapsed = time.perf_counter() - start
+        if self.received > count:
+            self.fps = min(max((self.received - count) / elapsed, 1.0), 120.0)
+
+    def read(self):
+        """等待并返回比上次更新的一帧"""
+        with self.cond:
+            if not self.running:
+                return False, None
+            if self.sequence == self.read_sequence:
+                self.cond.wait(self.read_timeout)
+            if self.latest is None or self.sequence == self.read_sequence:
+                return False, None
+            frame, _, decoded_at = self.latest
+            self.read_sequence = self.sequence
+        self.read_age = 0.9 * self.read_age + 0.1 * (time.perf_counter() - decoded_at)
+        return True, frame
+
+    def release(self):
+        self.running = False
+        response = self.response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+        with self.cond:
+            self.cond.notify_all()
+        for thread in (self.net_thread, self.decode_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=1)
+        self.net_thread = None
+        self.decode_thread = None
+        self.latest = None
+        self.pending = None
+        self.connected = False
+
+    def is_opened(self):
+        return self.running and self.latest is not None
+
+    def describe(self):
+        return f"MJPEG 视频流 {self.url}"
+
+    def stats(self):
+        return {
+            'connected': self.connected,
+            'received': self.received,
+            'decoded': self.decoded,
+            'skipped': self.skipped,
+            'decode_errors': self.decode_errors,
+            'reconnects': self.reconnects,
+            'fps': 1.0 / self.interval if self.interval > 0 else 0.0,
+            'jitter_ms': self.jitter * 1000,
+            'decode_latency_ms': self.decode_latency * 1000,
+            'read_age_ms': self.read_age * 1000,
+        }
+
+    def _receive_loop(self):
+        backoff = 0.5
+        while self.running:
+            try:
+                self.response = urllib.request.urlopen(self.url, timeout=self.timeout)
+                boundary = _parse_boundary(self.response.headers.get('Content-Type', ''))
+                if boundary is None:
+                    raise Exception("不是 multipart MJPEG 视频流")
+                self.connected = True
+                for jpeg in self._iter_parts(self.response, boundary):
+                    self._on_jpeg(jpeg)
+                    backoff = 0.5
+                raise Exception("视频流已结束")
+            except Exception as e:
+                self.last_error = e
+            finally:
+                self.connected = False
+                if self.response is not None:
+                    try:
+                        self.response.close()
+                    except Exception:
+                        pass
+                    self.response = None
+            if not self.running:
+                break
+            # 指数退避后重连
+            self.reconnects += 1
+            deadline = time.monotonic() + backoff
+            while self.running and time.monotonic() < deadline:
+                time.sleep(0.05)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _iter_parts(self, stream, boundary):
+        """逐个返回 multipart 中的 JPEG 数据"""
+        while self.running:
+            # 找到下一个分隔符
+            line = stream.readline()
+            if not line:
+                return
+            if not line.startswith(boundary):
+                continue
+            if line.strip().endswith(b'--') and line.strip() != boundary:
+                return
+
+            # 读取分段头
+            length = None
+            while True:
+                header = stream.readline()
+                if not header:
+                    return
+                header = header.strip()
+                if not header:
+                    break
+                key, _, value = header.partition(b':')
+                if key.strip().lower() == b'content-length':
+                    length = int(value.strip())
+
+            if length is not None:
+                data = stream.read(length)
+                if len(data) < length:
+                    return
+                yield data
+            else:
+                # 没有长度时读到 JPEG 结束标记为止
+                chunks = []
+                while True:
+                    chunk = stream.readline()
+                    if not chunk:
+                        return
+                    chunks.append(chunk)
+                    if chunk.rstrip(b'\r\n').endswith(b'\xff\xd9'):
+                        break
+                yield b''.join(chunks).rstrip(b'\r\n')
+
+    def _on_jpeg(self, data):
+        now = time.perf_counter()
+        if self.last_arrival is not None:
+            interval = now - self.last_arrival
+            if self.interval == 0:
+                self.interval = interval
+            deviation = abs(interval - self.interval)
+            self.interval = 0.9 * self.interval + 0.1 * interval
+            self.jitter += (deviation - self.jitter) / 16.0
+        self.last_arrival = now
+        with self.cond:
+            if self.pending is not None:
+                self.skipped += 1
+            self.pending = (data, now)
+            self.received += 1
+            self.cond.notify_all()
+
+    def _decode_loop(self):
+        while self.running:
+            with self.cond:
+                while self.pending is None and self.running:
+                    self.cond.wait(0.5)
+                if not self.running:
+                    break
+                data, arrival = self.pending
+                self.pending = None
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                self.decode_errors += 1
+                continue
+            # 分辨率中途变化时缩放到最初的尺寸，保证写入器能接受
+            if self.width and (frame.shape[1], frame.shape[0]) != (self.width, self.height):
+                frame = cv2.resize(frame, (self.width, self.height))
+            decoded_at = time.perf_counter()
+            self.decode_latency = 0.9 * self.decode_latency + 0.1 * (decoded_at - arrival)
+            with self.cond:
+                self.latest = (frame, arrival, decoded_at)
+                self.sequence += 1
+                self.decoded += 1
+                self.cond.notify_all()
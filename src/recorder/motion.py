@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """静止画面跳帧判断
+
+    每帧缩小成灰度小图，与上一次写入的帧比较：变化的像素（差值超过 threshold
+    个灰度级）不少于 min_area（占比）时写入，否则跳过；距上一次写入超过
+    keepalive 秒时无论是否变化都写入一帧，保证播放器定位和分段时长正常。
+    与上一次写入的帧比较而不是与上一帧比较，缓慢的渐变累积到阈值后也会写入。
+
+    跳过的帧不写入视频文件，也不记录时间戳，停止录制时按实际写入帧的采集时间
+    改写时间表，得到可变帧率的视频。
+    """
+
+    def __init__(self, threshold=8, min_area=0.0, keepalive=1.0, size=(160, 90)):
+        self.threshold = threshold
+        self.min_area = min_area
+        self.keepalive = keepalive
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        self.reference = None
+        self.last_written = None
+        self.written = 0
+        self.skipped = 0
+        self.last_change = 0.0
+
+    def _thumbnail(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def check(self, frame, timestamp, force=False):
+        """判断采集时间为 timestamp 的这一帧是否需要写入
+
+        force 为 True 时（如分段的第一帧）总是写入。
+        """
+        thumbnail = self._thumbnail(frame)
+        write = force or self.reference is None
+        if not write:
+            changed = np.count_nonzero(cv2.absdiff(thumbnail, self.reference) > self.threshold)
+            self.last_change = changed / float(thumbnail.size)
+            write = (changed > 0 and self.last_change >= self.min_area
+                     or timestamp - self.last_written >= self.keepalive)
+        if write:
+            self.reference = thumbnail
+            self.last_written = timestamp
+            self.written += 1
+        else:
+            self.skipped += 1
+        return write
+
+    def commit(self, timestamp):
+        """之前跳过的一帧最终被写入（如录制结束时的最后一帧）"""
+        self.skipped -= 1
+        self.written += 1
+        self.last_written = timestamp
+
+    def stats(self):
+        total = self.written + self.skipped
+        return {
+            'written': self.written,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / float(total) if total else 0.0,
+            'last_change': self.last_change,
+        }
@@ -0,0 +1,253 @@
+import os
+import struct
+
+# 需要展开解析的容器盒子，其余盒子按原始字节保留
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts'}
+
+
+class Box:
+    """MP4 盒子"""
+
+    def __init__(self, box_type, payload=b'', children=None):
+        self.type = box_type
+        self.payload = payload
+        self.children = children
+
+    def find(self, box_type):
+        for child in self.children or []:
+            if child.type == box_type:
+                return child
+        return None
+
+    def find_all(self, box_type):
+        return [child for child in self.children or [] if child.type == box_type]
+
+    def to_bytes(self):
+        if self.children is not None:
+            body = b''.join(child.to_bytes() for child in self.children)
+        else:
+            body = self.payload
+        size = len(body) + 8
+        if size > 0xFFFFFFFF:
+            return struct.pack('>I4sQ', 1, self.type, size + 8) + body
+        return struct.pack('>I4s', size, self.type) + body
+
+
+def _iter_boxes(data, start=0, end=None):
+    """遍历一段字节中的盒子，返回 (类型, 内容起点, 内容终点)"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise Exception("MP4 文件结构损坏")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _parse_box(data, box_type, start, end):
+    if box_type in CONTAINER_BOXES:
+        children = [_parse_box(data, t, s, e) for t, s, e in _iter_boxes(data, start, end)]
+        return Box(box_type, children=children)
+    return Box(box_type, payload=data[start:end])
+
+
+def _top_level_boxes(f):
+    """扫描文件顶层盒子，返回 [(类型, 偏移, 长度)]"""
+    boxes = []
+    file_size = os.fstat(f.fileno()).st_size
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+        elif size == 0:
+            size = file_size - offset
+        if size < 8:
+            raise Exception("MP4 文件结构损坏")
+        boxes.append((box_type, offset, size))
+        offset += size
+    return boxes
+
+
+def _handler_type(trak):
+    hdlr = trak.find(b'mdia').find(b'hdlr')
+    return hdlr.payload[8:12] if hdlr is not None else b''
+
+
+def _read_timescale(payload):
+    """mvhd/mdhd 的时间刻度（两个版本都是 32 位）"""
+    return struct.unpack_from('>I', payload, 20 if payload[0] == 1 else 12)[0]
+
+
+def _read_duration(payload, v0_offset, v1_offset):
+    if payload[0] == 1:
+        return struct.unpack_from('>Q', payload, v1_offset)[0]
+    return struct.unpack_from('>I', payload, v0_offset)[0]
+
+
+def _write_duration(payload, v0_offset, v1_offset, duration):
+    payload = bytearray(payload)
+    if payload[0] == 1:
+        struct.pack_into('>Q', payload, v1_offset, duration)
+    else:
+        struct.pack_into('>I', payload, v0_offset, min(duration, 0xFFFFFFFF))
+    return bytes(payload)
+
+
+def _build_stts(durations):
+    """把逐帧时长压缩成 stts 的 (数量, 时长) 条目"""
+    entries = []
+    for duration in durations:
+        if entries and entries[-1][1] == duration:
+            entries[-1][0] += 1
+        else:
+            entries.append([1, duration])
+    body = struct.pack('>II', 0, len(entries))
+    body += b''.join(struct.pack('>II', count, duration) for count, duration in entries)
+    return body
+
+
+def _shift_chunk_offsets(moov, delta):
+    """moov 变长且位于 mdat 之前时，修正所有轨道的块偏移"""
+    for trak in moov.find_all(b'trak'):
+        stbl = trak.find(b'mdia').find(b'minf').find(b'stbl')
+        stco = stbl.find(b'stco')
+        if stco is not None:
+            count = struct.unpack_from('>I', stco.payload, 4)[0]
+            offsets = struct.unpack_from(f'>{count}I', stco.payload, 8)
+            stco.payload = stco.payload[:8] + struct.pack(f'>{count}I', *[o + delta for o in offsets])
+        co64 = stbl.find(b'co64')
+        if co64 is not None:
+            count = struct.unpack_from('>I', co64.payload, 4)[0]
+            offsets = struct.unpack_from(f'>{count}Q', co64.payload, 8)
+            co64.payload = co64.payload[:8] + struct.pack(f'>{count}Q', *[o + delta for o in offsets])
+
+
+def read_duration(filename):
+    """读取 MP4 文件的影片时长（秒）"""
+    with open(filename, 'rb') as f:
+        for box_type, offset, size in _top_level_boxes(f):
+            if box_type != b'moov':
+                continue
+            f.seek(offset)
+            data = f.read(size)
+            start, end = next(_iter_boxes(data))[1:]
+            mvhd = _parse_box(data, b'moov', start, end).find(b'mvhd')
+            if mvhd is None:
+                break
+            timescale = _read_timescale(mvhd.payload)
+            return _read_duration(mvhd.payload, 16, 24) / float(timescale) if timescale else 0.0
+    raise Exception("MP4 文件缺少 moov，可能尚未写完")
+
+
+def apply_frame_times(filename, frame_times, end_time=None):
+    """按每帧的显示时间（秒，从 0 开始）重写 MP4 视频轨道的时间表
+
+    只改写 moov 中的 stts 和相关时长字段，不重新编码，得到可变帧率的视频。
+    end_time 给出时决定最后一帧的时长（分段录制时即下一分段的开始时间）。
+    视频轨道包含 B 帧（ctts）或帧数与时间戳数量不一致时抛出异常。
+    """
+    with open(filename, 'r+b') as f:
+        boxes = _top_level_boxes(f)
+        moov_info = [b for b in boxes if b[0] == b'moov']
+        if not moov_info:
+            raise Exception("MP4 文件缺少 moov，可能尚未写完")
+        _, moov_offset, moov_size = moov_info[0]
+        f.seek(moov_offset)
+        data = f.read(moov_size)
+        start, end = next(_iter_boxes(data))[1:]
+        moov = _parse_box(data, b'moov', start, end)
+
+        videos = [t for t in moov.find_all(b'trak') if _handler_type(t) == b'vide']
+        if not videos:
+            raise Exception("MP4 文件中没有视频轨道")
+        trak = videos[0]
+        mdia = trak.find(b'mdia')
+        stbl = mdia.find(b'minf').find(b'stbl')
+        if stbl.find(b'ctts') is not None:
+            raise Exception("视频包含 B 帧，无法直接改写时间表")
+
+        stsz = stbl.find(b'stsz')
+        sample_count = struct.unpack_from('>I', stsz.payload, 8)[0]
+        if sample_count != len(frame_times):
+            raise Exception(f"时间戳数量({len(frame_times)})与视频帧数({sample_count})不一致")
+        if sample_count == 0:
+            return
+
+        # 媒体时间刻度下的逐帧时长，按四舍五入后的绝对时间求差，避免累计误差
+        mdhd = mdia.find(b'mdhd')
+        timescale = _read_timescale(mdhd.payload)
+        ticks = [int(round(t * timescale)) for t in frame_times]
+        durations = [max(ticks[i + 1] - ticks[i], 1) for i in range(sample_count - 1)]
+        if end_time is not None:
+            durations.append(max(int(round(end_time * timescale)) - ticks[-1], 1))
+        else:
+            durations.append(durations[-1] if durations else max(int(timescale / 30), 1))
+        media_duration = sum(durations)
+
+        stts = stbl.find(b'stts')
+        stts.payload = _build_stts(durations)
+        mdhd.payload = _write_duration(mdhd.payload, 16, 24, media_duration)
+
+        # 轨道和影片时长使用影片时间刻度
+        mvhd = moov.find(b'mvhd')
+        movie_timescale = _read_timescale(mvhd.payload)
+        track_duration = int(round(media_duration * movie_timescale / float(timescale)))
+        tkhd = trak.find(b'tkhd')
+        tkhd.payload = _write_duration(tkhd.payload, 20, 28, track_duration)
+
+        edts = trak.find(b'edts')
+        elst = edts.find(b'elst') if edts is not None else None
+        if elst is not None:
+            payload = bytearray(elst.payload)
+            count = struct.unpack_from('>I', payload, 4)[0]
+            if count:
+                entry_size = 20 if payload[0] == 1 else 12
+                last = 8 + (count - 1) * entry_size
+                fmt = '>Q' if payload[0] == 1 else '>I'
+                struct.pack_into(fmt, payload, last, track_duration)
+                elst.payload = bytes(payload)
+
+        movie_duration = 0
+        for other in moov.find_all(b'trak'):
+            movie_duration = max(movie_duration, _read_duration(other.find(b'tkhd').payload, 20, 28))
+        mvhd.payload = _write_duration(mvhd.payload, 16, 24, movie_duration)
+
+        new_moov = moov.to_bytes()
+        mdat_offsets = [offset for box_type, offset, _ in boxes if box_type == b'mdat']
+
+        if all(offset < moov_offset for offset in mdat_offsets):
+            # moov 在媒体数据之后：原地改写文件尾部
+            f.seek(moov_offset + moov_size)
+            tail = f.read()
+            f.seek(moov_offset)
+            f.write(new_moov)
+            f.write(tail)
+            f.truncate()
+            return
+
+        # moov 在媒体数据之前（faststart）：修正块偏移后重写整个文件
+        delta = len(new_moov) - moov_size
+        if delta:
+            _shift_chunk_offsets(moov, delta)
+            new_moov = moov.to_bytes()
+        temp_name = filename + '.retime'
+        with open(temp_name, 'wb') as out:
+            f.seek(0)
+            out.write(f.read(moov_offset))
+            out.write(new_moov)
+            f.seek(moov_offset + moov_size)
+            while True:
+                block = f.read(1 << 20)
+                if not block:
+                    break
+                out.write(block)
+    os.replace(temp_name, filename)
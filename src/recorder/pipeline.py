@@ -0,0 +1,117 @@
+import collections
+import threading
+import time
+
+# 编码跟不上时的处理策略
+POLICY_BLOCK = "block"              # 阻塞采集，直到队列有空位
+POLICY_DROP_OLDEST = "drop_oldest"  # 丢弃队列中最旧的帧
+POLICY_DROP_NEWEST = "drop_newest"  # 丢弃刚采集到的新帧
+DROP_POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST)
+
+
+class FrameQueue:
+    """连接采集/编码/预览各阶段的有界队列
+
+    队列满时按 policy 处理，并统计每一个被丢弃的帧。
+    close() 之后 get() 会取完剩余的帧，然后返回 None。
+    """
+
+    def __init__(self, maxsize=60, policy=POLICY_DROP_OLDEST, name="queue"):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"未知的丢帧策略: {policy}")
+        self.maxsize = max(int(maxsize), 1)
+        self.policy = policy
+        self.name = name
+        self.items = collections.deque()
+        self.cond = threading.Condition()
+        self.closed = False
+
+        # 统计
+        self.put_count = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, item):
+        """放入一帧，返回 False 表示该帧被丢弃"""
+        with self.cond:
+            if self.closed:
+                self.dropped += 1
+                return False
+            if len(self.items) >= self.maxsize:
+                if self.policy == POLICY_BLOCK:
+                    while len(self.items) >= self.maxsize and not self.closed:
+                        self.cond.wait()
+                    if self.closed:
+                        self.dropped += 1
+                        return False
+                elif self.policy == POLICY_DROP_OLDEST:
+                    self.items.popleft()
+                    self.dropped += 1
+                else:
+                    self.dropped += 1
+                    return False
+            self.items.append(item)
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """取出一帧，队列已关闭且为空时返回 None"""
+        with self.cond:
+            while not self.items:
+                if self.closed:
+                    return None
+                if not self.cond.wait(timeout):
+                    return None
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        """关闭队列，唤醒所有等待的线程"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def qsize(self):
+        with self.cond:
+            return len(self.items)
+
+    def stats(self):
+        with self.cond:
+            return {
+                'name': self.name,
+                'depth': len(self.items),
+                'max_depth': self.max_depth,
+                'put': self.put_count,
+                'dropped': self.dropped,
+            }
+
+
+class RateMeter:
+    """统计最近一段时间内的事件速率（如实际采集帧率）"""
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.count = 0
+        self.window_start = None
+        self.rate = 0.0
+
+    def tick(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.window_start is None:
+            # 第一次只记录起点，之后按间隔数计算速率
+            self.window_start = now
+            return
+        self.count += 1
+        elapsed = now - self.window_start
+        if elapsed >= self.window:
+            self.rate = self.count / elapsed
+            self.count = 0
+            self.window_start = now
+
+    def reset(self):
+        self.count = 0
+        self.window_start = None
+        self.rate = 0.0
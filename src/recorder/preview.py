@@ -0,0 +1,103 @@
+import threading
+import time
+
+import cv2
+from PIL import Image, ImageTk
+
+
+class PreviewRenderer:
+    """低开销的预览渲染器
+
+    采集线程只调用 submit() 保存最新一帧（不做任何转换），
+    Tk 主线程通过 after() 按固定频率取出最新帧：先缩小再转换颜色，
+    并复用同一个 PhotoImage，所有控件更新都在 GUI 线程中完成。
+    """
+
+    def __init__(self, label, size=(640, 480), fps=15.0, interpolation=cv2.INTER_NEAREST, log=print):
+        self.label = label
+        self.log = log  # 渲染出错时输出日志，录制器传入自己的 log 以显示在日志框中
+        self.size = size
+        self.fps = fps
+        self.interpolation = interpolation
+        self.lock = threading.Lock()
+        self.latest = None
+        self.photo = None
+        self.running = False
+        self.after_id = None
+        self.metrics = None  # 录制器的 Metrics，记录每次渲染耗时
+
+        # 统计
+        self.submitted = 0
+        self.rendered = 0
+        self.render_time = 0.0
+
+    @property
+    def interval_ms(self):
+        return max(int(1000 / self.fps), 1) if self.fps > 0 else 200
+
+    def submit(self, frame):
+        """保存最新一帧，可在任意线程调用"""
+        with self.lock:
+            self.latest = frame
+            self.submitted += 1
+
+    def start(self):
+        """开始刷新，必须在 Tk 主线程中调用"""
+        if self.running:
+            return
+        self.running = True
+        self.after_id = self.label.after(0, self._tick)
+
+    def stop(self):
+        """停止刷新，必须在 Tk 主线程中调用"""
+        self.running = False
+        if self.after_id is not None:
+            try:
+                self.label.after_cancel(self.after_id)
+            except Exception:
+                pass
+            self.after_id = None
+        with self.lock:
+            self.latest = None
+
+    @property
+    def skipped(self):
+        """被节流跳过、没有渲染的帧数"""
+        return max(self.submitted - self.rendered, 0)
+
+    def _tick(self):
+        if not self.running:
+            return
+        with self.lock:
+            frame = self.latest
+            self.latest = None
+        if frame is not None and self.fps > 0:
+            try:
+                self.render(frame)
+            except Exception as e:
+                self.log(f"更新预览失败: {str(e)}")
+        self.after_id = self.label.after(self.interval_ms, self._tick)
+
+    def prepare(self, frame):
+        """缩小 → 颜色转换 → PIL 图像（不涉及 Tk，可在无显示环境中测量）"""
+        small = cv2.resize(frame, self.size, interpolation=self.interpolation)
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        return Image.fromarray(rgb)
+
+    def render(self, frame):
+        """缩小 → 颜色转换 → 写入复用的 PhotoImage"""
+        start = time.perf_counter()
+        image = self.prepare(frame)
+
+        if self.photo is None or (self.photo.width(), self.photo.height()) != self.size:
+            self.photo = ImageTk.PhotoImage(image=image)
+            self.label.configure(image=self.photo)
+            self.label.image = self.photo  # 保持引用防止垃圾回收
+        else:
+            self.photo.paste(image)
+
+        self.rendered += 1
+        elapsed = time.perf_counter() - start
+        self.render_time += elapsed
+        if self.metrics is not None:
+            self.metrics.observe('preview_ms', elapsed * 1000)
@@ -0,0 +1,575 @@
+import ctypes
+import ctypes.util
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src.recorder.sources import FrameSource, _Pacer
+
+ZPIXMAP = 2
+ALL_PLANES = ctypes.c_ulong(-1).value
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+# XDamageReportNonEmpty：损坏区域从空变为非空时只发一个事件，区域本身由 XDamageSubtract 取出
+DAMAGE_REPORT_NON_EMPTY = 3
+# 损坏面积超过该比例，或矩形太多时改为整幅抓取
+PARTIAL_AREA_LIMIT = 0.5
+PARTIAL_RECT_LIMIT = 16
+
+
+class _XImageFuncs(ctypes.Structure):
+    _fields_ = [('create_image', ctypes.c_void_p), ('destroy_image', ctypes.c_void_p),
+                ('get_pixel', ctypes.c_void_p), ('put_pixel', ctypes.c_void_p),
+                ('sub_image', ctypes.c_void_p), ('add_pixel', ctypes.c_void_p)]
+
+
+class _XImage(ctypes.Structure):
+    _fields_ = [('width', ctypes.c_int), ('height', ctypes.c_int),
+                ('xoffset', ctypes.c_int), ('format', ctypes.c_int),
+                ('data', ctypes.c_void_p),
+                ('byte_order', ctypes.c_int), ('bitmap_unit', ctypes.c_int),
+                ('bitmap_bit_order', ctypes.c_int), ('bitmap_pad', ctypes.c_int),
+                ('depth', ctypes.c_int), ('bytes_per_line', ctypes.c_int),
+                ('bits_per_pixel', ctypes.c_int),
+                ('red_mask', ctypes.c_ulong), ('green_mask', ctypes.c_ulong),
+                ('blue_mask', ctypes.c_ulong), ('obdata', ctypes.c_void_p),
+                ('f', _XImageFuncs)]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int),
+                ('shmaddr', ctypes.c_void_p), ('readOnly', ctypes.c_int)]
+
+
+class _XRectangle(ctypes.Structure):
+    _fields_ = [('x', ctypes.c_short), ('y', ctypes.c_short),
+                ('width', ctypes.c_ushort), ('height', ctypes.c_ushort)]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [('type', ctypes.c_int), ('display', ctypes.c_void_p),
+                ('resourceid', ctypes.c_ulong), ('serial', ctypes.c_ulong),
+                ('error_code', ctypes.c_ubyte), ('request_code', ctypes.c_ubyte),
+                ('minor_code', ctypes.c_ubyte)]
+
+
+_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+
+class _X11:
+    """按需加载的 Xlib / XShm / XDamage 函数（ctypes），进程内只加载一次
+
+    XShm 或 XDamage 的库不存在时对应属性为 None，屏幕来源退回普通抓取。
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        path = ctypes.util.find_library('X11')
+        if path is None:
+            raise Exception("未找到 libX11，屏幕录制只支持 X11 桌面")
+        self.x11 = self._load(path, {
+            'XOpenDisplay': (ctypes.c_void_p, [ctypes.c_char_p]),
+            'XCloseDisplay': (ctypes.c_int, [ctypes.c_void_p]),
+            'XDefaultScreen': (ctypes.c_int, [ctypes.c_void_p]),
+            'XRootWindow': (ctypes.c_ulong, [ctypes.c_void_p, ctypes.c_int]),
+            'XDisplayWidth': (ctypes.c_int, [ctypes.c_void_p, ctypes.c_int]),
+            'XDisplayHeight': (ctypes.c_int, [ctypes.c_void_p, ctypes.c_int]),
+            'XDefaultVisual': (ctypes.c_void_p, [ctypes.c_void_p, ctypes.c_int]),
+            'XDefaultDepth': (ctypes.c_int, [ctypes.c_void_p, ctypes.c_int]),
+            'XGetGeometry': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
+                ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int),
+                ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_uint),
+                ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_uint)]),
+            'XTranslateCoordinates': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+                ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int),
+                ctypes.POINTER(ctypes.c_ulong)]),
+            'XQueryTree': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
+                ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.POINTER(ctypes.c_ulong)),
+                ctypes.POINTER(ctypes.c_uint)]),
+            'XFetchName': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_char_p)]),
+            'XGetImage': (ctypes.POINTER(_XImage), [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+                ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_int]),
+            'XGetSubImage': (ctypes.POINTER(_XImage), [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+                ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_int,
+                ctypes.POINTER(_XImage), ctypes.c_int, ctypes.c_int]),
+            'XDestroyImage': (ctypes.c_int, [ctypes.POINTER(_XImage)]),
+            'XFree': (ctypes.c_int, [ctypes.c_void_p]),
+            'XSync': (ctypes.c_int, [ctypes.c_void_p, ctypes.c_int]),
+            'XPending': (ctypes.c_int, [ctypes.c_void_p]),
+            'XNextEvent': (ctypes.c_int, [ctypes.c_void_p, ctypes.c_void_p]),
+            'XSetErrorHandler': (ctypes.c_void_p, [ctypes.c_void_p]),
+        })
+        self.xext = self._load_optional('Xext', {
+            'XShmQueryExtension': (ctypes.c_int, [ctypes.c_void_p]),
+            'XShmCreateImage': (ctypes.POINTER(_XImage), [
+                ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p,
+                ctypes.POINTER(_XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint]),
+            'XShmAttach': (ctypes.c_int, [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]),
+            'XShmDetach': (ctypes.c_int, [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]),
+            'XShmGetImage': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                ctypes.c_int, ctypes.c_int, ctypes.c_ulong]),
+        })
+        self.xfixes = self._load_optional('Xfixes', {
+            'XFixesQueryExtension': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]),
+            'XFixesQueryVersion': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]),
+            'XFixesCreateRegion': (ctypes.c_ulong, [
+                ctypes.c_void_p, ctypes.POINTER(_XRectangle), ctypes.c_int]),
+            'XFixesDestroyRegion': (None, [ctypes.c_void_p, ctypes.c_ulong]),
+            'XFixesFetchRegion': (ctypes.POINTER(_XRectangle), [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_int)]),
+        })
+        self.xdamage = self._load_optional('Xdamage', {
+            'XDamageQueryExtension': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]),
+            'XDamageQueryVersion': (ctypes.c_int, [
+                ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]),
+            'XDamageCreate': (ctypes.c_ulong, [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int]),
+            'XDamageDestroy': (None, [ctypes.c_void_p, ctypes.c_ulong]),
+            'XDamageSubtract': (None, [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]),
+        })
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.libc = self._bind(libc, {
+            'shmget': (ctypes.c_int, [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]),
+            'shmat': (ctypes.c_void_p, [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]),
+            'shmdt': (ctypes.c_int, [ctypes.c_void_p]),
+            'shmctl': (ctypes.c_int, [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]),
+        })
+
+        # X 错误默认会直接结束进程；只记录本模块打开的连接上的错误，
+        # 其他连接（如 Tk 界面）交给原来的处理函数
+        self.errors = {}
+        self.previous_handler = None
+        self.error_handler = _ERROR_HANDLER(self._on_error)
+        previous = self.x11.XSetErrorHandler(ctypes.cast(self.error_handler, ctypes.c_void_p))
+        if previous:
+            self.previous_handler = _ERROR_HANDLER(previous)
+
+    def _bind(self, lib, functions):
+        for name, (restype, argtypes) in functions.items():
+            func = getattr(lib, name)
+            func.restype = restype
+            func.argtypes = argtypes
+        return lib
+
+    def _load(self, path, functions):
+        return self._bind(ctypes.CDLL(path), functions)
+
+    def _load_optional(self, name, functions):
+        path = ctypes.util.find_library(name)
+        if path is None:
+            return None
+        try:
+            return self._load(path, functions)
+        except (OSError, AttributeError):
+            return None
+
+    def _on_error(self, display, event):
+        if display in self.errors:
+            self.errors[display] = event.contents.error_code
+            return 0
+        if self.previous_handler is not None:
+            return self.previous_handler(display, event)
+        return 0
+
+    def watch(self, display):
+        self.errors[display] = None
+
+    def unwatch(self, display):
+        self.errors.pop(display, None)
+
+    def take_error(self, display):
+        """取出并清除该连接上最近一次 X 错误的错误码，没有错误时返回 None"""
+        error = self.errors.get(display)
+        if error is not None:
+            self.errors[display] = None
+        return error
+
+
+class ScreenSource(FrameSource):
+    """X11 屏幕录制（整个屏幕、某个窗口或一个区域）
+
+    通过 MIT-SHM 共享内存抓取：X 服务器直接把像素写入与本进程共享的内存，
+    不经过套接字逐帧拷贝；开启 use_damage 且服务器支持 DAMAGE 扩展时，
+    只重新抓取上一帧之后变化过的矩形，画面静止时几乎没有开销。
+    不支持共享内存时（如远程显示）退回 XGetImage。
+
+    region 为 (x, y, 宽, 高)，指定 window 时相对窗口左上角；window 可以是窗口 ID，
+    也可以是窗口标题中的一段文字。窗口录制抓取的是窗口所在的屏幕区域，
+    窗口移动时跟随，大小按打开时固定。
+    """
+
+    def __init__(self, display=None, region=None, window=None, fps=30.0,
+                 use_shm=True, use_damage=True, realtime=True):
+        super().__init__()
+        self.display_name = display or os.environ.get('DISPLAY', ':0')
+        self.region = region
+        self.window = window
+        self.fps = float(fps)
+        self.use_shm = use_shm
+        self.use_damage = use_damage
+        self.realtime = realtime
+        self.x = None
+        self.display = None
+        self.pacer = None
+        self.stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        with self.stats_lock:
+            self.shm_enabled = False
+            self.damage_enabled = False
+            self.full_grabs = 0
+            self.partial_grabs = 0
+            self.unchanged = 0
+            self.grab_time = 0.0
+            self.grab_count = 0
+
+    def open(self):
+        x = _X11.get()
+        display = x.x11.XOpenDisplay(self.display_name.encode())
+        if not display:
+            raise Exception(f"无法连接 X 显示 {self.display_name}")
+        self.x = x
+        self.display = display
+        x.watch(display)
+        try:
+            self._setup()
+        except Exception:
+            self.release()
+            raise
+        self.pacer = _Pacer(self.fps)
+        self.finished = False
+
+    def _setup(self):
+        x11 = self.x.x11
+        screen = x11.XDefaultScreen(self.display)
+        self.root = x11.XRootWindow(self.display, screen)
+        self.screen_width = x11.XDisplayWidth(self.display, screen)
+        self.screen_height = x11.XDisplayHeight(self.display, screen)
+
+        self.window_id = None
+        if self.window is not None:
+            self.window_id = self.window if isinstance(self.window, int) else self._find_window(self.window)
+        left, top, width, height = self._capture_rect()
+        # 编码器（yuv420p）要求宽高为偶数
+        self.width = width & ~1
+        self.height = height & ~1
+        if self.width <= 0 or self.height <= 0:
+            raise Exception("录制区域不在屏幕范围内")
+        self.left, self.top = left, top
+
+        self.shm = None
+        self.image = None
+        if self.use_shm and self.x.xext is not None and self.x.xext.XShmQueryExtension(self.display):
+            self._create_shm_image(screen)
+        if self.image is None:
+            self.image = x11.XGetImage(self.display, self.root, self.left, self.top,
+                                       self.width, self.height, ALL_PLANES, ZPIXMAP)
+            if not self.image:
+                raise Exception("抓取屏幕失败")
+        image = self.image.contents
+        if image.bits_per_pixel != 32:
+            raise Exception(f"不支持 {image.depth} 位色深的显示")
+        buffer = (ctypes.c_ubyte * (image.bytes_per_line * image.height)).from_address(image.data)
+        self.pixels = np.frombuffer(buffer, dtype=np.uint8).reshape(
+            image.height, image.bytes_per_line // 4, 4)[:self.height, :self.width]
+
+        self.damage = None
+        self.damage_region = None
+        if self.use_damage:
+            self._create_damage()
+
+        self.frame = None
+        self._reset_stats()
+        self.shm_enabled = self.shm is not None
+        self.damage_enabled = self.damage is not None
+
+    def _create_shm_image(self, screen):
+        """创建共享内存图像，失败时保持 self.image 为 None"""
+        xext, libc = self.x.xext, self.x.libc
+        shm = _XShmSegmentInfo()
+        image = xext.XShmCreateImage(
+            self.display, self.x.x11.XDefaultVisual(self.display, screen),
+            self.x.x11.XDefaultDepth(self.display, screen), ZPIXMAP, None,
+            ctypes.byref(shm), self.width, self.height)
+        if not image:
+            return
+        size = image.contents.bytes_per_line * image.contents.height
+        shm.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if shm.shmid < 0:
+            self._destroy_image(image)
+            return
+        address = libc.shmat(shm.shmid, None, 0)
+        if address is None or address == ctypes.c_void_p(-1).value:
+            libc.shmctl(shm.shmid, IPC_RMID, None)
+            self._destroy_image(image)
+            return
+        shm.shmaddr = address
+        shm.readOnly = 0
+        image.contents.data = address
+        attached = xext.XShmAttach(self.display, ctypes.byref(shm))
+        self.x.x11.XSync(self.display, 0)
+        # 双方都已映射后立即标记删除，进程异常退出时也不会遗留共享内存
+        libc.shmctl(shm.shmid, IPC_RMID, None)
+        if not attached or self.x.take_error(self.display) is not None:
+            libc.shmdt(address)
+            self._destroy_image(image)
+            return
+        self.shm = shm
+        self.image = image
+
+    def _destroy_image(self, image):
+        # 共享内存图像的数据不是 malloc 分配的，不能交给 XDestroyImage 释放
+        image.contents.data = None
+        self.x.x11.XDestroyImage(image)
+
+    def _create_damage(self):
+        xfixes, xdamage = self.x.xfixes, self.x.xdamage
+        if xfixes is None or xdamage is None:
+            return
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        major, minor = ctypes.c_int(5), ctypes.c_int(0)
+        if not xfixes.XFixesQueryExtension(self.display, ctypes.byref(event_base), ctypes.byref(error_base)):
+            return
+        xfixes.XFixesQueryVersion(self.display, ctypes.byref(major), ctypes.byref(minor))
+        if not xdamage.XDamageQueryExtension(self.display, ctypes.byref(event_base), ctypes.byref(error_base)):
+            return
+        major, minor = ctypes.c_int(1), ctypes.c_int(1)
+        xdamage.XDamageQueryVersion(self.display, ctypes.byref(major), ctypes.byref(minor))
+        self.damage = xdamage.XDamageCreate(self.display, self.root, DAMAGE_REPORT_NON_EMPTY)
+        self.damage_region = xfixes.XFixesCreateRegion(self.display, None, 0)
+        self.x.x11.XSync(self.display, 0)
+        if self.x.take_error(self.display) is not None:
+            self.damage = None
+
+    def _find_window(self, title):
+        """按标题查找窗口（深度优先，返回第一个标题包含 title 的窗口）"""
+        x11 = self.x.x11
+        pending = [self.root]
+        while pending:
+            window = pending.pop()
+            name = ctypes.c_char_p()
+            if x11.XFetchName(self.display, window, ctypes.byref(name)) and name.value is not None:
+                matched = title in name.value.decode('utf-8', 'replace')
+                x11.XFree(name)
+                if matched:
+                    return window
+            root, parent = ctypes.c_ulong(), ctypes.c_ulong()
+            children = ctypes.POINTER(ctypes.c_ulong)()
+            count = ctypes.c_uint()
+            if x11.XQueryTree(self.display, window, ctypes.byref(root), ctypes.byref(parent),
+                              ctypes.byref(children), ctypes.byref(count)):
+                pending.extend(children[i] for i in range(count.value))
+                if children:
+                    x11.XFree(children)
+        raise Exception(f"找不到标题包含“{title}”的窗口")
+
+    def _window_origin(self):
+        """窗口左上角在屏幕上的位置，窗口已关闭时返回 None"""
+        x, y, child = ctypes.c_int(), ctypes.c_int(), ctypes.c_ulong()
+        ok = self.x.x11.XTranslateCoordinates(self.display, self.window_id, self.root, 0, 0,
+                                              ctypes.byref(x), ctypes.byref(y), ctypes.byref(child))
+        if not ok or self.x.take_error(self.display) is not None:
+            return None
+        return x.value, y.value
+
+    def _capture_rect(self):
+        """打开时确定的录制区域 (左, 上, 宽, 高)，已裁剪到屏幕范围内"""
+        if self.window_id is not None:
+            root = ctypes.c_ulong()
+            x, y = ctypes.c_int(), ctypes.c_int()
+            width, height, border, depth = ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint()
+            ok = self.x.x11.XGetGeometry(self.display, self.window_id, ctypes.byref(root),
+                                         ctypes.byref(x), ctypes.byref(y), ctypes.byref(width),
+                                         ctypes.byref(height), ctypes.byref(border), ctypes.byref(depth))
+            origin = self._window_origin() if ok else None
+            if origin is None:
+                raise Exception(f"无法获取窗口 {self.window_id:#x} 的位置")
+            left, top, right, bottom = origin[0], origin[1], origin[0] + width.value, origin[1] + height.value
+            if self.region is not None:
+                rx, ry, rw, rh = self.region
+                left, top = left + rx, top + ry
+                right, bottom = min(left + rw, right), min(top + rh, bottom)
+        elif self.region is not None:
+            rx, ry, rw, rh = self.region
+            left, top, right, bottom = rx, ry, rx + rw, ry + rh
+        else:
+            left, top, right, bottom = 0, 0, self.screen_width, self.screen_height
+        left, top = max(left, 0), max(top, 0)
+        right, bottom = min(right, self.screen_width), min(bottom, self.screen_height)
+        return left, top, right - left, bottom - top
+
+    def _damaged_rects(self):
+        """取出并清空自上次调用以来屏幕上变化的矩形（与录制区域相交的部分，录制区域坐标）"""
+        x11, xfixes = self.x.x11, self.x.xfixes
+        # DAMAGE 事件只用于唤醒，区域本身直接从服务器取出；事件不处理会一直堆积
+        event = (ctypes.c_long * 24)()
+        while x11.XPending(self.display):
+            x11.XNextEvent(self.display, event)
+        self.x.xdamage.XDamageSubtract(self.display, self.damage, 0, self.damage_region)
+        count = ctypes.c_int()
+        rects = xfixes.XFixesFetchRegion(self.display, self.damage_region, ctypes.byref(count))
+        result = []
+        if rects:
+            for i in range(count.value):
+                r = rects[i]
+                left, top = max(r.x - self.left, 0), max(r.y - self.top, 0)
+                right = min(r.x + r.width - self.left, self.width)
+                bottom = min(r.y + r.height - self.top, self.height)
+                if right > left and bottom > top:
+                    result.append((left, top, right - left, bottom - top))
+            x11.XFree(rects)
+        return result
+
+    def _grab_full(self):
+        if self.shm is not None:
+            ok = self.x.xext.XShmGetImage(self.display, self.root, self.image,
+                                          self.left, self.top, ALL_PLANES)
+        else:
+            ok = self.x.x11.XGetSubImage(self.display, self.root, self.left, self.top,
+                                         self.width, self.height, ALL_PLANES, ZPIXMAP,
+                                         self.image, 0, 0)
+        return bool(ok) and self.x.take_error(self.display) is None
+
+    def _grab_rects(self, rects):
+        for left, top, width, height in rects:
+            self.x.x11.XGetSubImage(self.display, self.root, self.left + left, self.top + top,
+                                    width, height, ALL_PLANES, ZPIXMAP, self.image, left, top)
+        return self.x.take_error(self.display) is None
+
+    def read(self):
+        if self.display is None or self.finished:
+            return False, None
+        if self.realtime:
+            self.pacer.wait()
+        start = time.perf_counter()
+
+        moved = False
+        if self.window_id is not None:
+            origin = self._window_origin()
+            if origin is None:
+                # 窗口已关闭，结束录制
+                self.finished = True
+                return False, None
+            left = min(max(origin[0] + (self.region[0] if self.region else 0), 0), self.screen_width - self.width)
+            top = min(max(origin[1] + (self.region[1] if self.region else 0), 0), self.screen_height - self.height)
+            moved = (left, top) != (self.left, self.top)
+            self.left, self.top = left, top
+
+        rects = self._damaged_rects() if self.damage is not None else None
+        if self.frame is None or rects is None or moved:
+            kind = 'full'
+        elif not rects:
+            kind = 'unchanged'
+        else:
+            area = sum(w * h for _, _, w, h in rects)
+            if len(rects) > PARTIAL_RECT_LIMIT or area > self.width * self.height * PARTIAL_AREA_LIMIT:
+                kind = 'full'
+            else:
+                kind = 'partial'
+
+        if kind == 'full':
+            if not self._grab_full():
+                return False, None
+            if self.damage is None:
+                # 没有 DAMAGE 时每帧都是新数组，直接交给编码队列
+                frame = cv2.cvtColor(self.pixels, cv2.COLOR_BGRA2BGR)
+            else:
+                if self.frame is None:
+                    self.frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+                cv2.cvtColor(self.pixels, cv2.COLOR_BGRA2BGR, dst=self.frame)
+        elif kind == 'partial':
+            if not self._grab_rects(rects):
+                return False, None
+            for left, top, width, height in rects:
+                self.frame[top:top + height, left:left + width] = \
+                    self.pixels[top:top + height, left:left + width, :3]
+
+        if self.damage is not None:
+            # 编码队列中的帧不能被下一次局部更新改写
+            frame = self.frame.copy()
+        with self.stats_lock:
+            if kind == 'full':
+                self.full_grabs += 1
+            elif kind == 'partial':
+                self.partial_grabs += 1
+            else:
+                self.unchanged += 1
+            self.grab_time += time.perf_counter() - start
+            self.grab_count += 1
+        return True, frame
+
+    def release(self):
+        if self.display is None:
+            return
+        x11 = self.x.x11
+        if getattr(self, 'damage', None):
+            self.x.xdamage.XDamageDestroy(self.display, self.damage)
+        if getattr(self, 'damage_region', None):
+            self.x.xfixes.XFixesDestroyRegion(self.display, self.damage_region)
+        self.damage = self.damage_region = None
+        if getattr(self, 'image', None):
+            if self.shm is not None:
+                self.x.xext.XShmDetach(self.display, ctypes.byref(self.shm))
+                x11.XSync(self.display, 0)
+                self.x.libc.shmdt(self.shm.shmaddr)
+                self._destroy_image(self.image)
+            else:
+                x11.XDestroyImage(self.image)
+        self.image = None
+        self.shm = None
+        self.pixels = None
+        self.frame = None
+        self.x.unwatch(self.display)
+        x11.XCloseDisplay(self.display)
+        self.display = None
+
+    def is_opened(self):
+        return self.display is not None
+
+    def set_fps(self, fps):
+        self.fps = float(fps)
+        self.pacer = _Pacer(self.fps)
+
+    def describe(self):
+        if self.window is not None:
+            target = f"窗口 {self.window:#x}" if isinstance(self.window, int) else f"窗口“{self.window}”"
+        elif self.region is not None:
+            target = "区域 {},{} {}x{}".format(*self.region)
+        else:
+            target = "全屏"
+        return f"屏幕 {self.display_name} {target}"
+
+    def stats(self):
+        """抓取统计：整幅/局部抓取和画面未变化的次数，平均每帧耗时（毫秒）"""
+        with self.stats_lock:
+            return {
+                'shm': self.shm_enabled,
+                'damage': self.damage_enabled,
+                'full_grabs': self.full_grabs,
+                'partial_grabs': self.partial_grabs,
+                'unchanged': self.unchanged,
+                'grab_ms': self.grab_time * 1000 / self.grab_count if self.grab_count else 0.0,
+            }
@@ -0,0 +1,57 @@
+import os
+import threading
+
+
+class Segment:
+    """一个录制分段的文件、写入器和时间信息
+
+    未开启分段时整个录制就是一个分段。视频侧在编码线程中切换分段，
+    音频侧在回调线程中按采样位置切换，切换点之前的采样写入旧分段，
+    之后的写入新分段，保证分段之间不丢帧、不丢采样。
+    """
+
+    def __init__(self, index, video_filename, audio_filename):
+        self.index = index
+        self.video_filename = video_filename
+        self.audio_filename = audio_filename
+        self.video_writer = None
+        self.audio_writer = None
+        self.timestamp_log = None
+
+        self.frame_count = 0
+        self.start_time = None   # 第一帧的采集时间
+        self.end_time = None     # 下一分段第一帧的采集时间
+        self.audio_start = 0     # 本段第一个采样在整段录音中的位置
+        self.audio_closed = threading.Event()  # 音频已切换到下一分段
+
+    def files(self):
+        return [f for f in (self.video_filename, self.audio_filename) if f]
+
+
+def segment_name(base, index):
+    """分段文件名：<base>_000、<base>_001 ..."""
+    return f"{base}_{index:03d}"
+
+
+def write_manifest(filename, files):
+    """写入 ffmpeg concat 清单，可直接用于 -f concat -safe 0 无损拼接"""
+    temp_name = filename + ".tmp"
+    with open(temp_name, 'w', encoding='utf-8') as f:
+        f.write("ffconcat version 1.0\n")
+        for path in files:
+            name = os.path.basename(path).replace("'", "'\\''")
+            f.write(f"file '{name}'\n")
+    os.replace(temp_name, filename)
+
+
+def read_manifest(filename):
+    """读取 concat 清单中的文件（返回绝对路径）"""
+    directory = os.path.dirname(filename)
+    files = []
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("file "):
+                name = line[5:].strip()[1:-1].replace("'\\''", "'")
+                files.append(os.path.join(directory, name))
+    return files
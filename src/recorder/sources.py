@@ -0,0 +1,456 @@
+import os
+import threading
+import time
+import wave
+
+import cv2
+import numpy as np
+
+
+class _Pacer:
+    """按固定速率节拍等待，用于实时回放"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / float(rate)
+        self.next_time = None
+
+    def reset(self):
+        self.next_time = None
+
+    def wait(self):
+        now = time.perf_counter()
+        if self.next_time is None:
+            self.next_time = now
+        sleep_time = self.next_time - now
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+        elif sleep_time < -self.interval:
+            # 落后超过一个周期时重新对齐，避免追帧风暴
+            self.next_time = now
+        self.next_time += self.interval
+
+
+class FrameSource:
+    """视频帧来源基类
+
+    子类需要实现 open/read/release，并在 open 之后提供 width/height/fps。
+    read 返回值与 cv2.VideoCapture.read 一致：(ret, frame)。
+    """
+
+    # 是否需要在启动时实测帧率（真实摄像头报告的帧率通常不可靠）
+    probe_fps = False
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.fps = 30.0
+        self.finished = False
+
+    def open(self):
+        raise NotImplementedError
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def is_opened(self):
+        return False
+
+    def set_fps(self, fps):
+        """请求新的采集帧率，来源不支持时忽略"""
+        pass
+
+    def describe(self):
+        return self.__class__.__name__
+
+    def device_key(self):
+        """设备能力缓存的键（设备标识|请求的模式），不需要缓存时返回 None"""
+        return None
+
+
+class CameraSource(FrameSource):
+    """真实摄像头（cv2.VideoCapture）"""
+
+    probe_fps = True
+
+    def __init__(self, index=0, width=1280, height=720):
+        super().__init__()
+        self.index = index
+        self.requested_width = width
+        self.requested_height = height
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.index)
+        if not self.cap.isOpened():
+            raise Exception("无法打开摄像头")
+
+        # 设置摄像头属性
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.requested_width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.requested_height)
+        self._update_format()
+
+    def _update_format(self):
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if fps and fps > 0:
+            self.fps = fps
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        return self.cap.read()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def is_opened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def set_fps(self, fps):
+        if self.cap is not None:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+
+    def describe(self):
+        return f"摄像头 {self.index}"
+
+    def device_key(self):
+        return f"{self.device_identity()}|{self.requested_width}x{self.requested_height}"
+
+    def device_identity(self):
+        """尽量稳定的设备标识：Linux 上使用 V4L2 设备名和总线路径，
+        其他平台只能使用索引，换了设备时需要手动重新检测"""
+        sysfs = f"/sys/class/video4linux/video{self.index}"
+        try:
+            with open(os.path.join(sysfs, "name"), encoding='utf-8') as f:
+                name = f.read().strip()
+            bus_path = os.path.basename(os.path.realpath(os.path.join(sysfs, "device")))
+            return f"v4l2:{name}@{bus_path}"
+        except OSError:
+            return f"camera:{self.index}"
+
+
+class VideoFileSource(FrameSource):
+    """视频文件回放，可按原始帧率实时回放或以最快速度读取"""
+
+    def __init__(self, path, realtime=True, loop=False):
+        super().__init__()
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.cap = None
+        self.pacer = None
+
+    def open(self):
+        if not os.path.exists(self.path):
+            raise Exception(f"找不到视频文件: {self.path}")
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise Exception(f"无法打开视频文件: {self.path}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if fps and fps > 0:
+            self.fps = fps
+        self.pacer = _Pacer(self.fps)
+        self.finished = False
+
+    def read(self):
+        if self.cap is None or self.finished:
+            return False, None
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            self.finished = True
+            return False, None
+        if self.realtime:
+            self.pacer.wait()
+        return ret, frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def is_opened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def describe(self):
+        return f"视频文件 {os.path.basename(self.path)}"
+
+
+class SyntheticVideoSource(FrameSource):
+    """合成测试图案（彩条 + 移动方块 + 帧号），结果完全可复现"""
+
+    BAR_COLORS = [
+        (255, 255, 255), (0, 255, 255), (255, 255, 0), (0, 255, 0),
+        (255, 0, 255), (0, 0, 255), (255, 0, 0), (0, 0, 0),
+    ]
+
+    def __init__(self, width=1280, height=720, fps=30.0, realtime=True, duration=None):
+        super().__init__()
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = float(fps)
+        self.realtime = realtime
+        self.duration = duration
+        self.frame_index = 0
+        self.background = None
+        self.pacer = None
+
+    def open(self):
+        # 预先生成彩条背景，每帧只需复制并绘制少量内容
+        self.background = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        bar_width = max(self.width // len(self.BAR_COLORS), 1)
+        for i, color in enumerate(self.BAR_COLORS):
+            self.background[:, i * bar_width:(i + 1) * bar_width] = color
+        self.frame_index = 0
+        self.pacer = _Pacer(self.fps)
+        self.finished = False
+
+    def read(self):
+        if self.background is None or self.finished:
+            return False, None
+        if self.duration is not None and self.frame_index >= self.duration * self.fps:
+            self.finished = True
+            return False, None
+        if self.realtime:
+            self.pacer.wait()
+
+        frame = self.background.copy()
+        box = max(self.height // 8, 8)
+        span = max(self.width - box, 1)
+        x = (self.frame_index * 8) % span
+        y = (self.height - box) // 2
+        frame[y:y + box, x:x + box] = 128
+        cv2.putText(frame, f"{self.frame_index:06d}", (10, self.height - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+        self.frame_index += 1
+        return True, frame
+
+    def release(self):
+        self.background = None
+
+    def is_opened(self):
+        return self.background is not None
+
+    def set_fps(self, fps):
+        self.fps = float(fps)
+        if self.pacer is not None:
+            self.pacer = _Pacer(self.fps)
+
+    def describe(self):
+        return f"合成图案 {self.width}x{self.height}@{self.fps:.0f}"
+
+
+class AudioSource:
+    """音频来源基类
+
+    start(callback) 之后，来源在自己的线程中按 PyAudio 回调的签名调用
+    callback(in_data, frame_count, time_info, status)，in_data 为 16 位 PCM。
+    """
+
+    def __init__(self, rate=44100, channels=1, chunk=1024):
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.sample_width = 2
+        self.finished = False
+
+    def open(self):
+        pass
+
+    def start(self, callback):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return self.__class__.__name__
+
+
+class _ThreadedAudioSource(AudioSource):
+    """在后台线程中产生音频块的来源"""
+
+    def __init__(self, rate=44100, channels=1, chunk=1024, realtime=True):
+        super().__init__(rate, channels, chunk)
+        self.realtime = realtime
+        self.running = False
+        self.thread = None
+
+    def start(self, callback):
+        self.callback = callback
+        self.running = True
+        self.finished = False
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+            self.thread = None
+
+    def _next_chunk(self):
+        """返回下一块 PCM 数据，返回 None 表示结束"""
+        raise NotImplementedError
+
+    def _run(self):
+        pacer = _Pacer(self.rate / float(self.chunk))
+        while self.running:
+            if self.realtime:
+                pacer.wait()
+            data = self._next_chunk()
+            if data is None:
+                self.finished = True
+                break
+            now = time.perf_counter()
+            time_info = {
+                'input_buffer_adc_time': now,
+                'current_time': now,
+                'output_buffer_dac_time': 0,
+            }
+            frame_count = len(data) // (self.sample_width * self.channels)
+            self.callback(data, frame_count, time_info, 0)
+
+
+class SyntheticAudioSource(_ThreadedAudioSource):
+    """合成正弦测试音"""
+
+    def __init__(self, rate=44100, channels=1, chunk=1024, frequency=440.0,
+                 amplitude=0.3, realtime=True, duration=None):
+        super().__init__(rate, channels, chunk, realtime)
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.duration = duration
+        self.position = 0
+
+    def start(self, callback):
+        self.position = 0
+        super().start(callback)
+
+    def _next_chunk(self):
+        if self.duration is not None and self.position >= self.duration * self.rate:
+            return None
+        t = (np.arange(self.chunk) + self.position) / float(self.rate)
+        self.position += self.chunk
+        samples = self.amplitude * 32767 * np.sin(2 * np.pi * self.frequency * t)
+        samples = samples.astype(np.int16)
+        if self.channels > 1:
+            samples = np.repeat(samples, self.channels)
+        return samples.tobytes()
+
+    def describe(self):
+        return f"合成音 {self.frequency:.0f}Hz"
+
+
+class WavFileSource(_ThreadedAudioSource):
+    """WAV 文件回放"""
+
+    def __init__(self, path, chunk=1024, realtime=True):
+        super().__init__(chunk=chunk, realtime=realtime)
+        self.path = path
+        self.wf = None
+
+    def open(self):
+        self.close()
+        if not os.path.exists(self.path):
+            raise Exception(f"找不到音频文件: {self.path}")
+        self.wf = wave.open(self.path, 'rb')
+        if self.wf.getsampwidth() != 2:
+            raise Exception("仅支持16位PCM音频文件")
+        self.rate = self.wf.getframerate()
+        self.channels = self.wf.getnchannels()
+        self.sample_width = self.wf.getsampwidth()
+
+    def start(self, callback):
+        if self.wf is None:
+            self.open()
+        self.wf.rewind()
+        super().start(callback)
+
+    def _next_chunk(self):
+        data = self.wf.readframes(self.chunk)
+        return data if data else None
+
+    def close(self):
+        if self.wf is not None:
+            self.wf.close()
+            self.wf = None
+
+    def describe(self):
+        return f"音频文件 {os.path.basename(self.path)}"
+
+
+class MicrophoneSource(AudioSource):
+    """PyAudio 麦克风输入"""
+
+    def __init__(self, device_index=None, rate=44100, channels=1, chunk=1024):
+        super().__init__(rate, channels, chunk)
+        self.device_index = device_index
+        self.audio = None
+        self.stream = None
+
+    def open(self):
+        import pyaudio
+        if self.audio is None:
+            self.audio = pyaudio.PyAudio()
+        self.sample_width = self.audio.get_sample_size(pyaudio.paInt16)
+
+        # 检查音频设备
+        if self.device_index is None:
+            for i in range(self.audio.get_device_count()):
+                device_info = self.audio.get_device_info_by_index(i)
+                if device_info.get('maxInputChannels') > 0:
+                    self.device_name = device_info.get('name')
+                    return
+            raise Exception("未找到可用的音频输入设备")
+        device_info = self.audio.get_device_info_by_index(self.device_index)
+        self.device_name = device_info.get('name')
+
+    def start(self, callback):
+        import pyaudio
+        if self.audio is None:
+            self.open()
+
+        def _on_audio(in_data, frame_count, time_info, status):
+            callback(in_data, frame_count, time_info, status)
+            return (None, pyaudio.paContinue)
+
+        self.stream = self.audio.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.chunk,
+            stream_callback=_on_audio  # 使用回调方式处理音频
+        )
+        self.stream.start_stream()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+    def close(self):
+        self.stop()
+        if self.audio is not None:
+            self.audio.terminate()
+            self.audio = None
+
+    def describe(self):
+        return f"音频输入设备: {getattr(self, 'device_name', '默认')}"
@@ -0,0 +1,149 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from src.recorder.pipeline import FrameQueue, POLICY_DROP_NEWEST
+
+STILL_FORMATS = {
+    'jpg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+class StillCapture:
+    """录制过程中按间隔保存静态截图和缩略图
+
+    offer() 在采集线程中对每一帧调用，只判断是否到了截图时间，
+    到了就把帧放进一个很短的队列（满了直接丢弃这张截图），
+    由 workers 个后台线程编码为 JPEG/WebP 写入磁盘，不会阻塞采集和编码。
+    截图按采集时间相对第一帧的偏移命名（毫秒），与视频时间轴一致；
+    同时保存一张缩小的 JPEG 缩略图，finish() 时拼成一张缩略图总览。
+
+    interval 为截图间隔（秒）；every 大于 0 时改为每隔 every 帧截一张。
+    """
+
+    def __init__(self, directory, interval=5.0, every=0, image_format='jpg', quality=85,
+                 thumb_height=90, columns=8, workers=2):
+        if image_format not in STILL_FORMATS:
+            raise ValueError(f"不支持的截图格式: {image_format}")
+        self.directory = directory
+        self.interval = interval
+        self.every = every
+        self.image_format = image_format
+        self.quality = quality
+        self.thumb_height = thumb_height
+        self.columns = columns
+        self.worker_count = max(int(workers), 1)
+        self.queue = None
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.first_time = None
+        self.next_time = None
+        self.frame_index = 0
+        self.saved = []        # [(偏移毫秒, 采集时间, 文件名)]
+        self.thumbnails = {}   # 偏移毫秒 -> JPEG 编码的缩略图
+        self.errors = 0
+        self.queue = FrameQueue(4, POLICY_DROP_NEWEST, "stills")
+        self.workers = [threading.Thread(target=self._work) for _ in range(self.worker_count)]
+        for worker in self.workers:
+            worker.daemon = True
+            worker.start()
+        return self
+
+    def offer(self, frame, timestamp):
+        """采集线程中调用：到了截图时间时提交这一帧，立即返回"""
+        if self.first_time is None:
+            self.first_time = timestamp
+            self.next_time = timestamp
+        index = self.frame_index
+        self.frame_index += 1
+        if self.every > 0:
+            if index % self.every:
+                return False
+        elif timestamp < self.next_time:
+            return False
+        else:
+            # 按固定节拍推进，某一帧延迟到达时不影响后面的截图时间
+            while self.next_time <= timestamp:
+                self.next_time += self.interval
+        offset_ms = int(round((timestamp - self.first_time) * 1000))
+        return self.queue.put((frame, timestamp, offset_ms))
+
+    def _work(self):
+        extension, quality_flag = STILL_FORMATS[self.image_format]
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, timestamp, offset_ms = item
+            try:
+                ok, data = cv2.imencode(extension, frame, [quality_flag, self.quality])
+                if not ok:
+                    raise Exception("编码失败")
+                filename = os.path.join(self.directory, f"still_{offset_ms:09d}{extension}")
+                with open(filename, 'wb') as f:
+                    f.write(data.tobytes())
+
+                height, width = frame.shape[:2]
+                thumb_width = max(int(round(width * self.thumb_height / float(height))), 1)
+                thumb = cv2.resize(frame, (thumb_width, self.thumb_height), interpolation=cv2.INTER_AREA)
+                ok, thumb_data = cv2.imencode('.jpg', thumb, [cv2.IMWRITE_JPEG_QUALITY, 80])
+                with self.lock:
+                    self.saved.append((offset_ms, timestamp, filename))
+                    if ok:
+                        self.thumbnails[offset_ms] = thumb_data
+            except Exception:
+                with self.lock:
+                    self.errors += 1
+
+    def finish(self):
+        """等待剩余截图写完，写出截图索引和缩略图总览，返回总览文件名（没有截图时为 None）"""
+        if self.queue is None:
+            return None
+        self.queue.close()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        with self.lock:
+            self.saved.sort()
+            saved = list(self.saved)
+            thumbnails = [self.thumbnails[offset] for offset, _, _ in saved if offset in self.thumbnails]
+        if not saved:
+            return None
+
+        with open(os.path.join(self.directory, "stills.csv"), 'w', encoding='utf-8') as f:
+            f.write("offset_ms,time,file\n")
+            for offset_ms, timestamp, filename in saved:
+                f.write(f"{offset_ms},{timestamp:.6f},{os.path.basename(filename)}\n")
+        return self._write_contact_sheet(thumbnails)
+
+    def _write_contact_sheet(self, thumbnails):
+        images = [cv2.imdecode(data, cv2.IMREAD_COLOR) for data in thumbnails]
+        images = [image for image in images if image is not None]
+        if not images:
+            return None
+        cell_width = max(image.shape[1] for image in images)
+        rows = (len(images) + self.columns - 1) // self.columns
+        columns = min(len(images), self.columns)
+        sheet = np.zeros((rows * self.thumb_height, columns * cell_width, 3), dtype=np.uint8)
+        for i, image in enumerate(images):
+            row, column = divmod(i, self.columns)
+            y, x = row * self.thumb_height, column * cell_width
+            sheet[y:y + image.shape[0], x:x + image.shape[1]] = image
+        filename = os.path.join(self.directory, "contact_sheet.jpg")
+        cv2.imwrite(filename, sheet, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return filename
+
+    def stats(self):
+        queue_stats = self.queue.stats() if self.queue is not None else {}
+        with self.lock:
+            return {
+                'saved': len(self.saved),
+                'dropped': queue_stats.get('dropped', 0),
+                'errors': self.errors,
+            }
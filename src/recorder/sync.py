@@ -0,0 +1,219 @@
+import collections
+import os
+import time
+
+import numpy as np
+
+
+class MasterClock:
+    """录制使用的单调时钟，所有音视频时间戳都以它为基准（秒）"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+
+    def now(self):
+        return time.perf_counter() - self.origin
+
+    def from_portaudio(self, time_info, frame_count, rate):
+        """把 PortAudio 回调的 ADC 时间换算为缓冲区第一个采样在本时钟上的时间"""
+        now = self.now()
+        current = time_info.get('current_time', 0) if time_info else 0
+        adc = time_info.get('input_buffer_adc_time', 0) if time_info else 0
+        if current > 0 and adc > 0 and 0 <= current - adc < 1.0:
+            return now - (current - adc)
+        # 主机 API 不提供 ADC 时间时，按缓冲区时长估计
+        return now - frame_count / float(rate)
+
+
+class AudioAligner:
+    """把音频开头对齐到第一帧视频的采集时间
+
+    在第一帧视频写入之前到达的音频先暂存；视频开始后根据时间差
+    在开头补静音或裁掉多余的采样，使音频第 0 个采样对应视频第 0 帧。
+    feed() 返回 [(数据, 输出采样位置, 采集时间)]，补的静音采集时间为 None。
+    采集中途丢失的采样用 fill_gap() 补同样长度的静音，保持音频时间轴连续。
+    """
+
+    def __init__(self, rate, channels=1, sample_width=2):
+        self.rate = rate
+        self.frame_bytes = channels * sample_width
+        self.video_start = None
+        self.pending = []
+        self.shift = None
+        self.position = 0
+
+    def set_video_start(self, t):
+        if self.video_start is None:
+            self.video_start = t
+
+    def feed(self, data, t):
+        if self.shift is None:
+            self.pending.append((data, t))
+            if self.video_start is None:
+                return []
+            return self._release_pending()
+        output = [(data, self.position, t)]
+        self.position += len(data) // self.frame_bytes
+        return output
+
+    def fill_gap(self, frames):
+        """前面丢失了 frames 帧采样：输出同样长度的静音，后面的音频不会提前"""
+        if frames <= 0:
+            return []
+        silence = b'\x00' * (frames * self.frame_bytes)
+        if self.shift is None:
+            # 还没有对齐时，开头丢失的采样由对齐本身处理（按第一块的采集时间补静音）
+            if self.pending:
+                self.pending.append((silence, None))
+            return []
+        output = [(silence, self.position, None)]
+        self.position += frames
+        return output
+
+    def flush(self):
+        """录制结束时输出仍在暂存的音频（视频一帧都没有写入时按原样输出）"""
+        if self.shift is None and self.pending:
+            if self.video_start is None:
+                self.video_start = self.pending[0][1]
+            return self._release_pending()
+        return []
+
+    def _release_pending(self):
+        first_t = self.pending[0][1]
+        self.shift = int(round((first_t - self.video_start) * self.rate))
+        output = []
+        skip = 0
+        if self.shift > 0:
+            # 音频晚于视频开始：补静音
+            output.append((b'\x00' * (self.shift * self.frame_bytes), 0, None))
+            self.position = self.shift
+        else:
+            # 音频早于视频开始：裁掉开头的采样
+            skip = -self.shift * self.frame_bytes
+
+        for data, t in self.pending:
+            if skip:
+                if len(data) <= skip:
+                    skip -= len(data)
+                    continue
+                if t is not None:
+                    t += (skip // self.frame_bytes) / float(self.rate)
+                data = data[skip:]
+                skip = 0
+            output.append((data, self.position, t))
+            self.position += len(data) // self.frame_bytes
+        self.pending = []
+        return output
+
+
+class TimestampLog:
+    """音视频时间戳旁路文件（CSV：stream,index,time）
+
+    v 行：写入的第 index 帧视频的采集时间；
+    a 行：从输出第 index 个采样开始的音频块的 ADC 采集时间；
+    e 行：分段结束时间（下一分段第一帧的采集时间），index 为本段帧数。
+    采集/回调线程只做入队，由监控线程定期 flush() 写盘。
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.pending = collections.deque()
+        self.file = open(filename, 'w', encoding='utf-8')
+        self.file.write("stream,index,time\n")
+
+    def video(self, index, t):
+        self.pending.append(('v', index, t))
+
+    def audio(self, position, t):
+        self.pending.append(('a', position, t))
+
+    def end(self, frame_count, t):
+        self.pending.append(('e', frame_count, t))
+
+    def flush(self):
+        lines = []
+        while self.pending:
+            stream, index, t = self.pending.popleft()
+            lines.append(f"{stream},{index},{t:.6f}\n")
+        if lines and self.file is not None:
+            self.file.write(''.join(lines))
+            self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def sidecar_filename(video_filename):
+    """视频文件对应的时间戳旁路文件名"""
+    return os.path.splitext(video_filename)[0] + ".sync.csv"
+
+
+def load_timestamps(filename):
+    """读取旁路文件，返回 (视频帧时间列表, [(音频采样位置, 时间)], 分段结束时间)"""
+    video_times = []
+    audio_points = []
+    end_time = None
+    with open(filename, encoding='utf-8') as f:
+        next(f, None)
+        for line in f:
+            parts = line.strip().split(',')
+            if len(parts) != 3:
+                continue
+            if parts[0] == 'v':
+                video_times.append(float(parts[2]))
+            elif parts[0] == 'a':
+                audio_points.append((int(parts[1]), float(parts[2])))
+            elif parts[0] == 'e':
+                end_time = float(parts[2])
+    return video_times, audio_points, end_time
+
+
+def fit_audio_clock(audio_points, rate):
+    """用最小二乘拟合 音频采样位置 = a + b * 时间，返回 (a, b)
+
+    b 即音频设备相对系统时钟的实际采样率，用于消除长时间录制的时钟漂移。
+    """
+    if len(audio_points) < 2:
+        return None
+    positions = np.array([p for p, _ in audio_points], dtype=np.float64)
+    times = np.array([t for _, t in audio_points], dtype=np.float64)
+    if times[-1] - times[0] < 1.0:
+        return None
+    b, a = np.polyfit(times, positions, 1)
+    # 拟合结果明显不合理（如设备时间戳异常）时放弃
+    if abs(b / rate - 1.0) > 0.01:
+        return None
+    return a, b
+
+
+def video_frame_times(video_times, audio_points, rate, end_time=None):
+    """计算每帧视频在音频时间轴上的显示时间（秒，第 0 帧为 0）
+
+    视频时间换算到音频采样时钟上，因此无论录制多长，画面都与声音保持同步。
+    返回 (每帧时间, 结束时间)，未给出 end_time 时结束时间为 None。
+    """
+    if not video_times:
+        return [], None
+    fit = fit_audio_clock(audio_points, rate)
+    times = np.array(video_times, dtype=np.float64)
+    end = end_time
+    if fit is not None:
+        a, b = fit
+        times = (a + b * times) / float(rate)
+        if end is not None:
+            end = (a + b * end) / float(rate)
+    if end is not None:
+        end -= times[0]
+    times -= times[0]
+    # 保证严格递增
+    times = np.maximum.accumulate(times)
+    min_step = 1e-4
+    for i in range(1, len(times)):
+        if times[i] - times[i - 1] < min_step:
+            times[i] = times[i - 1] + min_step
+    if end is not None and end <= times[-1]:
+        end = None
+    return times.tolist(), end
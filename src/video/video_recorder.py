@@ -3,9 +3,12 @@ import threading
 from datetime import datetime
 import os
 
+from src.recorder.encoders import get_encoder
+
 class VideoRecorder:
-    def __init__(self, output_dir):
+    def __init__(self, output_dir, encoder='opencv_xvid'):
         self.output_dir = output_dir
+        self.encoder = encoder
         self.recording = False
         
     def start(self, device_index=0):
@@ -23,10 +26,14 @@ class VideoRecorder:
     def _record(self):
         cap = cv2.VideoCapture(self.device_index)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(self.output_dir, f"video_{timestamp}.avi")
+        encoder = get_encoder(self.encoder)
+        filename = os.path.join(self.output_dir, f"video_{timestamp}{encoder.extension}")
         
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        out = cv2.VideoWriter(filename, fourcc, 20.0, (640,480))
+        # 使用摄像头实际的分辨率和帧率，读不到帧率时按 20 fps
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+        fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+        out = encoder.create_writer(filename, width, height, fps)
         
         while self.recording:
             ret, frame = cap.read()
@@ -0,0 +1,94 @@
+"""测试用的本地 MJPEG HTTP 服务（模拟 IP Webcam），供 test_mjpeg.py 和 benchmark.py 使用"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+
+class MJPEGServer:
+    """本地 MJPEG HTTP 服务，用任意 FrameSource 模拟 IP Webcam
+
+    用于在没有手机的情况下测试 MJPEGStreamSource 的解析、重连和统计：
+    drop_connections() 断开所有客户端，模拟 Wi-Fi 掉线。
+    """
+
+    boundary = "mjpegframe"
+
+    def __init__(self, source, host='127.0.0.1', port=0, quality=80):
+        self.source = source
+        self.quality = quality
+        self.clients = []
+        self.lock = threading.Lock()
+        self.running = False
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._serve(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/video"
+
+    def start(self):
+        if not self.source.is_opened():
+            self.source.open()
+        self.running = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.drop_connections()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.source.release()
+
+    def drop_connections(self):
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for handler in clients:
+            try:
+                handler.connection.shutdown(2)
+            except OSError:
+                pass
+
+    def _serve(self, handler):
+        handler.send_response(200)
+        handler.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={self.boundary}')
+        handler.end_headers()
+        with self.lock:
+            self.clients.append(handler)
+        try:
+            while self.running:
+                ret, frame = self.source.read()
+                if not ret:
+                    if self.source.finished:
+                        break
+                    continue
+                ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    continue
+                data = jpeg.tobytes()
+                handler.wfile.write(
+                    f"--{self.boundary}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1')
+                    + data + b"\r\n"
+                )
+                handler.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                if handler in self.clients:
+                    self.clients.remove(handler)
@@ -0,0 +1,80 @@
+"""MJPEGStreamSource：multipart 解析、latest-wins 丢帧、帧率和断线重连"""
+import io
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src.recorder.mjpeg import MJPEGStreamSource, _parse_boundary
+from src.recorder.sources import SyntheticVideoSource
+from tests.mjpeg_server import MJPEGServer
+
+
+def _jpeg():
+    return cv2.imencode('.jpg', np.zeros((16, 16, 3), np.uint8))[1].tobytes()
+
+
+@pytest.fixture
+def stream():
+    server = MJPEGServer(SyntheticVideoSource(640, 480, 30.0)).start()
+    source = MJPEGStreamSource(server.url, timeout=5.0, max_backoff=1.0)
+    source.open()
+    yield server, source
+    source.release()
+    server.stop()
+
+
+def test_parse_boundary():
+    assert _parse_boundary('multipart/x-mixed-replace; boundary="frame"') == b'--frame'
+    assert _parse_boundary('multipart/x-mixed-replace;boundary=--frame') == b'--frame'
+    assert _parse_boundary('image/jpeg') is None
+
+
+def test_iter_parts_with_and_without_length():
+    jpeg = _jpeg()
+    body = (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n%s\r\n"
+            b"--frame\r\nContent-Type: image/jpeg\r\n\r\n%s\r\n--frame--\r\n"
+            b"--frame\r\nContent-Length: %d\r\n\r\n%s\r\n") % (len(jpeg), jpeg, jpeg, len(jpeg), jpeg)
+    parser = MJPEGStreamSource("http://127.0.0.1/unused")
+    parser.running = True
+    # 结束分隔符之后的内容不再解析
+    assert list(parser._iter_parts(io.BytesIO(body), b'--frame')) == [jpeg, jpeg]
+
+
+def test_undecoded_jpeg_is_replaced_by_newer():
+    parser = MJPEGStreamSource("http://127.0.0.1/unused")
+    jpeg = _jpeg()
+    for _ in range(3):
+        parser._on_jpeg(jpeg)
+    assert parser.received == 3
+    assert parser.skipped == 2
+
+
+def test_slow_reader_gets_latest_frame(stream):
+    _, source = stream
+    reads = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 1.0:
+        ret, frame = source.read()
+        if ret:
+            reads += 1
+            assert frame.shape == (480, 640, 3)
+        time.sleep(0.1)
+    stats = source.stats()
+    assert stats['fps'] >= 30.0 * 0.6
+    # 读取比推流慢时跳过旧帧，而不是积压
+    assert stats['decoded'] > reads
+    assert stats['reconnects'] == 0
+
+
+def test_reconnect_after_drop_connections(stream):
+    server, source = stream
+    received = source.received
+    server.drop_connections()
+    deadline = time.monotonic() + 10.0
+    while time.monotonic() < deadline and not (source.reconnects >= 1 and source.received > received + 5):
+        time.sleep(0.02)
+    assert source.stats()['reconnects'] == 1
+    assert source.received > received + 5
+    assert source.read()[0]
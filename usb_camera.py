@@ -4,6 +4,8 @@ import threading
 import time
 import os
 from datetime import datetime
+from src.audio.wav_writer import StreamingWavWriter
+from src.recorder.levels import LevelMeter
 
 class AudioRecorder:
     def __init__(self):
@@ -19,7 +21,7 @@ class AudioRecorder:
         self.FORMAT = pyaudio.paInt16
         self.RATE = 44100
         self.recording = False
-        self.frames = []
+        self.writer = None
         
         # 检查麦克风
         print("\n=== 检查麦克风 ===")
@@ -105,15 +107,16 @@ class AudioRecorder:
                 frames_per_buffer=self.CHUNK
             )
             
+            meter = LevelMeter(self.CHANNELS)
             print("开始录音测试...")
             for i in range(0, int(self.RATE / self.CHUNK * 5)):
                 data = stream.read(self.CHUNK)
                 test_frames.append(data)
-                # 显示音量指示器
-                rms = sum(abs(int.from_bytes(data[i:i+2], 'little', signed=True)) 
-                         for i in range(0, len(data), 2)) / (len(data)/2)
-                bars = int(rms / 100)
-                print('\r' + '█' * bars + ' ' * (50-bars), end='')
+                # 显示音量指示器（-60 ~ 0 dBFS 对应 0 ~ 50 格）
+                meter.feed(data)
+                levels = meter.read()
+                bars = int(min(max((max(levels['rms_db']) + 60) / 60, 0), 1) * 50)
+                print('\r' + '█' * bars + ' ' * (50-bars) + (' 削波!' if levels['clipping'] else ''), end='')
                 
             print("\n录音测试完成")
             
@@ -146,8 +149,16 @@ class AudioRecorder:
     def start_recording(self):
         """开始录音"""
         if not self.recording:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = os.path.join(self.output_dir, f"recording_{timestamp}.wav")
+            # 音频边录边写入磁盘，不在内存中累积
+            self.writer = StreamingWavWriter(
+                filename,
+                self.CHANNELS,
+                self.audio.get_sample_size(self.FORMAT),
+                self.RATE
+            ).open()
             self.recording = True
-            self.frames = []
             self.audio_thread = threading.Thread(target=self.record_audio)
             self.audio_thread.start()
             print("\n=== 开始录音 ===")
@@ -171,8 +182,8 @@ class AudioRecorder:
             if hasattr(self, 'audio_stream'):
                 self.audio_stream.stop_stream()
                 self.audio_stream.close()
-            cv2.destroyAllWindows()
             print("\n=== 录音已停止 ===")
+            self.save_audio()
 
     def record_audio(self):
         """录音线程"""
@@ -188,7 +199,7 @@ class AudioRecorder:
         while self.recording:
             try:
                 data = stream.read(self.CHUNK)
-                self.frames.append(data)
+                self.writer.write(data)
             except Exception as e:
                 print(f"录音错误: {e}")
                 break
@@ -197,24 +208,19 @@ class AudioRecorder:
         stream.close()
 
     def save_audio(self):
-        """保存录音文件"""
-        if not self.frames:
-            print("没有录制到音频数据")
+        """结束写入录音文件"""
+        if self.writer is None:
             return
             
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(self.output_dir, f"recording_{timestamp}.wav")
-        
         try:
-            wf = wave.open(filename, 'wb')
-            wf.setnchannels(self.CHANNELS)
-            wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
-            wf.setframerate(self.RATE)
-            wf.writeframes(b''.join(self.frames))
-            wf.close()
+            self.writer.close()
+            if not self.writer.data_size:
+                print("没有录制到音频数据")
+                os.remove(self.writer.filename)
+                return
             
             print(f"\n=== 文件已保存 ===")
-            print(f"位置: {filename}")
+            print(f"位置: {self.writer.filename}")
             
             # 打开文件夹
             os.system(f'explorer "{self.output_dir}"')